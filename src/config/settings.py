@@ -16,6 +16,59 @@ MINIO_PENDING_REVIEWS_BUCKET_NAME: str = config("MINIO_PENDING_REVIEWS_BUCKET_NA
 MINIO_DATA_SOURCES_BUCKET_NAME: str = config("MINIO_DATA_SOURCES_BUCKET_NAME")
 MINIO_DATASETS_BUCKET_NAME: str = config("MINIO_DATASETS_BUCKET_NAME")
 
+MINIO_MAX_WORKERS: int = config("MINIO_MAX_WORKERS", default=16, cast=int)
+MINIO_PART_SIZE: int = config("MINIO_PART_SIZE", default=16 * 1024 * 1024, cast=int)
+MINIO_MULTIPART_THRESHOLD: int = config(
+    "MINIO_MULTIPART_THRESHOLD", default=64 * 1024 * 1024, cast=int
+)
+MINIO_PARALLEL_UPLOADS: int = config("MINIO_PARALLEL_UPLOADS", default=4, cast=int)
+MINIO_LIST_CONCURRENCY: int = config("MINIO_LIST_CONCURRENCY", default=8, cast=int)
+MINIO_MAX_POOL_CONNECTIONS: int = config(
+    "MINIO_MAX_POOL_CONNECTIONS", default=32, cast=int
+)
+MINIO_CONNECTION_CHECK_TTL: int = config(
+    "MINIO_CONNECTION_CHECK_TTL", default=300, cast=int
+)
+MINIO_ASYNC_MAX_CONNECTIONS: int = config(
+    "MINIO_ASYNC_MAX_CONNECTIONS", default=64, cast=int
+)
+MINIO_ASYNC_MAX_CONCURRENCY: int = config(
+    "MINIO_ASYNC_MAX_CONCURRENCY", default=512, cast=int
+)
+
+LOCAL_BUCKETS_ROOT_PATH: str = config("LOCAL_BUCKETS_ROOT_PATH", default="buckets")
+
+BUCKET_CACHE_PATH: str = config("BUCKET_CACHE_PATH", default=".cache/buckets")
+BUCKET_CACHE_MAX_BYTES: int = config(
+    "BUCKET_CACHE_MAX_BYTES", default=10 * 1024 * 1024 * 1024, cast=int
+)
+
+BUCKET_RETRY_MAX_ATTEMPTS: int = config(
+    "BUCKET_RETRY_MAX_ATTEMPTS", default=4, cast=int
+)
+BUCKET_REQUEST_TIMEOUT: float = config(
+    "BUCKET_REQUEST_TIMEOUT", default=60.0, cast=float
+)
+BUCKET_HEDGE_PERCENTILE: float = config(
+    "BUCKET_HEDGE_PERCENTILE", default=0.95, cast=float
+)
+
+BUCKET_METRICS_PATH: str = config("BUCKET_METRICS_PATH", default="")
+
+UPLOAD_MAX_WORKERS: int = config("UPLOAD_MAX_WORKERS", default=10, cast=int)
+UPLOAD_CPU_WORKERS: int = config("UPLOAD_CPU_WORKERS", default=0, cast=int)
+
+DATALAKE_STORAGE_LAYOUT: str = config("DATALAKE_STORAGE_LAYOUT", default="objects")
+SHARD_MAX_BYTES: int = config("SHARD_MAX_BYTES", default=256 * 1024 * 1024, cast=int)
+UPLOAD_INCREMENTAL: bool = config("UPLOAD_INCREMENTAL", default=False, cast=bool)
+UPLOAD_JOURNAL_PATH: str = config(
+    "UPLOAD_JOURNAL_PATH", default=".cache/upload_journal.db"
+)
+
+OBJECT_CATALOG_PATH: str = config(
+    "OBJECT_CATALOG_PATH", default=".cache/object_catalog.db"
+)
+
 YOLO_PRE_TRAINED_WEIGHTS_PATH: str = "ultralytics"
 EXTRACTED_DATASETS_PATH: str = "datasets"
 DATASET_YOLO_CONFIG_NAME: str = "dataset.yaml"
@@ -6,12 +6,36 @@ from zenml.enums import ArtifactType
 from zenml.io import fileio
 from zenml.materializers.base_materializer import BaseMaterializer
 
-from src.config.settings import MINIO_ENDPOINT, MINIO_ROOT_PASSWORD, MINIO_ROOT_USER
+from src.config.settings import (
+    MINIO_CONNECTION_CHECK_TTL,
+    MINIO_ENDPOINT,
+    MINIO_LIST_CONCURRENCY,
+    MINIO_MAX_POOL_CONNECTIONS,
+    MINIO_MAX_WORKERS,
+    MINIO_MULTIPART_THRESHOLD,
+    MINIO_PARALLEL_UPLOADS,
+    MINIO_PART_SIZE,
+    MINIO_ROOT_PASSWORD,
+    MINIO_ROOT_USER,
+)
 from src.models.model_bucket_client import BucketClient, MinioClient
+from src.models.model_caching_bucket_client import CachingBucketClient
+from src.models.model_instrumented_bucket_client import InstrumentedBucketClient
+from src.models.model_local_bucket_client import LocalFsBucketClient
+from src.models.model_object_catalog import CatalogBucketClient, ObjectCatalog
+from src.models.model_resilient_bucket_client import ResilientBucketClient
 
 
 class BucketClientMaterializer(BaseMaterializer):
-    ASSOCIATED_TYPES = (BucketClient, MinioClient)
+    ASSOCIATED_TYPES = (
+        BucketClient,
+        MinioClient,
+        LocalFsBucketClient,
+        CachingBucketClient,
+        CatalogBucketClient,
+        ResilientBucketClient,
+        InstrumentedBucketClient,
+    )
     ASSOCIATED_ARTIFACT_TYPE = ArtifactType.DATA
 
     def load(self, data_type: Type[BucketClient]) -> BucketClient:
@@ -20,27 +44,127 @@ class BucketClientMaterializer(BaseMaterializer):
         with fileio.open(data_path, "r") as f:
             config = json.load(f)
 
+        return self._from_config(config)
+
+    def save(self, bucket_client: BucketClient) -> None:
+        """Serialize BucketClient object."""
+        config = self._to_config(bucket_client)
+
+        data_path = os.path.join(self.uri, "bucket_client_config.json")
+        with fileio.open(data_path, "w") as f:
+            json.dump(config, f)
+
+    def _from_config(self, config: dict) -> BucketClient:
+        """Build a BucketClient from its configuration, wrapped clients included."""
         if config["class"] == "MinioClient":
             return MinioClient(
                 endpoint=MINIO_ENDPOINT,
                 access_key=MINIO_ROOT_USER,
                 secret_key=MINIO_ROOT_PASSWORD,
                 secure=config["secure"],
+                max_workers=config.get("max_workers", MINIO_MAX_WORKERS),
+                part_size=config.get("part_size", MINIO_PART_SIZE),
+                multipart_threshold=config.get(
+                    "multipart_threshold", MINIO_MULTIPART_THRESHOLD
+                ),
+                parallel_uploads=config.get("parallel_uploads", MINIO_PARALLEL_UPLOADS),
+                list_concurrency=config.get("list_concurrency", MINIO_LIST_CONCURRENCY),
+                max_pool_connections=config.get(
+                    "max_pool_connections", MINIO_MAX_POOL_CONNECTIONS
+                ),
+                connection_check_ttl=config.get(
+                    "connection_check_ttl", MINIO_CONNECTION_CHECK_TTL
+                ),
+            )
+        elif config["class"] == "LocalFsBucketClient":
+            return LocalFsBucketClient(
+                root_path=config["root_path"],
+                max_workers=config.get("max_workers", MINIO_MAX_WORKERS),
+            )
+        elif config["class"] == "CachingBucketClient":
+            return CachingBucketClient(
+                bucket_client=self._from_config(config["bucket_client"]),
+                cache_path=config["cache_path"],
+                max_bytes=config["max_bytes"],
+                max_workers=config.get("max_workers", MINIO_MAX_WORKERS),
+            )
+        elif config["class"] == "CatalogBucketClient":
+            return CatalogBucketClient(
+                bucket_client=self._from_config(config["bucket_client"]),
+                catalog=ObjectCatalog(config["database_path"]),
+            )
+        elif config["class"] == "InstrumentedBucketClient":
+            return InstrumentedBucketClient(
+                bucket_client=self._from_config(config["bucket_client"])
+            )
+        elif config["class"] == "ResilientBucketClient":
+            return ResilientBucketClient(
+                bucket_client=self._from_config(config["bucket_client"]),
+                max_attempts=config["max_attempts"],
+                base_delay=config["base_delay"],
+                max_delay=config["max_delay"],
+                request_timeout=config["request_timeout"],
+                hedge_percentile=config["hedge_percentile"],
+                small_object_max_size=config["small_object_max_size"],
+                max_workers=config.get("max_workers", MINIO_MAX_WORKERS),
             )
         else:
             raise NotImplementedError(
                 f"Deserialization for {config['class']} not implemented"
             )
 
-    def save(self, bucket_client: BucketClient) -> None:
-        """Serialize BucketClient object."""
+    def _to_config(self, bucket_client: BucketClient) -> dict:
+        """Describe a BucketClient, wrapped clients included, as a JSON-serializable dict."""
         if isinstance(bucket_client, MinioClient):
-            config = {"class": "MinioClient", "secure": bucket_client.secure}
+            return {
+                "class": "MinioClient",
+                "secure": bucket_client.secure,
+                "max_workers": bucket_client.max_workers,
+                "part_size": bucket_client.part_size,
+                "multipart_threshold": bucket_client.multipart_threshold,
+                "parallel_uploads": bucket_client.parallel_uploads,
+                "list_concurrency": bucket_client.list_concurrency,
+                "max_pool_connections": bucket_client.max_pool_connections,
+                "connection_check_ttl": bucket_client.connection_check_ttl,
+            }
+        elif isinstance(bucket_client, LocalFsBucketClient):
+            return {
+                "class": "LocalFsBucketClient",
+                "root_path": bucket_client.root_path,
+                "max_workers": bucket_client.max_workers,
+            }
+        elif isinstance(bucket_client, CachingBucketClient):
+            return {
+                "class": "CachingBucketClient",
+                "bucket_client": self._to_config(bucket_client.bucket_client),
+                "cache_path": bucket_client.cache_path,
+                "max_bytes": bucket_client.max_bytes,
+                "max_workers": bucket_client.max_workers,
+            }
+        elif isinstance(bucket_client, CatalogBucketClient):
+            return {
+                "class": "CatalogBucketClient",
+                "bucket_client": self._to_config(bucket_client.bucket_client),
+                "database_path": bucket_client.catalog.database_path,
+            }
+        elif isinstance(bucket_client, InstrumentedBucketClient):
+            return {
+                "class": "InstrumentedBucketClient",
+                "bucket_client": self._to_config(bucket_client.bucket_client),
+            }
+        elif isinstance(bucket_client, ResilientBucketClient):
+            return {
+                "class": "ResilientBucketClient",
+                "bucket_client": self._to_config(bucket_client.bucket_client),
+                "max_attempts": bucket_client.max_attempts,
+                "base_delay": bucket_client.base_delay,
+                "max_delay": bucket_client.max_delay,
+                "request_timeout": bucket_client.request_timeout,
+                "hedge_percentile": bucket_client.hedge_percentile,
+                "small_object_max_size": bucket_client.small_object_max_size,
+                "max_workers": bucket_client.max_workers,
+            }
         else:
             raise NotImplementedError(
                 f"Serialization for {type(bucket_client)} not implemented"
             )
-
-        data_path = os.path.join(self.uri, "bucket_client_config.json")
-        with fileio.open(data_path, "w") as f:
-            json.dump(config, f)
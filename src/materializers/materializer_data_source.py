@@ -34,6 +34,7 @@ class DataSourceMaterializer(BaseMaterializer):
             if isinstance(data_source, HuggingFaceDataSource):
                 data_source_info["dataset_name"] = data_source.dataset_name
                 data_source_info["api_token"] = data_source.api_token
+                data_source_info["streaming"] = data_source.streaming
 
             serialized_data_sources.append(data_source_info)
 
@@ -54,6 +55,7 @@ class DataSourceMaterializer(BaseMaterializer):
                     dataset_name=data_source_info["dataset_name"],
                     label_map=data_source_info["label_map"],
                     api_token=data_source_info.get("api_token"),
+                    streaming=data_source_info.get("streaming", False),
                 )
             elif data_source_info["class"] == "LocalDataSource":
                 data_source = LocalDataSource(
@@ -6,7 +6,9 @@ from zenml.enums import ArtifactType
 from zenml.io import fileio
 from zenml.materializers.base_materializer import BaseMaterializer
 
-from src.models.model_dataset import Dataset
+from src.models.model_dataset import SPLIT_MODE_RANDOM, Dataset
+from src.models.model_dataset_manifest import MANIFEST_FILE_NAME, DatasetManifest
+from src.models.model_shard import STORAGE_LAYOUT_OBJECTS
 
 
 class DatasetMaterializer(BaseMaterializer):
@@ -23,12 +25,18 @@ class DatasetMaterializer(BaseMaterializer):
             "images_path": dataset.images_path,
             "distribution_weights": dataset.distribution_weights,
             "label_map": dataset.label_map,
+            "storage_layout": dataset.storage_layout,
+            "split_mode": dataset.split_mode,
         }
 
         data_path = os.path.join(self.uri, "dataset_config.json")
         with fileio.open(data_path, "w") as f:
             json.dump(serialized_dataset, f)
 
+        if dataset.manifest is not None:
+            with fileio.open(os.path.join(self.uri, MANIFEST_FILE_NAME), "wb") as f:
+                f.write(dataset.manifest.to_bytes())
+
     def load(self, data_type: Type[Dataset]) -> Dataset:
         """Deserialize the Dataset object."""
         data_path = os.path.join(self.uri, "dataset_config.json")
@@ -42,7 +50,16 @@ class DatasetMaterializer(BaseMaterializer):
             images_path=serialized_dataset["images_path"],
             distribution_weights=serialized_dataset["distribution_weights"],
             label_map=serialized_dataset["label_map"],
+            storage_layout=serialized_dataset.get(
+                "storage_layout", STORAGE_LAYOUT_OBJECTS
+            ),
+            split_mode=serialized_dataset.get("split_mode", SPLIT_MODE_RANDOM),
         )
         dataset.uuid = serialized_dataset["uuid"]  # Manually setting the uuid
 
+        manifest_path = os.path.join(self.uri, MANIFEST_FILE_NAME)
+        if fileio.exists(manifest_path):
+            with fileio.open(manifest_path, "rb") as f:
+                dataset.manifest = DatasetManifest.from_bytes(f.read())
+
         return dataset
@@ -0,0 +1,470 @@
+import io
+import threading
+
+import numpy as np
+from minio import S3Error
+
+from src.models.model_bucket_client import BucketClient
+
+ANNOTATION_TABLE_FILE_NAME = "annotations.npz"
+ANNOTATION_TABLE_VERSION = 1
+BOX_AREA_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+class AnnotationTable:
+    """
+    Columnar table of the boxes of a data source's or a dataset's annotations, so that
+    dataset-wide questions are answered with vectorized queries rather than by reading
+    every annotation.
+
+    Images are stored once, with their key, i.e. the hash naming their objects, their
+    dimensions, 0 when unknown, and their split, empty for data sources. Boxes are stored
+    one per row, with the index of their image, their label and their normalized
+    `x_center, y_center, width, height`. The table is saved as a single compressed NumPy
+    archive, one array per column.
+    """
+
+    def __init__(
+        self,
+        keys: np.ndarray,
+        image_widths: np.ndarray,
+        image_heights: np.ndarray,
+        splits: np.ndarray,
+        image_indexes: np.ndarray,
+        labels: np.ndarray,
+        boxes: np.ndarray,
+    ):
+        # Columns of the images
+        self.keys = keys
+        self.image_widths = image_widths
+        self.image_heights = image_heights
+        self.splits = splits
+        # Columns of the boxes
+        self.image_indexes = image_indexes
+        self.labels = labels
+        self.boxes = boxes
+
+    @classmethod
+    def empty(cls) -> "AnnotationTable":
+        return cls(
+            keys=np.array([], dtype=str),
+            image_widths=np.array([], dtype=np.int32),
+            image_heights=np.array([], dtype=np.int32),
+            splits=np.array([], dtype=str),
+            image_indexes=np.array([], dtype=np.int32),
+            labels=np.array([], dtype=np.int64),
+            boxes=np.empty((0, 4), dtype=np.float32),
+        )
+
+    def __len__(self) -> int:
+        return len(self.labels)
+
+    @property
+    def number_of_images(self) -> int:
+        return len(self.keys)
+
+    def get_label_counts(self) -> dict[int, int]:
+        """
+        Counts the boxes of each label.
+
+        Returns:
+            dict[int, int]: The number of boxes keyed by label.
+        """
+        labels, counts = np.unique(self.labels, return_counts=True)
+        return dict(zip(labels.tolist(), counts.tolist()))
+
+    def get_unknown_labels(self, label_map: dict[int, str]) -> list[int]:
+        """
+        Finds the labels of the boxes missing from a label map.
+
+        Args:
+            label_map (dict[int, str]): The label map.
+
+        Returns:
+            list[int]: The sorted labels missing from the label map.
+        """
+        known_labels = np.array([int(label) for label in label_map], dtype=np.int64)
+        return np.setdiff1d(self.labels, known_labels).tolist()
+
+    def validate_label_map(self, label_map: dict[int, str]) -> None:
+        """
+        Checks that a label map names every label of the boxes.
+
+        Args:
+            label_map (dict[int, str]): The label map.
+
+        Raises:
+            ValueError: If some labels are missing from the label map.
+        """
+        unknown_labels = self.get_unknown_labels(label_map)
+        if unknown_labels:
+            raise ValueError(
+                f"Labels {unknown_labels} are not in the label map: {label_map}"
+            )
+
+    def get_stats(self) -> dict:
+        """
+        Computes the statistics of the boxes: their number per label and per image, and the
+        distribution of their normalized areas.
+
+        Returns:
+            dict: The statistics.
+        """
+        areas = self.boxes[:, 2].astype(np.float64) * self.boxes[:, 3]
+        return {
+            "images": self.number_of_images,
+            "boxes": len(self),
+            "boxes_per_label": self.get_label_counts(),
+            "boxes_per_image": (
+                len(self) / self.number_of_images if self.number_of_images else 0.0
+            ),
+            "box_area_percentiles": (
+                dict(
+                    zip(
+                        BOX_AREA_PERCENTILES,
+                        np.percentile(areas, BOX_AREA_PERCENTILES).tolist(),
+                    )
+                )
+                if len(self)
+                else {}
+            ),
+        }
+
+    def select(
+        self,
+        keys: list[str] | np.ndarray | None = None,
+        labels: list[int] | None = None,
+        splits: list[str] | None = None,
+    ) -> "AnnotationTable":
+        """
+        Selects the images matching every given criterion, with all of their boxes.
+
+        Args:
+            keys (list[str] | np.ndarray | None): The keys of the images to keep.
+            labels (list[int] | None): Keeps the images with a box of one of these labels.
+            splits (list[str] | None): The splits of the images to keep.
+
+        Returns:
+            AnnotationTable: The selected images and their boxes.
+        """
+        is_selected = np.ones(self.number_of_images, dtype=bool)
+        if keys is not None:
+            is_selected &= np.isin(self.keys, keys)
+        if splits is not None:
+            is_selected &= np.isin(self.splits, splits)
+        if labels is not None:
+            has_label = np.zeros(self.number_of_images, dtype=bool)
+            has_label[self.image_indexes[np.isin(self.labels, labels)]] = True
+            is_selected &= has_label
+        return self._take(np.flatnonzero(is_selected))
+
+    def _take(self, image_indexes: np.ndarray) -> "AnnotationTable":
+        """
+        Takes images by index, in the given order, with their boxes.
+
+        Args:
+            image_indexes (np.ndarray): The indexes of the images to take.
+
+        Returns:
+            AnnotationTable: The taken images and their boxes.
+        """
+        new_image_indexes = np.full(self.number_of_images, -1, dtype=np.int32)
+        new_image_indexes[image_indexes] = np.arange(len(image_indexes))
+        box_image_indexes = new_image_indexes[self.image_indexes]
+        is_kept = box_image_indexes >= 0
+        # Boxes are grouped by image, in the order of the taken images
+        box_order = np.argsort(box_image_indexes[is_kept], kind="stable")
+
+        return AnnotationTable(
+            keys=self.keys[image_indexes],
+            image_widths=self.image_widths[image_indexes],
+            image_heights=self.image_heights[image_indexes],
+            splits=self.splits[image_indexes],
+            image_indexes=box_image_indexes[is_kept][box_order],
+            labels=self.labels[is_kept][box_order],
+            boxes=self.boxes[is_kept][box_order],
+        )
+
+    def remap_labels(self, label_remap: dict[int, int]) -> "AnnotationTable":
+        """
+        Maps the labels of the boxes to other labels, e.g. to a dataset's labels.
+
+        Args:
+            label_remap (dict[int, int]): The new labels keyed by label, labels missing
+                from it being kept.
+
+        Returns:
+            AnnotationTable: The table with the new labels.
+        """
+        labels = self.labels.copy()
+        if label_remap and len(labels):
+            old_labels = np.array(list(label_remap), dtype=np.int64)
+            new_labels = np.array(list(label_remap.values()), dtype=np.int64)
+            order = np.argsort(old_labels)
+            positions = np.searchsorted(old_labels[order], labels)
+            positions = np.minimum(positions, len(old_labels) - 1)
+            is_remapped = old_labels[order][positions] == labels
+            labels[is_remapped] = new_labels[order][positions[is_remapped]]
+
+        return AnnotationTable(
+            self.keys,
+            self.image_widths,
+            self.image_heights,
+            self.splits,
+            self.image_indexes,
+            labels,
+            self.boxes,
+        )
+
+    def with_splits(self, split_by_key: dict[str, str]) -> "AnnotationTable":
+        """
+        Sets the split of the images, e.g. from a dataset's manifest.
+
+        Args:
+            split_by_key (dict[str, str]): The splits keyed by image key, images missing
+                from it getting an empty split.
+
+        Returns:
+            AnnotationTable: The table with the images' splits.
+        """
+        return AnnotationTable(
+            self.keys,
+            self.image_widths,
+            self.image_heights,
+            np.array(
+                [split_by_key.get(key, "") for key in self.keys.tolist()], dtype=str
+            ),
+            self.image_indexes,
+            self.labels,
+            self.boxes,
+        )
+
+    @classmethod
+    def concatenate(cls, tables: list["AnnotationTable"]) -> "AnnotationTable":
+        """
+        Concatenates tables, an image found in several of them being kept from the first.
+
+        Args:
+            tables (list[AnnotationTable]): The tables to concatenate.
+
+        Returns:
+            AnnotationTable: The images and boxes of the tables.
+        """
+        tables = [table for table in tables if table.number_of_images]
+        if not tables:
+            return cls.empty()
+
+        image_offsets = np.cumsum([0] + [table.number_of_images for table in tables])
+        table = cls(
+            keys=np.concatenate([table.keys for table in tables]),
+            image_widths=np.concatenate([table.image_widths for table in tables]),
+            image_heights=np.concatenate([table.image_heights for table in tables]),
+            splits=np.concatenate([table.splits for table in tables]),
+            image_indexes=np.concatenate(
+                [
+                    table.image_indexes + image_offset
+                    for table, image_offset in zip(tables, image_offsets)
+                ]
+            ).astype(np.int32),
+            labels=np.concatenate([table.labels for table in tables]),
+            boxes=np.concatenate([table.boxes for table in tables]),
+        )
+
+        _, first_indexes = np.unique(table.keys, return_index=True)
+        if len(first_indexes) == table.number_of_images:
+            return table
+        return table._take(np.sort(first_indexes))
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the table to a compressed NumPy archive.
+
+        Returns:
+            bytes: The archive.
+        """
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            version=np.array(ANNOTATION_TABLE_VERSION),
+            keys=self.keys,
+            image_widths=self.image_widths,
+            image_heights=self.image_heights,
+            splits=self.splits,
+            image_indexes=self.image_indexes,
+            labels=self.labels,
+            boxes=self.boxes,
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "AnnotationTable":
+        """
+        Deserializes a table written by `to_bytes`.
+
+        Args:
+            data (bytes): The archive.
+
+        Returns:
+            AnnotationTable: The table.
+
+        Raises:
+            ValueError: If the table was written by a newer version.
+        """
+        with np.load(io.BytesIO(data), allow_pickle=False) as archive:
+            version = int(archive["version"])
+            if version > ANNOTATION_TABLE_VERSION:
+                raise ValueError(
+                    f"Unsupported annotation table version {version}, expected at most"
+                    f" {ANNOTATION_TABLE_VERSION}."
+                )
+
+            return cls(
+                keys=archive["keys"],
+                image_widths=archive["image_widths"],
+                image_heights=archive["image_heights"],
+                splits=archive["splits"],
+                image_indexes=archive["image_indexes"],
+                labels=archive["labels"],
+                boxes=archive["boxes"],
+            )
+
+    def save(
+        self, bucket_client: BucketClient, bucket_name: str, object_name: str
+    ) -> None:
+        """
+        Uploads the table as a single object.
+
+        Args:
+            bucket_client (BucketClient): The client to upload with.
+            bucket_name (str): Name of the bucket.
+            object_name (str): The table's object name.
+        """
+        data = self.to_bytes()
+        bucket_client.upload_data(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=data,
+            length=len(data),
+        )
+
+    @classmethod
+    def load(
+        cls, bucket_client: BucketClient, bucket_name: str, object_name: str
+    ) -> "AnnotationTable | None":
+        """
+        Reads a table uploaded by `save`.
+
+        Args:
+            bucket_client (BucketClient): The client to read with.
+            bucket_name (str): Name of the bucket.
+            object_name (str): The table's object name.
+
+        Returns:
+            AnnotationTable | None: The table, or None if it was never saved.
+        """
+        try:
+            bucket_client.head_object(bucket_name, object_name)
+        except FileNotFoundError:
+            return None
+        except S3Error as e:
+            if e.code != "NoSuchKey":
+                raise
+            return None
+
+        response = bucket_client.get_object(bucket_name, object_name)
+        try:
+            return cls.from_bytes(response.read())
+        finally:
+            response.close()
+            response.release_conn()
+
+
+class AnnotationTableBuilder:
+    """
+    Collects annotations, from the threads of an upload, into an `AnnotationTable`.
+
+    An image added several times keeps its last annotation, e.g. a changed one.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._annotations: dict[str, tuple[list, list, tuple[int, int] | None]] = {}
+
+    def __len__(self) -> int:
+        return len(self._annotations)
+
+    @staticmethod
+    def is_annotation(data) -> bool:
+        """Tells whether JSON data is an annotation, holding `label` and `bbox` lists."""
+        return isinstance(data, dict) and "label" in data and "bbox" in data
+
+    def add(
+        self,
+        key: str,
+        annotation: dict,
+        image_size: tuple[int, int] | None = None,
+    ) -> None:
+        """
+        Adds the boxes of an image's annotation.
+
+        Args:
+            key (str): The key of the image.
+            annotation (dict): The annotation, with its `label` and `bbox` lists.
+            image_size (tuple[int, int] | None): The width and height of the image, if known.
+
+        Raises:
+            ValueError: If the annotation has not as many labels as boxes.
+        """
+        if len(annotation["label"]) != len(annotation["bbox"]):
+            raise ValueError(
+                f"Annotation of {key} has {len(annotation['label'])} labels but"
+                f" {len(annotation['bbox'])} boxes."
+            )
+
+        with self._lock:
+            self._annotations[key] = (
+                annotation["label"],
+                annotation["bbox"],
+                image_size,
+            )
+
+    def build(self) -> AnnotationTable:
+        """
+        Builds the table of the added annotations, their boxes being stored as they are,
+        i.e. as the normalized center boxes of the annotations.
+
+        Returns:
+            AnnotationTable: The table.
+        """
+        with self._lock:
+            annotations = list(self._annotations.items())
+        if not annotations:
+            return AnnotationTable.empty()
+
+        box_counts = [len(labels) for _, (labels, _, _) in annotations]
+        image_sizes = np.array(
+            [image_size or (0, 0) for _, (_, _, image_size) in annotations],
+            dtype=np.int32,
+        ).reshape(-1, 2)
+        image_indexes = np.repeat(
+            np.arange(len(annotations), dtype=np.int32), box_counts
+        )
+        labels = np.fromiter(
+            (label for _, (labels, _, _) in annotations for label in labels),
+            dtype=np.int64,
+            count=len(image_indexes),
+        )
+        boxes = np.array(
+            [box for _, (_, boxes, _) in annotations for box in boxes],
+            dtype=np.float32,
+        ).reshape(-1, 4)
+
+        return AnnotationTable(
+            keys=np.array([key for key, _ in annotations], dtype=str),
+            image_widths=image_sizes[:, 0],
+            image_heights=image_sizes[:, 1],
+            splits=np.full(len(annotations), "", dtype=str),
+            image_indexes=image_indexes,
+            labels=labels,
+            boxes=boxes,
+        )
@@ -0,0 +1,472 @@
+import asyncio
+import hashlib
+import os
+import xml.etree.ElementTree as ElementTree
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, cast
+from urllib.parse import SplitResult, quote, urlencode, urlsplit
+
+import aiohttp
+import tqdm
+import yarl
+from minio import S3Error
+from minio.credentials import Credentials
+from minio.datatypes import Object
+from minio.helpers import queryencode
+from minio.signer import sign_v4_s3
+from minio.time import from_http_header, from_iso8601utc, to_amz_date, utcnow
+
+from src.models.model_bucket_client import (
+    PARTIAL_DOWNLOAD_SUFFIX,
+    BufferData,
+    is_empty_range,
+    is_local_file_up_to_date,
+)
+from src.utils.concurrency_helper import run_bounded
+
+DEFAULT_MAX_CONNECTIONS = 64
+DEFAULT_MAX_CONCURRENCY = 512
+S3_XML_NAMESPACE = {"s3": "http://s3.amazonaws.com/doc/2006-03-01/"}
+
+
+class AsyncBucketClient(ABC):
+    @abstractmethod
+    async def check_connection(self) -> None:
+        pass
+
+    @abstractmethod
+    async def bucket_exists(self, bucket_name: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def object_exists(self, bucket_name: str, object_name: str) -> bool:
+        pass
+
+    @abstractmethod
+    async def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BufferData,
+        metadata: dict | None = None,
+    ) -> str | None:
+        pass
+
+    @abstractmethod
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> AsyncGenerator[Object, None]:
+        pass
+
+    @abstractmethod
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        pass
+
+    @abstractmethod
+    async def head_object(self, bucket_name: str, object_name: str) -> Object:
+        pass
+
+    @abstractmethod
+    async def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        pass
+
+    @abstractmethod
+    async def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> str | None:
+        pass
+
+    @abstractmethod
+    async def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        pass
+
+    @abstractmethod
+    async def close(self) -> None:
+        pass
+
+    async def __aenter__(self) -> "AsyncBucketClient":
+        return self
+
+    async def __aexit__(self, *args) -> None:
+        await self.close()
+
+
+class AsyncMinioClient(AsyncBucketClient):
+    """
+    asyncio client for MinIO, speaking the S3 REST API over a shared aiohttp session.
+
+    All requests go through one keep-alive connection pool of `max_connections`, while up to
+    `max_concurrency` requests may be in flight, waiting for a connection or a response.
+    The session is bound to the running event loop: use the client with `async with` or
+    call `close()` before the loop ends.
+    """
+
+    def __init__(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        region: str = "us-east-1",
+        max_connections: int = DEFAULT_MAX_CONNECTIONS,
+        max_concurrency: int = DEFAULT_MAX_CONCURRENCY,
+    ):
+        self.endpoint = endpoint
+        self.secure = secure
+        self.region = region
+        self.max_connections = max_connections
+        self.max_concurrency = max_concurrency
+
+        self._credentials = Credentials(access_key=access_key, secret_key=secret_key)
+        self._session: aiohttp.ClientSession | None = None
+        self._semaphore: asyncio.Semaphore | None = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(
+                    limit=self.max_connections, keepalive_timeout=60
+                )
+            )
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._session
+
+    def _build_url(
+        self,
+        bucket_name: str | None = None,
+        object_name: str | None = None,
+        query_params: dict | None = None,
+    ) -> SplitResult:
+        path = "/"
+        if bucket_name:
+            path += bucket_name
+            if object_name:
+                path += "/" + quote(object_name, safe="/")
+
+        query = urlencode(sorted((query_params or {}).items()), quote_via=queryencode)
+        scheme = "https" if self.secure else "http"
+        return urlsplit(
+            f"{scheme}://{self.endpoint}{path}" + (f"?{query}" if query else "")
+        )
+
+    def _sign(
+        self, method: str, url: SplitResult, headers: dict, body: BufferData
+    ) -> dict:
+        date = utcnow()
+        headers = {
+            **headers,
+            "Host": url.netloc,
+            "x-amz-date": to_amz_date(date),
+            "x-amz-content-sha256": (
+                "UNSIGNED-PAYLOAD" if self.secure else hashlib.sha256(body).hexdigest()
+            ),
+        }
+        return sign_v4_s3(
+            method,
+            url,
+            self.region,
+            headers,
+            self._credentials,
+            headers["x-amz-content-sha256"],
+            date,
+        )
+
+    @staticmethod
+    async def _to_s3_error(
+        response: aiohttp.ClientResponse,
+        bucket_name: str | None,
+        object_name: str | None,
+    ) -> S3Error:
+        body = await response.read()
+        code, message, request_id, host_id = None, response.reason, None, None
+        if body:
+            try:
+                root = ElementTree.fromstring(body)
+                code = root.findtext("Code")
+                message = root.findtext("Message") or message
+                request_id = root.findtext("RequestId")
+                host_id = root.findtext("HostId")
+            except ElementTree.ParseError:
+                pass
+
+        if code is None:
+            code = {404: "NoSuchKey", 403: "AccessDenied"}.get(
+                response.status, "ResponseError"
+            )
+        return S3Error(
+            code,
+            message,
+            response.url.path,
+            request_id or response.headers.get("x-amz-request-id"),
+            host_id,
+            None,  # type: ignore[arg-type]
+            bucket_name=bucket_name,
+            object_name=object_name,
+        )
+
+    @asynccontextmanager
+    async def _request(
+        self,
+        method: str,
+        bucket_name: str | None = None,
+        object_name: str | None = None,
+        query_params: dict | None = None,
+        headers: dict | None = None,
+        body: BufferData = b"",
+        allowed_statuses: tuple[int, ...] = (),
+    ) -> AsyncGenerator[aiohttp.ClientResponse, None]:
+        url = self._build_url(bucket_name, object_name, query_params)
+        # Over plain HTTP the body is hashed to be signed, in a worker thread for images
+        signed_headers = (
+            await asyncio.to_thread(self._sign, method, url, headers or {}, body)
+            if len(body) and not self.secure
+            else self._sign(method, url, headers or {}, body)
+        )
+        session = self._get_session()
+
+        async with cast(asyncio.Semaphore, self._semaphore):
+            async with session.request(
+                method,
+                yarl.URL(url.geturl(), encoded=True),
+                headers=signed_headers,
+                data=body if len(body) else None,
+            ) as response:
+                if response.status >= 300 and response.status not in allowed_statuses:
+                    raise await self._to_s3_error(response, bucket_name, object_name)
+                yield response
+
+    async def check_connection(self) -> None:
+        try:
+            async with self._request("GET"):
+                pass
+        except S3Error as e:
+            raise e
+        except Exception as e:
+            raise ConnectionError("Failed to connect to MinIO") from e
+
+    async def bucket_exists(self, bucket_name: str) -> bool:
+        async with self._request(
+            "HEAD", bucket_name, allowed_statuses=(404,)
+        ) as response:
+            return response.status == 200
+
+    async def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        if not folder_name.endswith("/"):
+            folder_name += "/"
+
+        async for _ in self.list_objects(bucket_name=bucket_name, prefix=folder_name):
+            return True
+        return False
+
+    async def object_exists(self, bucket_name: str, object_name: str) -> bool:
+        async with self._request(
+            "HEAD", bucket_name, object_name, allowed_statuses=(404,)
+        ) as response:
+            return response.status == 200
+
+    async def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BufferData,
+        metadata: dict | None = None,
+    ) -> str | None:
+        headers = {
+            f"x-amz-meta-{key}": str(value) for key, value in (metadata or {}).items()
+        }
+        async with self._request(
+            "PUT", bucket_name, object_name, headers=headers, body=data
+        ) as response:
+            return response.headers.get("ETag", "").strip('"') or None
+
+    async def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ) -> str | None:
+        data = await asyncio.to_thread(_read_file, file_path)
+        return await self.upload_data(bucket_name, object_name, data, metadata)
+
+    async def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> AsyncGenerator[Object, None]:
+        query_params = {"list-type": "2"}
+        if prefix:
+            query_params["prefix"] = prefix
+        if not recursive:
+            query_params["delimiter"] = "/"
+
+        while True:
+            async with self._request(
+                "GET", bucket_name, query_params=query_params
+            ) as response:
+                root = ElementTree.fromstring(await response.read())
+
+            for content in root.findall("s3:Contents", S3_XML_NAMESPACE):
+                yield Object(
+                    bucket_name=bucket_name,
+                    object_name=content.findtext("s3:Key", namespaces=S3_XML_NAMESPACE),
+                    last_modified=from_iso8601utc(
+                        content.findtext("s3:LastModified", namespaces=S3_XML_NAMESPACE)
+                    ),
+                    etag=(content.findtext("s3:ETag", "", S3_XML_NAMESPACE).strip('"')),
+                    size=int(content.findtext("s3:Size", "0", S3_XML_NAMESPACE)),
+                )
+            for common_prefix in root.findall("s3:CommonPrefixes", S3_XML_NAMESPACE):
+                yield Object(
+                    bucket_name=bucket_name,
+                    object_name=common_prefix.findtext(
+                        "s3:Prefix", namespaces=S3_XML_NAMESPACE
+                    ),
+                )
+
+            if root.findtext("s3:IsTruncated", namespaces=S3_XML_NAMESPACE) != "true":
+                return
+            query_params["continuation-token"] = root.findtext(
+                "s3:NextContinuationToken", namespaces=S3_XML_NAMESPACE
+            )
+
+    async def get_object(self, bucket_name: str, object_name: str) -> bytes:
+        async with self._request("GET", bucket_name, object_name) as response:
+            return await response.read()
+
+    async def head_object(self, bucket_name: str, object_name: str) -> Object:
+        async with self._request("HEAD", bucket_name, object_name) as response:
+            last_modified = response.headers.get("Last-Modified")
+            return Object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                last_modified=(
+                    from_http_header(last_modified) if last_modified else None
+                ),
+                etag=response.headers.get("ETag", "").strip('"') or None,
+                size=int(response.headers.get("Content-Length", "0")),
+                content_type=response.headers.get("Content-Type"),
+                metadata={
+                    key: value
+                    for key, value in response.headers.items()
+                    if key.lower().startswith("x-amz-meta-")
+                },
+                version_id=response.headers.get("x-amz-version-id"),
+            )
+
+    async def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        # "bytes={offset}-{offset - 1}" is not a valid range
+        if is_empty_range(length):
+            return b""
+
+        headers = {"Range": f"bytes={offset}-{offset + length - 1}"}
+        async with self._request(
+            "GET", bucket_name, object_name, headers=headers
+        ) as response:
+            return await response.read()
+
+    async def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> str | None:
+        headers = {
+            "x-amz-copy-source": quote(f"/{source_bucket_name}/{source_object_name}")
+        }
+        async with self._request(
+            "PUT", destination_bucket_name, destination_object_name, headers=headers
+        ) as response:
+            root = ElementTree.fromstring(await response.read())
+
+        # Copies may fail after the 200 status line, the error then being the body
+        if root.tag == "Error":
+            raise S3Error(
+                root.findtext("Code"),
+                root.findtext("Message"),
+                destination_object_name,
+                root.findtext("RequestId"),
+                root.findtext("HostId"),
+                None,  # type: ignore[arg-type]
+                bucket_name=destination_bucket_name,
+                object_name=destination_object_name,
+            )
+        return (root.findtext("s3:ETag", "", S3_XML_NAMESPACE).strip('"')) or None
+
+    async def _download_object(
+        self, bucket_name: str, obj: Object, destination_path: str
+    ) -> bool:
+        local_file_path = os.path.join(destination_path, obj.object_name)
+        if await asyncio.to_thread(is_local_file_up_to_date, obj, local_file_path):
+            return False
+
+        await asyncio.to_thread(
+            os.makedirs, os.path.dirname(local_file_path), exist_ok=True
+        )
+        partial_file_path = local_file_path + PARTIAL_DOWNLOAD_SUFFIX
+
+        # File operations run in worker threads, to keep the event loop serving the
+        # other downloads while the disk is busy
+        async with self._request("GET", bucket_name, obj.object_name) as response:
+            f = await asyncio.to_thread(open, partial_file_path, "wb")
+            try:
+                async for chunk in response.content.iter_chunked(1024 * 1024):
+                    await asyncio.to_thread(f.write, chunk)
+            finally:
+                await asyncio.to_thread(f.close)
+        await asyncio.to_thread(
+            _move_downloaded_file, obj, partial_file_path, local_file_path
+        )
+        return True
+
+    async def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        os.makedirs(destination_path, exist_ok=True)
+
+        async def files() -> AsyncGenerator[Object, None]:
+            async for obj in self.list_objects(
+                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            ):
+                if not obj.is_dir:
+                    yield obj
+
+        with tqdm.tqdm(desc="Downloading files") as progress_bar:
+            await run_bounded(
+                lambda obj: self._download_object(bucket_name, obj, destination_path),
+                files(),
+                max_in_flight=self.max_concurrency,
+                on_result=lambda *_: progress_bar.update(1),
+            )
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+        self._session = None
+        self._semaphore = None
+
+
+def _move_downloaded_file(obj: Object, partial_file_path: str, file_path: str) -> None:
+    os.replace(partial_file_path, file_path)
+    if obj.last_modified is not None:
+        timestamp = obj.last_modified.timestamp()
+        os.utime(file_path, (timestamp, timestamp))
+
+
+def _read_file(file_path: str) -> bytes:
+    with open(file_path, "rb") as f:
+        return f.read()
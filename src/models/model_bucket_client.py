@@ -1,14 +1,45 @@
+import functools
+import hashlib
+import itertools
 import os
+import shutil
+import threading
+import time
 from abc import ABC, abstractmethod
-from typing import Any, BinaryIO, Generator
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from typing import Any, BinaryIO, Callable, Generator, Iterable
 
+import certifi
 import tqdm
 import urllib3
 from minio import Minio, S3Error
 from minio.commonconfig import ENABLED, CopySource
 from minio.datatypes import Object
-from minio.helpers import ObjectWriteResult
+from minio.deleteobjects import DeleteObject
+from minio.helpers import MIN_PART_SIZE, ObjectWriteResult
 from minio.versioningconfig import VersioningConfig
+from urllib3.util import Retry, Timeout
+
+from src.utils.concurrency_helper import bounded_as_completed, merge_concurrently
+
+DEFAULT_MAX_WORKERS = 16
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_MULTIPART_THRESHOLD = 64 * 1024 * 1024
+DEFAULT_PARALLEL_UPLOADS = 4
+DEFAULT_LIST_CONCURRENCY = 8
+DEFAULT_MAX_POOL_CONNECTIONS = 32
+DEFAULT_CONNECTION_CHECK_TTL = 300
+PARTIAL_DOWNLOAD_SUFFIX = ".part"
+# Maximum number of keys of one S3 multi-object delete request
+DELETE_BATCH_SIZE = 1000
+# Maximum number of keys of one S3 LIST page
+LIST_PAGE_SIZE = 1000
+# Content-hashed object names are spread evenly over their leading hex digit
+LISTING_SHARD_BOUNDARIES = "123456789abcdef"
+MAX_LISTING_DESCENT_DEPTH = 4
+
+BufferData = bytes | bytearray | memoryview
 
 
 class BucketClient(ABC):
@@ -43,20 +74,32 @@ class BucketClient(ABC):
         self,
         bucket_name: str,
         object_name: str,
-        data: BinaryIO,
+        data: BinaryIO | BufferData,
         length: int,
         metadata: dict | None = None,
     ):
         pass
 
     @abstractmethod
-    def list_objects(self, bucket_name: str, prefix: str | None = None):
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ):
         pass
 
     @abstractmethod
     def get_object(self, bucket_name: str, object_name: str):
         pass
 
+    @abstractmethod
+    def head_object(self, bucket_name: str, object_name: str) -> Object:
+        pass
+
+    @abstractmethod
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        pass
+
     @abstractmethod
     def copy_object(
         self,
@@ -73,23 +116,476 @@ class BucketClient(ABC):
     ) -> None:
         pass
 
+    @abstractmethod
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> "BulkOperationReport":
+        pass
+
+    @abstractmethod
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> "BulkOperationReport":
+        pass
+
+
+class BulkOperationReport:
+    """
+    Outcome of a batch operation: failures are collected per object instead of aborting
+    the whole batch.
+    """
+
+    def __init__(self, description: str):
+        self.description = description
+        self.succeeded = 0
+        # Each failed object along with its error, which tells whether to retry it
+        self.failures: list[tuple[str, BaseException]] = []
+        self.elapsed_seconds = 0.0
+
+        self._start_time = time.monotonic()
+        self._lock = threading.Lock()
+        self._progress_bar = tqdm.tqdm(desc=description, unit="obj")
+
+    @property
+    def failed(self) -> int:
+        return len(self.failures)
+
+    @property
+    def throughput(self) -> float:
+        """Number of objects processed per second."""
+        total = self.succeeded + self.failed
+        return total / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+    def add_successes(self, count: int = 1) -> None:
+        with self._lock:
+            self.succeeded += count
+            self._progress_bar.update(count)
+
+    def add_failure(self, object_name: str, error: BaseException) -> None:
+        with self._lock:
+            self.failures.append((object_name, error))
+            self._progress_bar.update(1)
+            self._progress_bar.set_postfix(failed=len(self.failures))
+
+    def finish(self) -> "BulkOperationReport":
+        self.elapsed_seconds = time.monotonic() - self._start_time
+        self._progress_bar.close()
+        return self
+
+    def __str__(self) -> str:
+        return (
+            f"{self.description}: {self.succeeded} succeeded, {self.failed} failed"
+            f" in {self.elapsed_seconds:.1f}s ({self.throughput:.1f} objects/s)"
+        )
+
+
+def batched(items: Iterable, batch_size: int) -> Generator[list, Any, None]:
+    iterator = iter(items)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        yield batch
+
+
+class BucketClientDecorator(BucketClient):
+    """
+    BucketClient forwarding every call to a wrapped BucketClient.
+
+    Subclasses override the operations they add behavior to (caching, retries, metrics...)
+    and inherit plain delegation for the others.
+    """
+
+    def __init__(self, bucket_client: BucketClient):
+        self.bucket_client = bucket_client
+
+    def check_connection(self) -> None:
+        self.bucket_client.check_connection()
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return self.bucket_client.bucket_exists(bucket_name)
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        return self.bucket_client.folder_exists(bucket_name, folder_name)
+
+    def make_bucket(self, bucket_name: str, enable_versioning: bool):
+        return self.bucket_client.make_bucket(bucket_name, enable_versioning)
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ):
+        return self.bucket_client.upload_file(
+            bucket_name, object_name, file_path, metadata
+        )
+
+    def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO | BufferData,
+        length: int,
+        metadata: dict | None = None,
+    ):
+        return self.bucket_client.upload_data(
+            bucket_name, object_name, data, length, metadata
+        )
+
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ):
+        return self.bucket_client.list_objects(bucket_name, prefix, recursive)
+
+    def get_object(self, bucket_name: str, object_name: str):
+        return self.bucket_client.get_object(bucket_name, object_name)
+
+    def head_object(self, bucket_name: str, object_name: str) -> Object:
+        return self.bucket_client.head_object(bucket_name, object_name)
+
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        return self.bucket_client.get_object_range(
+            bucket_name, object_name, offset, length
+        )
+
+    def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> ObjectWriteResult:
+        return self.bucket_client.copy_object(
+            source_bucket_name,
+            source_object_name,
+            destination_bucket_name,
+            destination_object_name,
+        )
+
+    def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        self.bucket_client.download_folder(bucket_name, folder_name, destination_path)
+
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> BulkOperationReport:
+        return self.bucket_client.copy_objects(
+            source_bucket_name, destination_bucket_name, object_name_pairs
+        )
+
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> BulkOperationReport:
+        return self.bucket_client.remove_objects(bucket_name, prefix, object_names)
+
+
+class BufferReader:
+    """Read-only stream over an in-memory buffer, sliced without copying the whole buffer."""
+
+    def __init__(self, data: BufferData):
+        self._view = memoryview(data).cast("B")
+        self._position = 0
+
+    def read(self, size: int = -1) -> bytes:
+        end = len(self._view) if size < 0 else self._position + size
+        chunk = self._view[self._position : end].tobytes()
+        self._position += len(chunk)
+        return chunk
+
+
+def _get_file_md5(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    hasher = hashlib.md5()
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def is_local_file_up_to_date(obj: Object, local_file_path: str) -> bool:
+    """
+    Checks whether a local file already holds the content of a remote object.
+
+    Files written by `download_objects` carry the object's last modified date as mtime, so
+    they are recognized from a single `stat`. Other files are compared against the etag,
+    which is the MD5 of the content for objects that were not uploaded in multiple parts.
+
+    Args:
+        obj (Object): The remote object, as returned by a listing.
+        local_file_path (str): The path of the local file.
+
+    Returns:
+        bool: True if the local file matches the remote object.
+    """
+    try:
+        stat = os.stat(local_file_path)
+    except FileNotFoundError:
+        return False
+
+    if obj.size is None or stat.st_size != obj.size:
+        return False
+
+    if obj.last_modified is not None and int(stat.st_mtime) == int(
+        obj.last_modified.timestamp()
+    ):
+        return True
+
+    etag = (obj.etag or "").strip('"')
+    if not etag or "-" in etag:
+        # Multipart etags are not a digest of the content
+        return False
+
+    return _get_file_md5(local_file_path) == etag
+
+
+def is_empty_range(length: int) -> bool:
+    """
+    Checks the length of a byte range to read, an empty range being read without any
+    request, as backends disagree on what a zero length means.
+
+    Args:
+        length (int): The number of bytes to read.
+
+    Returns:
+        bool: True if the range is empty.
+
+    Raises:
+        ValueError: If the length is negative.
+    """
+    if length < 0:
+        raise ValueError(f"The length of a byte range can't be negative: {length}")
+    return length == 0
+
+
+def write_local_file(local_file_path: str, write: Callable[[BinaryIO], None]) -> None:
+    """
+    Writes a downloaded file to a partial file moved in place once complete, so a file
+    present locally is always a complete one.
+
+    Args:
+        local_file_path (str): The path of the local file, its directories being created.
+        write (Callable[[BinaryIO], None]): Writes the content to the given file.
+    """
+    os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+    partial_file_path = local_file_path + PARTIAL_DOWNLOAD_SUFFIX
+    with open(partial_file_path, "wb") as f:
+        write(f)
+    os.replace(partial_file_path, local_file_path)
+
+
+def download_objects(
+    objects: Iterable[Object],
+    destination_path: str,
+    fetch_object: Callable[[Object, str], None],
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> tuple[int, int]:
+    """
+    Downloads objects to `destination_path/object_name` with a bounded pool of workers.
+
+    Objects already present locally are skipped, and each download is written to a partial
+    file that is only moved in place once complete, so an interrupted run can be resumed by
+    calling this function again.
+
+    Args:
+        objects (Iterable[Object]): The objects to download, usually a listing.
+        destination_path (str): The local root folder.
+        fetch_object (Callable[[Object, str], None]): Writes an object to the given local path.
+        max_workers (int): The number of concurrent downloads.
+
+    Returns:
+        tuple[int, int]: The number of downloaded and skipped objects.
+    """
+    downloaded, skipped = 0, 0
+
+    def download(obj: Object) -> bool:
+        local_file_path = os.path.join(destination_path, obj.object_name)
+        if is_local_file_up_to_date(obj, local_file_path):
+            return False
+
+        # Create directories if they don't exist
+        os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
+
+        partial_file_path = local_file_path + PARTIAL_DOWNLOAD_SUFFIX
+        fetch_object(obj, partial_file_path)
+        os.replace(partial_file_path, local_file_path)
+
+        if obj.last_modified is not None:
+            timestamp = obj.last_modified.timestamp()
+            os.utime(local_file_path, (timestamp, timestamp))
+        return True
+
+    files = (obj for obj in objects if not obj.is_dir)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor, tqdm.tqdm(
+        desc="Downloading files"
+    ) as progress_bar:
+        for _, future in bounded_as_completed(
+            executor, download, files, max_in_flight=max_workers * 4
+        ):
+            if future.result():
+                downloaded += 1
+            else:
+                skipped += 1
+            progress_bar.set_postfix(downloaded=downloaded, skipped=skipped)
+            progress_bar.update(1)
+
+    return downloaded, skipped
+
+
+class MinioClientRegistry:
+    """
+    Process-wide registry of `Minio` instances, keyed by endpoint and credentials.
+
+    Every MinioClient built for the same endpoint and credentials shares one `Minio`
+    instance and thus one urllib3 pool of keep-alive connections, so the steps of a pipeline
+    running in the same process do not open new connections each time a bucket client is
+    materialized. Successful connection checks are remembered for a while, so validating the
+    connection at the start of each step does not cost a round trip each time.
+    """
+
+    def __init__(self):
+        # Each instance is stored along with the size of its connection pool
+        self._clients: dict[tuple, tuple[Minio, int]] = {}
+        self._connection_check_dates: dict[Minio, float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(
+        endpoint: str, access_key: str, secret_key: str, secure: bool
+    ) -> tuple:
+        return (
+            endpoint,
+            access_key,
+            hashlib.sha256(secret_key.encode()).hexdigest(),
+            secure,
+        )
+
+    def get_client(
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+    ) -> Minio:
+        """
+        Returns the `Minio` instance of these endpoint and credentials, creating it if needed.
+
+        Args:
+            endpoint (str): The MinIO endpoint, as host:port.
+            access_key (str): The access key.
+            secret_key (str): The secret key.
+            secure (bool): Whether to use TLS.
+            max_pool_connections (int): The number of connections kept alive per host. A
+                registered client whose pool is smaller is replaced by a larger one.
+
+        Returns:
+            Minio: The shared client.
+        """
+        key = self._get_key(endpoint, access_key, secret_key, secure)
+        with self._lock:
+            client, pool_size = self._clients.get(key, (None, 0))
+            if client is None or pool_size < max_pool_connections:
+                # Same settings as the MinIO SDK's default pool, except for its size
+                timeout = timedelta(minutes=5).seconds
+                http_client = urllib3.PoolManager(
+                    timeout=Timeout(connect=timeout, read=timeout),
+                    maxsize=max_pool_connections,
+                    cert_reqs="CERT_REQUIRED",
+                    ca_certs=os.environ.get("SSL_CERT_FILE") or certifi.where(),
+                    retries=Retry(
+                        total=5,
+                        backoff_factor=0.2,
+                        status_forcelist=[500, 502, 503, 504],
+                    ),
+                )
+                client = Minio(
+                    endpoint=endpoint,
+                    access_key=access_key,
+                    secret_key=secret_key,
+                    secure=secure,
+                    http_client=http_client,
+                )
+                self._clients[key] = (client, max_pool_connections)
+            return client
+
+    def check_connection(self, client: Minio, ttl: float) -> None:
+        """
+        Checks the connection with a `list_buckets` call, unless one succeeded less than `ttl`
+        seconds ago with the same client.
+
+        Args:
+            client (Minio): The client to check the connection with.
+            ttl (float): How long a successful check is trusted, in seconds.
+        """
+        with self._lock:
+            last_check_date = self._connection_check_dates.get(client)
+        if last_check_date is not None and time.monotonic() - last_check_date < ttl:
+            return
+
+        client.list_buckets()
+        with self._lock:
+            self._connection_check_dates[client] = time.monotonic()
+
+    def clear(self) -> None:
+        """Forgets every registered client, e.g. after forking or rotating credentials."""
+        with self._lock:
+            self._clients.clear()
+            self._connection_check_dates.clear()
+
+
+minio_client_registry = MinioClientRegistry()
+
 
 class MinioClient(BucketClient):
     def __init__(
-        self, endpoint: str, access_key: str, secret_key: str, secure: bool = False
+        self,
+        endpoint: str,
+        access_key: str,
+        secret_key: str,
+        secure: bool = False,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        part_size: int = DEFAULT_PART_SIZE,
+        multipart_threshold: int = DEFAULT_MULTIPART_THRESHOLD,
+        parallel_uploads: int = DEFAULT_PARALLEL_UPLOADS,
+        list_concurrency: int = DEFAULT_LIST_CONCURRENCY,
+        max_pool_connections: int = DEFAULT_MAX_POOL_CONNECTIONS,
+        connection_check_ttl: float = DEFAULT_CONNECTION_CHECK_TTL,
     ):
         self.secure = secure
+        self.max_workers = max_workers
+        self.part_size = part_size
+        self.multipart_threshold = multipart_threshold
+        self.parallel_uploads = parallel_uploads
+        self.list_concurrency = list_concurrency
+        self.max_pool_connections = max_pool_connections
+        self.connection_check_ttl = connection_check_ttl
 
-        self.client = Minio(
+        self.client = minio_client_registry.get_client(
             endpoint=endpoint,
             access_key=access_key,
             secret_key=secret_key,
             secure=self.secure,
+            max_pool_connections=max_pool_connections,
         )
 
     def check_connection(self) -> None:
         try:
-            self.client.list_buckets()
+            minio_client_registry.check_connection(
+                self.client, ttl=self.connection_check_ttl
+            )
         except S3Error as e:
             raise e
         except Exception as e:
@@ -120,44 +616,169 @@ class MinioClient(BucketClient):
                 bucket_name=bucket_name, config=VersioningConfig(ENABLED)
             )
 
+    def _get_part_size(self, length: int) -> int:
+        """
+        Picks the part size for an upload: objects below the multipart threshold are sent
+        with a single PUT, larger ones are split into parts uploaded concurrently.
+
+        Args:
+            length (int): The size of the object, in bytes.
+
+        Returns:
+            int: The part size to give to the MinIO client, 0 letting it decide.
+        """
+        if length >= self.multipart_threshold:
+            return self.part_size
+
+        # A part as large as the object means a single PUT
+        return length if length >= MIN_PART_SIZE else 0
+
     def upload_file(
         self,
         bucket_name: str,
         object_name: str,
         file_path: str,
         metadata: dict | None = None,
-    ):
-        self.client.fput_object(
+    ) -> ObjectWriteResult:
+        return self.client.fput_object(
             bucket_name=bucket_name,
             object_name=object_name,
             file_path=file_path,
             metadata=metadata,
+            part_size=self._get_part_size(os.path.getsize(file_path)),
+            num_parallel_uploads=self.parallel_uploads,
         )
 
     def upload_data(
         self,
         bucket_name: str,
         object_name: str,
-        data: BinaryIO,
+        data: BinaryIO | BufferData,
         length: int,
         metadata: dict | None = None,
-    ):
-        self.client.put_object(
+    ) -> ObjectWriteResult:
+        if isinstance(data, BufferData):
+            data = BufferReader(data)
+
+        return self.client.put_object(
             bucket_name=bucket_name,
             object_name=object_name,
             data=data,
             metadata=metadata,
             length=length,
+            part_size=self._get_part_size(length),
+            num_parallel_uploads=self.parallel_uploads,
         )
 
     def list_objects(
-        self, bucket_name: str, prefix: str | None = None
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
     ) -> Generator[Object, Any, None]:
         try:
-            return self.client.list_objects(bucket_name=bucket_name, prefix=prefix)
+            return self.client.list_objects(
+                bucket_name=bucket_name, prefix=prefix, recursive=recursive
+            )
         except S3Error as e:
             raise e
 
+    def _get_listing_roots(
+        self, bucket_name: str, prefix: str
+    ) -> tuple[list[Object], list[str]]:
+        """
+        Descends through the folders under a prefix as long as they fit in one LIST page,
+        e.g. from `{dataset}/` to `{dataset}/images/`, to find the prefixes worth sharding.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str): The prefix to descend from.
+
+        Returns:
+            tuple[list[Object], list[str]]: The objects met on the way, and the prefixes
+                holding too many entries to be listed in one page.
+        """
+        objects, roots = [], []
+        pending = [(prefix, 0)]
+
+        while pending:
+            current_prefix, depth = pending.pop()
+            if depth >= MAX_LISTING_DESCENT_DEPTH:
+                roots.append(current_prefix)
+                continue
+
+            entries = list(
+                itertools.islice(
+                    self.client.list_objects(
+                        bucket_name=bucket_name, prefix=current_prefix, recursive=False
+                    ),
+                    LIST_PAGE_SIZE,
+                )
+            )
+            if len(entries) >= LIST_PAGE_SIZE:
+                roots.append(current_prefix)
+                continue
+
+            for entry in entries:
+                if entry.is_dir:
+                    pending.append((entry.object_name, depth + 1))
+                else:
+                    objects.append(entry)
+
+        return objects, roots
+
+    def _list_shard(
+        self,
+        bucket_name: str,
+        prefix: str,
+        lower_bound: str | None,
+        upper_bound: str | None,
+    ) -> Generator[Object, Any, None]:
+        """Lists the objects under a prefix named after `lower_bound`, up to `upper_bound`."""
+        for obj in self.client.list_objects(
+            bucket_name=bucket_name,
+            prefix=prefix,
+            recursive=True,
+            start_after=lower_bound,
+        ):
+            if upper_bound is not None and obj.object_name > upper_bound:
+                return
+            yield obj
+
+    def list_objects_sharded(
+        self, bucket_name: str, prefix: str | None = None
+    ) -> Generator[Object, Any, None]:
+        """
+        Lists every object under a prefix, recursively, through concurrent LIST requests.
+
+        Large prefixes are split into key ranges starting at each hex digit, listed with
+        `list_concurrency` concurrent paginated requests whose results are merged as they
+        arrive, so the listing time no longer grows page after page with the object count.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str | None): Only list objects whose name starts with this prefix.
+
+        Yields:
+            Object: The listed objects, in no particular order.
+        """
+        if self.list_concurrency <= 1:
+            yield from self.client.list_objects(
+                bucket_name=bucket_name, prefix=prefix, recursive=True
+            )
+            return
+
+        objects, roots = self._get_listing_roots(bucket_name, prefix or "")
+        yield from objects
+
+        shards = []
+        for root in roots:
+            boundaries = [None, *(root + c for c in LISTING_SHARD_BOUNDARIES), None]
+            shards.extend(
+                functools.partial(
+                    self._list_shard, bucket_name, root, lower_bound, upper_bound
+                )
+                for lower_bound, upper_bound in itertools.pairwise(boundaries)
+            )
+        yield from merge_concurrently(shards, max_workers=self.list_concurrency)
+
     def get_object(
         self, bucket_name: str, object_name: str
     ) -> urllib3.response.BaseHTTPResponse:
@@ -168,6 +789,61 @@ class MinioClient(BucketClient):
         except S3Error as e:
             raise e
 
+    def head_object(self, bucket_name: str, object_name: str) -> Object:
+        """
+        Retrieves an object's size, etag, last modified date and metadata, without its content.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            object_name (str): Name of the object.
+
+        Returns:
+            Object: The object's information.
+        """
+        try:
+            return self.client.stat_object(
+                bucket_name=bucket_name, object_name=object_name
+            )
+        except S3Error as e:
+            raise e
+
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        """
+        Reads a byte range of an object, e.g. a file header, with a ranged GET.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            object_name (str): Name of the object.
+            offset (int): The position of the first byte to read.
+            length (int): The number of bytes to read, fewer being returned past the end.
+
+        Returns:
+            bytes: The content of the range, empty if `length` is 0.
+
+        Raises:
+            ValueError: If `length` is negative.
+        """
+        if is_empty_range(length):
+            return b""
+
+        try:
+            response = self.client.get_object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                offset=offset,
+                length=length,
+            )
+        except S3Error as e:
+            raise e
+
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
     def copy_object(
         self,
         source_bucket_name: str,
@@ -184,23 +860,141 @@ class MinioClient(BucketClient):
         except S3Error as e:
             raise e
 
+    def _write_object(self, bucket_name: str, object_name: str, file_path: str) -> None:
+        # Streamed into the partial file of `download_objects`, unlike `fget_object`,
+        # which stats the object first and writes a temporary file of its own
+        response = self.client.get_object(bucket_name, object_name)
+        try:
+            with open(file_path, "wb") as f:
+                shutil.copyfileobj(response, f, 1024 * 1024)
+        finally:
+            response.close()
+            response.release_conn()
+
     def download_folder(
         self, bucket_name: str, folder_name: str, destination_path: str
     ) -> None:
         os.makedirs(destination_path, exist_ok=True)
 
         try:
-            objects = self.client.list_objects(
-                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            download_objects(
+                objects=self.list_objects_sharded(bucket_name, prefix=folder_name),
+                destination_path=destination_path,
+                fetch_object=lambda obj, file_path: self._write_object(
+                    bucket_name, obj.object_name, file_path
+                ),
+                max_workers=self.max_workers,
             )
-            for obj in tqdm.tqdm(objects):
-                if not obj.is_dir:
-                    object_name = obj.object_name
-                    local_file_path = os.path.join(destination_path, object_name)
-
-                    # Create directories if they don't exist
-                    os.makedirs(os.path.dirname(local_file_path), exist_ok=True)
-
-                    self.client.fget_object(bucket_name, object_name, local_file_path)
         except S3Error as e:
             raise e
+
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> BulkOperationReport:
+        """
+        Copies objects server-side with `max_workers` concurrent requests.
+
+        Args:
+            source_bucket_name (str): The bucket to copy from.
+            destination_bucket_name (str): The bucket to copy to.
+            object_name_pairs (Iterable[tuple[str, str]]): Source and destination object names.
+
+        Returns:
+            BulkOperationReport: The number of copied objects and the failed ones.
+        """
+        report = BulkOperationReport(description="Copying objects")
+
+        def copy(object_name_pair: tuple[str, str]) -> None:
+            source_object_name, destination_object_name = object_name_pair
+            self.copy_object(
+                source_bucket_name=source_bucket_name,
+                source_object_name=source_object_name,
+                destination_bucket_name=destination_bucket_name,
+                destination_object_name=destination_object_name,
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for (source_object_name, _), future in bounded_as_completed(
+                executor, copy, object_name_pairs, max_in_flight=self.max_workers * 4
+            ):
+                error = future.exception()
+                if error is None:
+                    report.add_successes()
+                else:
+                    report.add_failure(source_object_name, error)
+
+        return report.finish()
+
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> BulkOperationReport:
+        """
+        Removes every object under a prefix, or the given objects, through S3 multi-object
+        delete requests of up to 1000 keys, sent with `max_workers` concurrent requests.
+
+        Args:
+            bucket_name (str): The bucket to remove objects from.
+            prefix (str | None): Remove all the objects whose name starts with this prefix.
+            object_names (Iterable[str] | None): Remove these objects.
+
+        Returns:
+            BulkOperationReport: The number of removed objects and the failed ones.
+        """
+        if (prefix is None) == (object_names is None):
+            raise ValueError("Exactly one of `prefix` or `object_names` must be given.")
+
+        if prefix is not None:
+            object_names = (
+                obj.object_name
+                for obj in self.list_objects_sharded(bucket_name, prefix=prefix)
+            )
+
+        report = BulkOperationReport(description="Removing objects")
+
+        def remove(batch: list[str]) -> list[tuple[str, S3Error]]:
+            errors = self.client.remove_objects(
+                bucket_name, (DeleteObject(object_name) for object_name in batch)
+            )
+            # Errors are yielded lazily, the requests being sent while they are consumed
+            return [
+                (
+                    error.name,
+                    S3Error(
+                        error.code,
+                        error.message,
+                        error.name,
+                        None,
+                        None,
+                        None,  # type: ignore[arg-type]
+                        bucket_name=bucket_name,
+                        object_name=error.name,
+                    ),
+                )
+                for error in errors
+            ]
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for batch, future in bounded_as_completed(
+                executor,
+                remove,
+                batched(object_names, DELETE_BATCH_SIZE),
+                max_in_flight=self.max_workers * 2,
+            ):
+                batch_error = future.exception()
+                if batch_error is not None:
+                    for object_name in batch:
+                        report.add_failure(object_name, batch_error)
+                    continue
+
+                errors = future.result()
+                for object_name, error in errors:
+                    report.add_failure(object_name, error)
+                report.add_successes(len(batch) - len(errors))
+
+        return report.finish()
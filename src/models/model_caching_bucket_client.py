@@ -0,0 +1,278 @@
+import hashlib
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from minio.datatypes import Object
+
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    BucketClientDecorator,
+    download_objects,
+    is_empty_range,
+)
+from src.models.model_local_bucket_client import LocalObjectResponse, clone_file
+
+DEFAULT_CACHE_MAX_BYTES = 10 * 1024 * 1024 * 1024
+CACHE_INDEX_FILE_NAME = "index.db"
+CACHE_OBJECTS_FOLDER_NAME = "objects"
+
+
+class CachingBucketClient(BucketClientDecorator):
+    """
+    BucketClient keeping a read-through, on-disk cache of the objects it downloads.
+
+    Cached files are keyed by bucket, object name and etag (or version id), so an object
+    that changes remotely is fetched again instead of being served stale. A SQLite index
+    tracks the size and last access of each entry, the least recently used entries being
+    evicted once the cache exceeds `max_bytes`. Both the index and the atomic moves of the
+    cached files make the cache safe to share between concurrent processes.
+    """
+
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        cache_path: str,
+        max_bytes: int = DEFAULT_CACHE_MAX_BYTES,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        super().__init__(bucket_client)
+        self.cache_path = cache_path
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self.bytes_fetched = 0
+
+        self._stats_lock = threading.Lock()
+        self._local = threading.local()
+
+        os.makedirs(
+            os.path.join(self.cache_path, CACHE_OBJECTS_FOLDER_NAME), exist_ok=True
+        )
+        with self._get_connection() as connection:
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, size INTEGER NOT NULL, last_access REAL NOT NULL)"
+            )
+            connection.execute(
+                "CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access)"
+            )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """SQLite connections cannot be shared between threads, so each thread opens its own."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(
+                os.path.join(self.cache_path, CACHE_INDEX_FILE_NAME), timeout=60
+            )
+            connection.execute("PRAGMA journal_mode=WAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _get_cache_key(obj: Object) -> str:
+        revision = obj.version_id or (obj.etag or "").strip('"')
+        return hashlib.sha256(
+            f"{obj.bucket_name}/{obj.object_name}@{revision}".encode()
+        ).hexdigest()
+
+    def _get_cached_file_path(self, cache_key: str) -> str:
+        return os.path.join(
+            self.cache_path, CACHE_OBJECTS_FOLDER_NAME, cache_key[:2], cache_key
+        )
+
+    def _is_cacheable(self, obj: Object) -> bool:
+        return bool(obj.version_id or obj.etag) and (obj.size or 0) <= self.max_bytes
+
+    def _record_hit(self, size: int) -> None:
+        with self._stats_lock:
+            self.hits += 1
+            self.bytes_saved += size
+
+    def _record_miss(self, size: int) -> None:
+        with self._stats_lock:
+            self.misses += 1
+            self.bytes_fetched += size
+
+    def _lookup(self, cache_key: str) -> str | None:
+        """Returns the path of a cached entry and marks it as recently used."""
+        cached_file_path = self._get_cached_file_path(cache_key)
+        if not os.path.isfile(cached_file_path):
+            return None
+
+        with self._get_connection() as connection:
+            connection.execute(
+                "UPDATE entries SET last_access = ? WHERE key = ?",
+                (time.time(), cache_key),
+            )
+        return cached_file_path
+
+    def _fill(self, obj: Object, cache_key: str) -> str:
+        """Downloads an object into the cache and returns the path of the cached file."""
+        cached_file_path = self._get_cached_file_path(cache_key)
+        os.makedirs(os.path.dirname(cached_file_path), exist_ok=True)
+
+        file_descriptor, temporary_path = tempfile.mkstemp(
+            dir=os.path.dirname(cached_file_path)
+        )
+        try:
+            response = self.bucket_client.get_object(obj.bucket_name, obj.object_name)
+            try:
+                with os.fdopen(file_descriptor, "wb") as f:
+                    shutil.copyfileobj(response, f, 1024 * 1024)
+            finally:
+                response.close()
+                response.release_conn()
+
+            size = os.path.getsize(temporary_path)
+            os.replace(temporary_path, cached_file_path)
+        except BaseException:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+            raise
+
+        with self._get_connection() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO entries (key, size, last_access) VALUES (?, ?, ?)",
+                (cache_key, size, time.time()),
+            )
+        self._record_miss(size)
+        self._evict()
+        return cached_file_path
+
+    def _evict(self) -> None:
+        """Removes the least recently used entries until the cache fits in `max_bytes`."""
+        connection = self._get_connection()
+        with connection:
+            # Take the write lock upfront so concurrent processes do not evict twice
+            connection.execute("BEGIN IMMEDIATE")
+            (total_size,) = connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+            if total_size <= self.max_bytes:
+                return
+
+            evicted_keys = []
+            for cache_key, size in connection.execute(
+                "SELECT key, size FROM entries ORDER BY last_access"
+            ):
+                if total_size <= self.max_bytes:
+                    break
+                evicted_keys.append(cache_key)
+                total_size -= size
+
+            connection.executemany(
+                "DELETE FROM entries WHERE key = ?", [(key,) for key in evicted_keys]
+            )
+
+        for cache_key in evicted_keys:
+            try:
+                os.remove(self._get_cached_file_path(cache_key))
+            except FileNotFoundError:
+                pass
+
+    def _get_cached_object(self, obj: Object) -> str:
+        """Returns the path of a cached copy of the object, downloading it on a miss."""
+        cache_key = self._get_cache_key(obj)
+        cached_file_path = self._lookup(cache_key)
+        if cached_file_path is None:
+            return self._fill(obj, cache_key)
+
+        self._record_hit(obj.size or os.path.getsize(cached_file_path))
+        return cached_file_path
+
+    @property
+    def stats(self) -> dict:
+        """
+        Counters of the cache's usage since this client was created.
+
+        Returns:
+            dict: The number of hits and misses, and the bytes served from the cache or fetched.
+        """
+        with self._stats_lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes_saved": self.bytes_saved,
+                "bytes_fetched": self.bytes_fetched,
+            }
+
+    def get_object(self, bucket_name: str, object_name: str):
+        obj = self.bucket_client.head_object(bucket_name, object_name)
+        if not self._is_cacheable(obj):
+            return self.bucket_client.get_object(bucket_name, object_name)
+
+        try:
+            return LocalObjectResponse(self._get_cached_object(obj))
+        except FileNotFoundError:
+            # Evicted by another process between the lookup and the open
+            return LocalObjectResponse(self._fill(obj, self._get_cache_key(obj)))
+
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        if is_empty_range(length):
+            return b""
+
+        # Ranges are read from cached copies, but never worth caching a whole object for
+        obj = self.bucket_client.head_object(bucket_name, object_name)
+        if self._is_cacheable(obj):
+            cached_file_path = self._lookup(self._get_cache_key(obj))
+            if cached_file_path is not None:
+                try:
+                    with LocalObjectResponse(
+                        cached_file_path, offset=offset, length=length
+                    ) as response:
+                        data = response.read()
+                    self._record_hit(len(data))
+                    return data
+                except FileNotFoundError:
+                    pass
+
+        return self.bucket_client.get_object_range(
+            bucket_name, object_name, offset, length
+        )
+
+    def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        os.makedirs(destination_path, exist_ok=True)
+
+        def fetch_object(obj: Object, file_path: str) -> None:
+            if not self._is_cacheable(obj):
+                response = self.bucket_client.get_object(bucket_name, obj.object_name)
+                try:
+                    with open(file_path, "wb") as f:
+                        shutil.copyfileobj(response, f, 1024 * 1024)
+                finally:
+                    response.close()
+                    response.release_conn()
+                return
+
+            # Downloaded files may be edited, so they never share an inode with the cache
+            try:
+                clone_file(
+                    self._get_cached_object(obj), file_path, allow_hardlink=False
+                )
+            except FileNotFoundError:
+                clone_file(
+                    self._fill(obj, self._get_cache_key(obj)),
+                    file_path,
+                    allow_hardlink=False,
+                )
+
+        download_objects(
+            objects=self.bucket_client.list_objects(
+                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            ),
+            destination_path=destination_path,
+            fetch_object=fetch_object,
+            max_workers=self.max_workers,
+        )
@@ -56,6 +56,33 @@ class LocalDataSource(DataSource):
                 f"The data source's '{self.root_folder_path}' is not a directory."
             )
 
+    def scan_files(self) -> list[tuple[str, int]]:
+        """
+        Lists the files of the local data source, recursively, with `os.scandir` whose
+        entries already know their type, so only the files' sizes cost a system call.
+        Like `os.walk`, symbolic links to directories are not followed.
+
+        Returns:
+            list[tuple[str, int]]: The path of each file relative to the data source's
+                folder, and its size in bytes, sorted by path.
+        """
+        files = []
+        directories = [""]
+        while directories:
+            relative_directory = directories.pop()
+            with os.scandir(
+                os.path.join(self.root_folder_path, relative_directory)
+            ) as entries:
+                for entry in entries:
+                    relative_path = os.path.join(relative_directory, entry.name)
+                    if entry.is_dir(follow_symlinks=False):
+                        directories.append(relative_path)
+                    elif entry.is_file():
+                        files.append((relative_path, entry.stat().st_size))
+
+        files.sort()
+        return files
+
     def get_metadata(self) -> DataSourceMetadata:
         """
         Retrieve metadata information for the local data source.
@@ -78,21 +105,28 @@ class HuggingFaceDataSource(DataSource):
         dataset_name: str,
         label_map: dict[int, str],
         api_token: str | None = None,
+        streaming: bool = False,
     ):
         super().__init__(root_folder_path=dataset_name, label_map=label_map)
         self.dataset_name = dataset_name
         self.api_token = api_token
+        # Read the items as they are uploaded instead of downloading the dataset first
+        self.streaming = streaming
 
     def verify_data_source_path(self) -> None:
         """
         Check if the data source's identifier exists in HuggingFace's Dataset registry.
         Raises specific exceptions based on the dataset's availability and access requirements.
+        A local directory of data files, e.g. parquet or arrow, stands in for the registry.
 
         Raises:
             ValueError: If the dataset is not valid or not found in HuggingFace's registry.
             PermissionError: If the dataset is gated and requires a private API token.
             FileNotFoundError: If there is an issue with the request or the dataset is not found.
         """
+        if os.path.isdir(self.dataset_name):
+            return
+
         headers = {}
         if self.api_token:
             headers["Authorization"] = f"Bearer {self.api_token}"
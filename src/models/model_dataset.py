@@ -1,15 +1,51 @@
+import asyncio
 import json
 import os
 import random
 import shutil
-import threading
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+import tqdm
 import ulid
 import yaml
-from PIL import Image
 
 from src.config.settings import DATASET_YOLO_CONFIG_NAME
-from src.models.model_bucket_client import BucketClient
+from src.models.model_annotation_table import (
+    ANNOTATION_TABLE_FILE_NAME,
+    AnnotationTable,
+)
+from src.models.model_async_bucket_client import AsyncBucketClient
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    batched,
+    write_local_file,
+)
+from src.models.model_dataset_manifest import (
+    MANIFEST_FILE_NAME,
+    DatasetManifest,
+    ManifestSample,
+)
+from src.models.model_shard import (
+    SHARDS_FOLDER_NAME,
+    STORAGE_LAYOUT_OBJECTS,
+    STORAGE_LAYOUT_SHARDS,
+    ShardIndex,
+    download_shards,
+)
+from src.utils.concurrency_helper import bounded_as_completed
+from src.utils.hash_helper import hash_keys, hash_to_unit_interval
+
+# Files downloaded per worker and not written yet
+IN_FLIGHT_PER_WORKER = 4
+# JSON annotations converted to YOLO format per task
+ANNOTATION_BATCH_SIZE = 256
+
+# Samples are drawn into splits at random, or assigned from a hash of their key
+SPLIT_MODE_RANDOM = "random"
+SPLIT_MODE_HASH = "hash"
+SPLIT_MODES = (SPLIT_MODE_RANDOM, SPLIT_MODE_HASH)
 
 
 class Dataset:
@@ -22,7 +58,14 @@ class Dataset:
         images_path: str = "images",
         distribution_weights: list[float] | None = None,
         label_map: dict[int, str] | None = None,
+        storage_layout: str = STORAGE_LAYOUT_OBJECTS,
+        split_mode: str = SPLIT_MODE_RANDOM,
+        manifest: DatasetManifest | None = None,
     ):
+        if split_mode not in SPLIT_MODES:
+            raise ValueError(
+                f"Unknown split mode '{split_mode}', expected one of {SPLIT_MODES}."
+            )
         if distribution_weights is None:
             distribution_weights = [0.6, 0.2, 0.2]
 
@@ -45,6 +88,10 @@ class Dataset:
         ]
 
         self.label_map = label_map or {}
+        self.storage_layout = storage_layout
+        self.split_mode = split_mode
+        # Virtual datasets list their samples' objects in the data sources instead of copies
+        self.manifest = manifest
 
     def format_bucket_image_path(self, image_file_path: str, split_name: str) -> str:
         """
@@ -76,6 +123,275 @@ class Dataset:
         annotation_filename = annotation_file_path.split("/")[-1]
         return f"{self.uuid}/{split_name}/{self.annotations_path}/{annotation_filename}"
 
+    def format_bucket_shard_prefix(self, split_name: str) -> str:
+        """
+        Formats the bucket prefix of a split's shards, for datasets stored as shards whose
+        samples hold an image and its `json` annotation.
+
+        Args:
+            split_name (str): The name of the split (train, test, or validation).
+
+        Returns:
+            str: The prefix to write the split's shards to.
+        """
+        return f"{self.uuid}/{split_name}/{SHARDS_FOLDER_NAME}"
+
+    def format_bucket_manifest_path(self) -> str:
+        """
+        Formats the bucket path of a virtual dataset's manifest.
+
+        Returns:
+            str: The manifest's object name.
+        """
+        return f"{self.uuid}/{MANIFEST_FILE_NAME}"
+
+    def format_bucket_annotation_table_path(self) -> str:
+        """
+        Formats the bucket path of the dataset's annotation table.
+
+        Returns:
+            str: The annotation table's object name.
+        """
+        return f"{self.uuid}/{ANNOTATION_TABLE_FILE_NAME}"
+
+    def create_manifest(
+        self,
+        bucket_client: BucketClient,
+        data_sources_bucket_name: str,
+        data_source_names: list[str],
+        label_remaps: dict[str, dict[int, int]] | None = None,
+        labels: list[int] | None = None,
+    ) -> DatasetManifest:
+        """
+        Makes the dataset a virtual one over data sources stored as objects: their samples
+        are listed and assigned to splits, and only the resulting manifest is uploaded to
+        the dataset's bucket, no sample being copied.
+
+        The data sources' annotation tables are merged into the dataset's one, with the
+        dataset's labels and splits, which selects the samples by label and checks the
+        labels against the dataset's label map without reading any annotation.
+
+        Args:
+            bucket_client (BucketClient): The client to list the data sources and upload with.
+            data_sources_bucket_name (str): Name of the data sources' bucket.
+            data_source_names (list[str]): The data sources to take the samples from.
+            label_remaps (dict[str, dict[int, int]] | None): Mappings from the labels of a
+                data source, keyed by its name, to the dataset's labels.
+            labels (list[int] | None): Keeps only the samples with a box of one of these
+                labels, all of them if None.
+
+        Returns:
+            DatasetManifest: The dataset's manifest.
+
+        Raises:
+            ValueError: If a data source is stored as shards, or if the dataset has a label
+                map missing some of its labels.
+        """
+        manifest = DatasetManifest.build(
+            bucket_client,
+            data_sources_bucket_name,
+            data_source_names,
+            self.assign_splits,
+            label_remaps,
+        )
+        annotation_table = self._merge_annotation_tables(
+            bucket_client,
+            data_sources_bucket_name,
+            data_source_names,
+            label_remaps or {},
+            manifest,
+        )
+
+        if labels is not None:
+            annotation_table = annotation_table.select(labels=labels)
+            selected_keys = set(annotation_table.keys.tolist())
+            manifest = DatasetManifest(
+                [sample for sample in manifest if sample.key in selected_keys],
+                manifest.label_remaps,
+            )
+        if self.label_map:
+            annotation_table.validate_label_map(self.label_map)
+
+        self.manifest = manifest
+        self.manifest.save(
+            bucket_client, self.bucket_name, self.format_bucket_manifest_path()
+        )
+        annotation_table.save(
+            bucket_client, self.bucket_name, self.format_bucket_annotation_table_path()
+        )
+        return self.manifest
+
+    @staticmethod
+    def _merge_annotation_tables(
+        bucket_client: BucketClient,
+        data_sources_bucket_name: str,
+        data_source_names: list[str],
+        label_remaps: dict[str, dict[int, int]],
+        manifest: DatasetManifest,
+    ) -> AnnotationTable:
+        """
+        Merges the annotation tables of a virtual dataset's data sources, keeping the rows
+        of the manifest's samples with their labels remapped and their splits.
+
+        Data sources uploaded before annotation tables existed have none, and their samples
+        are missing from the dataset's table until they are uploaded again.
+
+        Args:
+            bucket_client (BucketClient): The client to read the tables with.
+            data_sources_bucket_name (str): Name of the data sources' bucket.
+            data_source_names (list[str]): The dataset's data sources.
+            label_remaps (dict[str, dict[int, int]]): Mappings from the labels of a data
+                source, keyed by its name, to the dataset's labels.
+            manifest (DatasetManifest): The dataset's manifest.
+
+        Returns:
+            AnnotationTable: The dataset's annotation table.
+        """
+        tables = []
+        for data_source_name in data_source_names:
+            table = AnnotationTable.load(
+                bucket_client,
+                data_sources_bucket_name,
+                f"{data_source_name}/{ANNOTATION_TABLE_FILE_NAME}",
+            )
+            if table is not None:
+                tables.append(
+                    table.remap_labels(label_remaps.get(data_source_name, {}))
+                )
+
+        split_by_key = {sample.key: sample.split for sample in manifest}
+        return (
+            AnnotationTable.concatenate(tables)
+            .select(keys=list(split_by_key))
+            .with_splits(split_by_key)
+        )
+
+    def load_annotation_table(self, bucket_client: BucketClient) -> AnnotationTable:
+        """
+        Reads the dataset's annotation table, e.g. to compute its statistics.
+
+        Args:
+            bucket_client (BucketClient): The client to read with.
+
+        Returns:
+            AnnotationTable: The annotation table, empty if the dataset has none.
+        """
+        return (
+            AnnotationTable.load(
+                bucket_client,
+                self.bucket_name,
+                self.format_bucket_annotation_table_path(),
+            )
+            or AnnotationTable.empty()
+        )
+
+    def _get_local_path(
+        self,
+        destination_root_path: str,
+        split_name: str,
+        file_name: str,
+        yolo_layout: bool = False,
+    ) -> str:
+        """
+        Gets where a file of a split is downloaded to.
+
+        Args:
+            destination_root_path (str): The local folder the dataset is downloaded into.
+            split_name (str): The name of the split (train, test, or validation).
+            file_name (str): The name of the image or JSON annotation.
+            yolo_layout (bool): Whether to use the YOLO layout, `{images|labels}/{split}/`,
+                the annotations becoming `.txt` files, rather than the bucket's one.
+
+        Returns:
+            str: The local path of the file.
+        """
+        is_annotation = file_name.endswith(".json")
+        category = self.annotations_path if is_annotation else self.images_path
+        if not yolo_layout:
+            return os.path.join(
+                destination_root_path, self.uuid, split_name, category, file_name
+            )
+
+        if is_annotation:
+            file_name = f"{file_name[: -len('.json')]}.txt"
+        return os.path.join(
+            destination_root_path, self.uuid, category, split_name, file_name
+        )
+
+    def _get_manifest_sample_path(
+        self,
+        destination_root_path: str,
+        sample: ManifestSample,
+        extension: str,
+        yolo_layout: bool = False,
+    ) -> str:
+        """Returns where a virtual dataset's file goes, as if it was stored as objects."""
+        return self._get_local_path(
+            destination_root_path,
+            sample.split,
+            f"{sample.key}.{extension}",
+            yolo_layout,
+        )
+
+    def _get_shard_member_path(
+        self,
+        destination_root_path: str,
+        shard_object_name: str,
+        member_name: str,
+        yolo_layout: bool = False,
+    ) -> str:
+        """Returns where a shard's file goes, as if it was stored as objects."""
+        split_name = shard_object_name.split("/")[-3]
+        return self._get_local_path(
+            destination_root_path, split_name, member_name, yolo_layout
+        )
+
+    def _convert_annotation_to_yolo(self, data: bytes) -> bytes:
+        """
+        Converts a JSON annotation to its YOLO `.txt` file, boxes being stored normalized.
+
+        Args:
+            data (bytes): The JSON annotation.
+
+        Returns:
+            bytes: The content of the YOLO annotation file.
+        """
+        yolo_annotations = self._get_yolo_data_from_json_data(json.loads(data))
+        return "\n".join(yolo_annotations).encode()
+
+    def load_shard_index(
+        self, bucket_client: BucketClient, split_name: str
+    ) -> ShardIndex:
+        """
+        Reads the index of a split's shards, to read single samples with `read_sample`.
+
+        Args:
+            bucket_client (BucketClient): The client to read the indexes with.
+            split_name (str): The name of the split (train, test, or validation).
+
+        Returns:
+            ShardIndex: The index of the split's samples.
+        """
+        return ShardIndex.load(
+            bucket_client, self.bucket_name, self.format_bucket_shard_prefix(split_name)
+        )
+
+    def read_sample(
+        self, bucket_client: BucketClient, shard_index: ShardIndex, key: str
+    ) -> dict[str, bytes]:
+        """
+        Reads a single sample of a dataset stored as shards, with one ranged GET.
+
+        Args:
+            bucket_client (BucketClient): The client to read the shard with.
+            shard_index (ShardIndex): The index of the sample's split.
+            key (str): The sample's key, the name of its files without extension.
+
+        Returns:
+            dict[str, bytes]: The sample's files keyed by extension.
+        """
+        return shard_index.read_sample(bucket_client, self.bucket_name, key)
+
     @staticmethod
     def get_data_source_uuid() -> str:
         """
@@ -97,12 +413,193 @@ class Dataset:
             self.split_names, self.distribution_weights
         )[0]
 
-    def download(self, bucket_client: BucketClient, destination_root_path: str) -> None:
-        bucket_client.download_folder(
-            bucket_name=self.bucket_name,
-            folder_name=self.uuid,
-            destination_path=destination_root_path,
+    def assign_splits(self, keys: list[str]) -> list[str]:
+        """
+        Assigns samples to splits from their keys, e.g. the hashes of their images, which
+        the files of a sample share.
+
+        In hash mode, a sample's split only depends on its key, the seed and the distribution
+        weights, so it is the same whatever the order or the other samples, and a new version
+        of the dataset keeps its existing samples in their split. The keys are hashed all at
+        once. In random mode, splits are drawn with `get_next_split`, in the keys' order.
+
+        Args:
+            keys (list[str]): The keys of the samples.
+
+        Returns:
+            list[str]: The name of each sample's split.
+        """
+        if self.split_mode == SPLIT_MODE_RANDOM:
+            return [self.get_next_split() for _ in keys]
+
+        weights = np.asarray(self.distribution_weights, dtype=np.float64)
+        thresholds = np.cumsum(weights) / weights.sum()
+        split_indexes = np.searchsorted(
+            thresholds, hash_to_unit_interval(hash_keys(keys, self.seed)), side="right"
+        )
+        # Rounding may leave the last threshold just below 1
+        split_indexes = np.minimum(split_indexes, len(self.split_names) - 1)
+        return np.asarray(self.split_names)[split_indexes].tolist()
+
+    def get_split(self, key: str) -> str:
+        """
+        Assigns a single sample to a split, see `assign_splits`.
+
+        Args:
+            key (str): The key of the sample.
+
+        Returns:
+            str: The name of the sample's split.
+        """
+        return self.assign_splits([key])[0]
+
+    def download(
+        self,
+        bucket_client: BucketClient | AsyncBucketClient,
+        destination_root_path: str,
+        yolo_layout: bool = False,
+    ) -> None:
+        """
+        Downloads the dataset's objects to `destination_root_path/{uuid}`.
+
+        Shards are streamed and unpacked on the fly into the same layout as the objects'
+        one, `{uuid}/{split}/{images_path|annotations_path}/`, so the YOLO conversion works
+        on either. So are the samples of a virtual dataset, read from the data sources'
+        bucket, their labels being remapped on the way.
+
+        With `yolo_layout`, files are written straight to their place in the YOLO layout,
+        `{uuid}/{images_path|annotations_path}/{split}/`, the annotations being converted
+        as they arrive and the YOLO configuration written, so the dataset is ready for
+        training without `to_yolo_format`.
+
+        Args:
+            bucket_client (BucketClient | AsyncBucketClient): The client to download with.
+            destination_root_path (str): The local folder to download the dataset into.
+            yolo_layout (bool): Whether to download into the YOLO layout.
+        """
+        if isinstance(bucket_client, AsyncBucketClient) and (
+            yolo_layout
+            or self.manifest is not None
+            or self.storage_layout == STORAGE_LAYOUT_SHARDS
+        ):
+            raise TypeError(
+                "Virtual datasets, datasets stored as shards and downloads into the YOLO"
+                " layout are read with a BucketClient."
+            )
+
+        if self.manifest is not None:
+            self.manifest.download(
+                bucket_client,
+                get_destination_path=lambda sample, extension: (
+                    self._get_manifest_sample_path(
+                        destination_root_path, sample, extension, yolo_layout
+                    )
+                ),
+                convert_annotation=(
+                    self._convert_annotation_to_yolo if yolo_layout else None
+                ),
+            )
+        elif self.storage_layout == STORAGE_LAYOUT_SHARDS:
+            download_shards(
+                bucket_client,
+                self.bucket_name,
+                prefix=f"{self.uuid}/",
+                get_destination_path=lambda shard_object_name, member_name: (
+                    self._get_shard_member_path(
+                        destination_root_path,
+                        shard_object_name,
+                        member_name,
+                        yolo_layout,
+                    )
+                ),
+                member_converters=(
+                    {"json": self._convert_annotation_to_yolo} if yolo_layout else None
+                ),
+            )
+        elif yolo_layout:
+            self._download_objects_to_yolo(bucket_client, destination_root_path)
+        elif isinstance(bucket_client, AsyncBucketClient):
+            asyncio.run(self._download_async(bucket_client, destination_root_path))
+        else:
+            bucket_client.download_folder(
+                bucket_name=self.bucket_name,
+                folder_name=self.uuid,
+                destination_path=destination_root_path,
+            )
+
+        if yolo_layout:
+            self._create_yolo_yaml_file(
+                dataset_path=os.path.join(destination_root_path, self.uuid)
+            )
+
+    def _download_objects_to_yolo(
+        self,
+        bucket_client: BucketClient,
+        destination_root_path: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> None:
+        """
+        Downloads the objects of a dataset stored as objects into the YOLO layout, with a
+        bounded pool of workers. Files already present locally are skipped.
+
+        Args:
+            bucket_client (BucketClient): The client to download with.
+            destination_root_path (str): The local folder to download the dataset into.
+            max_workers (int): The number of concurrent downloads.
+        """
+
+        def download(object_name: str) -> None:
+            # Objects are stored as `{uuid}/{split}/{category}/{file_name}`
+            _, split_name, _, file_name = object_name.split("/")
+            local_path = self._get_local_path(
+                destination_root_path, split_name, file_name, yolo_layout=True
+            )
+            if os.path.exists(local_path):
+                return
+
+            response = bucket_client.get_object(self.bucket_name, object_name)
+            try:
+                if file_name.endswith(".json"):
+                    data = self._convert_annotation_to_yolo(response.read())
+                    write_local_file(local_path, lambda f: f.write(data))
+                else:
+                    write_local_file(
+                        local_path,
+                        lambda f: shutil.copyfileobj(response, f, 1024 * 1024),
+                    )
+            finally:
+                response.close()
+                response.release_conn()
+
+        object_names = (
+            obj.object_name
+            for obj in bucket_client.list_objects(
+                self.bucket_name, f"{self.uuid}/", recursive=True
+            )
+            if obj.object_name.count("/") == 3
+            and obj.object_name.split("/")[1] in self.split_names
         )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _, future in tqdm.tqdm(
+                bounded_as_completed(
+                    executor,
+                    download,
+                    object_names,
+                    max_in_flight=IN_FLIGHT_PER_WORKER * max_workers,
+                ),
+                desc="Downloading files",
+            ):
+                future.result()
+
+    async def _download_async(
+        self, bucket_client: AsyncBucketClient, destination_root_path: str
+    ) -> None:
+        async with bucket_client:
+            await bucket_client.download_folder(
+                bucket_name=self.bucket_name,
+                folder_name=self.uuid,
+                destination_path=destination_root_path,
+            )
 
     def to_yolo_format(self, dataset_path: str):
         """
@@ -184,83 +681,113 @@ class Dataset:
             elif key not in self.label_map:
                 self.label_map[key] = value
 
-    def _get_yolo_data_from_json_data(self, json_data, img_width, img_height) -> list:
+    def _get_yolo_data_from_json_data(self, json_data) -> list:
         """
-        Converts JSON annotation data to YOLO format.
+        Converts JSON annotation data to YOLO format, the stored boxes being normalized
+        center boxes already.
 
         Args:
             json_data (dict): JSON data containing labels and bounding boxes.
-            img_width (int): Width of the corresponding image.
-            img_height (int): Height of the corresponding image.
 
         Returns:
             list: A list of strings, each representing an object in YOLO annotation format.
         """
-        yolo_format = []
-        for i in range(len(json_data["label"])):
-            label = json_data["label"][i]
-            bbox = json_data["bbox"][i]
-            x_center, y_center, width, height = bbox
-            yolo_format.append(f"{label} {x_center} {y_center} {width} {height}")
-        return yolo_format
+        return _format_yolo_lines(json_data["label"], _get_json_data_boxes(json_data))
 
-    def _process_json_file(self, json_path, img_path) -> None:
+    def _convert_annotation_batch(self, json_paths: list[str]) -> list[Exception]:
         """
-        Processes a single JSON file and its corresponding image to produce a YOLO format annotation.
+        Converts a batch of JSON annotation files to YOLO `.txt` files, removing each
+        converted JSON file and keeping failing ones in place.
 
         Args:
-            json_path (str): The file path to the JSON file.
-            img_path (str): The file path to the corresponding image file.
+            json_paths (list[str]): The file paths to the JSON files.
 
-        Raises:
-            Exception: If there is an error in processing the file.
+        Returns:
+            list[Exception]: The errors of the files which could not be converted.
         """
-        try:
-            with open(json_path) as file:
-                json_data = json.load(file)
-
-            with Image.open(img_path) as img:
-                img_width, img_height = img.size
-
-            yolo_annotations = self._get_yolo_data_from_json_data(
-                json_data, img_width, img_height
-            )
-
-            txt_path = json_path.replace(".json", ".txt")
-            with open(txt_path, "w") as file:
-                file.write("\n".join(yolo_annotations))
-
-            os.remove(json_path)
-        except Exception as e:
-            raise Exception(f"Error processing {json_path}") from e
+        errors = []
+        for json_path in json_paths:
+            try:
+                with open(json_path) as file:
+                    yolo_annotations = self._get_yolo_data_from_json_data(
+                        json.load(file)
+                    )
 
-    def _convert_annotations_to_yolo_format(self, dataset_path) -> None:
+                txt_path = json_path.replace(".json", ".txt")
+                with open(txt_path, "w") as file:
+                    file.write("\n".join(yolo_annotations))
+                os.remove(json_path)
+            except Exception as e:
+                errors.append(_get_processing_error(json_path, e))
+        return errors
+
+    def _convert_annotations_to_yolo_format(
+        self, dataset_path, max_workers: int = DEFAULT_MAX_WORKERS
+    ) -> None:
         """
         Converts JSON labels in a dataset to YOLO format.
 
         This function walks through a dataset directory, finds all JSON files,
         converts their labels to YOLO format, and writes them to `.txt` files.
-        It uses multithreading to process multiple files simultaneously.
+        Files are converted in batches by a bounded pool of workers, and the errors
+        of every batch are raised together once all files are processed.
 
         Args:
             dataset_path (str): The root path of the dataset.
+            max_workers (int): The number of batches converted concurrently.
+
+        Raises:
+            ExceptionGroup: If some files could not be converted.
 
         Usage Example:
             to_yolo_format('path/to/your/dataset_name')
         """
-        threads = []
-        for root, _, files in os.walk(dataset_path):
-            for file in files:
-                if file.endswith(".json"):
-                    json_path = os.path.join(root, file)
-                    img_path = json_path.replace("labels", "images").replace(
-                        ".json", ".png"
-                    )
-                    thread = threading.Thread(
-                        target=self._process_json_file, args=(json_path, img_path)
-                    )
-                    threads.append(thread)
-                    thread.start()
+        json_paths = [
+            os.path.join(root, file)
+            for root, _, files in os.walk(dataset_path)
+            for file in files
+            if file.endswith(".json")
+        ]
+
+        errors = []
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _, future in bounded_as_completed(
+                executor,
+                self._convert_annotation_batch,
+                batched(json_paths, ANNOTATION_BATCH_SIZE),
+                max_in_flight=2 * max_workers,
+            ):
+                errors.extend(future.result())
+
+        if errors:
+            raise ExceptionGroup(
+                f"Error converting {len(errors)} annotations to YOLO format", errors
+            )
+
+
+def _get_json_data_boxes(json_data: dict) -> np.ndarray:
+    """
+    Reads the boxes of a JSON annotation, as `x_center, y_center, width, height` rows.
+    """
+    boxes = np.asarray(json_data["bbox"], dtype=np.float64).reshape(-1, 4)
+    if len(boxes) != len(json_data["label"]):
+        raise ValueError(
+            f"Annotation has {len(json_data['label'])} labels but {len(boxes)} boxes."
+        )
+    return boxes
+
+
+def _format_yolo_lines(labels: list[int], boxes: np.ndarray) -> list[str]:
+    """
+    Formats labels and their normalized boxes as the lines of a YOLO annotation file.
+    """
+    return [
+        f"{label} {x_center} {y_center} {width} {height}"
+        for label, (x_center, y_center, width, height) in zip(labels, boxes.tolist())
+    ]
+
 
-        for thread in threads:
-            thread.join()
+def _get_processing_error(json_path: str, error: Exception) -> Exception:
+    processing_error = Exception(f"Error processing {json_path}")
+    processing_error.__cause__ = error
+    return processing_error
@@ -0,0 +1,387 @@
+import gzip
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterator
+
+import tqdm
+from minio.datatypes import Object
+
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    write_local_file,
+)
+from src.models.model_shard import SHARDS_FOLDER_NAME
+from src.utils.concurrency_helper import bounded_as_completed
+
+MANIFEST_FILE_NAME = "manifest.jsonl.gz"
+MANIFEST_VERSION = 1
+# Samples downloaded per worker and not written yet
+IN_FLIGHT_PER_WORKER = 4
+
+
+def _get_etag(obj: Object) -> str | None:
+    return (obj.etag or "").strip('"') or None
+
+
+class ManifestSample:
+    """A sample of a virtual dataset, referencing its objects in a data source's bucket."""
+
+    def __init__(
+        self,
+        key: str,
+        split: str,
+        bucket_name: str,
+        image_object_name: str,
+        annotation_object_name: str,
+        label_remap: str | None = None,
+        image_etag: str | None = None,
+        annotation_etag: str | None = None,
+    ):
+        self.key = key
+        self.split = split
+        self.bucket_name = bucket_name
+        self.image_object_name = image_object_name
+        self.annotation_object_name = annotation_object_name
+        # Name of the manifest's label remapping applied to the annotation, if any
+        self.label_remap = label_remap
+        # Etags of the objects when the manifest was built, telling if they changed since
+        self.image_etag = image_etag
+        self.annotation_etag = annotation_etag
+
+    @property
+    def image_extension(self) -> str:
+        return self.image_object_name.rpartition(".")[2]
+
+    def to_dict(self) -> dict:
+        return {
+            "key": self.key,
+            "split": self.split,
+            "bucket": self.bucket_name,
+            "image": self.image_object_name,
+            "annotation": self.annotation_object_name,
+            "label_remap": self.label_remap,
+            "image_etag": self.image_etag,
+            "annotation_etag": self.annotation_etag,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ManifestSample":
+        return cls(
+            key=data["key"],
+            split=data["split"],
+            bucket_name=data["bucket"],
+            image_object_name=data["image"],
+            annotation_object_name=data["annotation"],
+            label_remap=data.get("label_remap"),
+            image_etag=data.get("image_etag"),
+            annotation_etag=data.get("annotation_etag"),
+        )
+
+
+class DatasetManifest:
+    """
+    The list of a virtual dataset's samples, stored as a single gzip-compressed JSON lines
+    object instead of copies of the samples' objects.
+
+    The first line holds the manifest's version and its label remappings, named mappings
+    from the labels of a data source's annotations to the dataset's labels, and each
+    following line is a sample. Creating a dataset variant only writes a new manifest, the
+    objects being read from the data sources' bucket when the dataset is downloaded.
+    """
+
+    def __init__(
+        self,
+        samples: list[ManifestSample] | None = None,
+        label_remaps: dict[str, dict[int, int]] | None = None,
+    ):
+        self.samples = samples or []
+        self.label_remaps = label_remaps or {}
+
+    def __len__(self) -> int:
+        return len(self.samples)
+
+    def __iter__(self) -> Iterator[ManifestSample]:
+        return iter(self.samples)
+
+    def add(self, sample: ManifestSample) -> None:
+        self.samples.append(sample)
+
+    def get_split_counts(self) -> dict[str, int]:
+        """
+        Counts the samples of each split.
+
+        Returns:
+            dict[str, int]: The number of samples keyed by split.
+        """
+        split_counts: dict[str, int] = {}
+        for sample in self.samples:
+            split_counts[sample.split] = split_counts.get(sample.split, 0) + 1
+        return split_counts
+
+    def to_bytes(self) -> bytes:
+        """
+        Serializes the manifest to gzip-compressed JSON lines.
+
+        Returns:
+            bytes: The compressed manifest.
+        """
+        header = {
+            "version": MANIFEST_VERSION,
+            "label_remaps": {
+                name: {str(label): new_label for label, new_label in remap.items()}
+                for name, remap in self.label_remaps.items()
+            },
+        }
+        lines = [json.dumps(header)]
+        lines.extend(json.dumps(sample.to_dict()) for sample in self.samples)
+        # A fixed modification time keeps identical manifests byte for byte identical
+        return gzip.compress(("\n".join(lines) + "\n").encode(), mtime=0)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "DatasetManifest":
+        """
+        Deserializes a manifest written by `to_bytes`.
+
+        Args:
+            data (bytes): The compressed manifest.
+
+        Returns:
+            DatasetManifest: The manifest.
+
+        Raises:
+            ValueError: If the manifest was written by a newer version.
+        """
+        lines = gzip.decompress(data).decode().splitlines()
+        header = json.loads(lines[0])
+        if header["version"] > MANIFEST_VERSION:
+            raise ValueError(
+                f"Unsupported manifest version {header['version']}, expected at most"
+                f" {MANIFEST_VERSION}."
+            )
+
+        return cls(
+            samples=[ManifestSample.from_dict(json.loads(line)) for line in lines[1:]],
+            label_remaps={
+                name: {int(label): new_label for label, new_label in remap.items()}
+                for name, remap in header["label_remaps"].items()
+            },
+        )
+
+    def save(
+        self, bucket_client: BucketClient, bucket_name: str, object_name: str
+    ) -> None:
+        """
+        Uploads the manifest as a single object.
+
+        Args:
+            bucket_client (BucketClient): The client to upload with.
+            bucket_name (str): Name of the bucket.
+            object_name (str): The manifest's object name.
+        """
+        data = self.to_bytes()
+        bucket_client.upload_data(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            data=data,
+            length=len(data),
+        )
+
+    @classmethod
+    def load(
+        cls, bucket_client: BucketClient, bucket_name: str, object_name: str
+    ) -> "DatasetManifest":
+        """
+        Reads a manifest uploaded by `save`.
+
+        Args:
+            bucket_client (BucketClient): The client to read with.
+            bucket_name (str): Name of the bucket.
+            object_name (str): The manifest's object name.
+
+        Returns:
+            DatasetManifest: The manifest.
+        """
+        response = bucket_client.get_object(bucket_name, object_name)
+        try:
+            return cls.from_bytes(response.read())
+        finally:
+            response.close()
+            response.release_conn()
+
+    @classmethod
+    def build(
+        cls,
+        bucket_client: BucketClient,
+        bucket_name: str,
+        data_source_names: list[str],
+        assign_splits: Callable[[list[str]], list[str]],
+        label_remaps: dict[str, dict[int, int]] | None = None,
+    ) -> "DatasetManifest":
+        """
+        Lists the samples of data sources stored as objects, i.e. an image under `images/`
+        and its annotation under `annotations/` sharing their name, and assigns them to splits.
+
+        Only the data sources are listed, no object is read or copied, the etags of the
+        listed objects being recorded. A sample found in several data sources is kept once,
+        from the first of them.
+
+        Args:
+            bucket_client (BucketClient): The client to list the objects with.
+            bucket_name (str): Name of the data sources' bucket.
+            data_source_names (list[str]): The data sources to take the samples from.
+            assign_splits (Callable[[list[str]], list[str]]): Gets the splits of samples from
+                their keys, e.g. `Dataset.assign_splits`.
+            label_remaps (dict[str, dict[int, int]] | None): Mappings from the labels of a
+                data source, keyed by its name, to the dataset's labels.
+
+        Returns:
+            DatasetManifest: The manifest of the samples.
+
+        Raises:
+            ValueError: If a data source is stored as shards, whose samples are not objects.
+        """
+        label_remaps = label_remaps or {}
+        sample_objects: dict[str, tuple[Object, Object, str]] = {}
+
+        for data_source_name in data_source_names:
+            if bucket_client.folder_exists(
+                bucket_name, f"{data_source_name}/{SHARDS_FOLDER_NAME}"
+            ):
+                raise ValueError(
+                    f"The data source '{data_source_name}' is stored as shards, which"
+                    " manifests cannot reference."
+                )
+
+            annotation_objects = {
+                obj.object_name.rpartition("/")[2][: -len(".json")]: obj
+                for obj in bucket_client.list_objects(
+                    bucket_name, f"{data_source_name}/annotations/", recursive=True
+                )
+                if obj.object_name.endswith(".json")
+            }
+            for obj in bucket_client.list_objects(
+                bucket_name, f"{data_source_name}/images/", recursive=True
+            ):
+                key = obj.object_name.rpartition("/")[2].partition(".")[0]
+                if key in sample_objects or key not in annotation_objects:
+                    continue
+                sample_objects[key] = (obj, annotation_objects[key], data_source_name)
+
+        manifest = cls(label_remaps=label_remaps)
+        keys = list(sample_objects)
+        for key, split in zip(keys, assign_splits(keys)):
+            image_object, annotation_object, data_source_name = sample_objects[key]
+            manifest.add(
+                ManifestSample(
+                    key=key,
+                    split=split,
+                    bucket_name=bucket_name,
+                    image_object_name=image_object.object_name,
+                    annotation_object_name=annotation_object.object_name,
+                    label_remap=(
+                        data_source_name if data_source_name in label_remaps else None
+                    ),
+                    image_etag=_get_etag(image_object),
+                    annotation_etag=_get_etag(annotation_object),
+                )
+            )
+        return manifest
+
+    def remap_annotation(self, sample: ManifestSample, data: bytes) -> bytes:
+        """
+        Applies a sample's label remapping to its annotation.
+
+        Args:
+            sample (ManifestSample): The sample.
+            data (bytes): The sample's JSON annotation, as stored.
+
+        Returns:
+            bytes: The annotation with the dataset's labels.
+        """
+        if sample.label_remap is None:
+            return data
+
+        label_remap = self.label_remaps[sample.label_remap]
+        annotation = json.loads(data)
+        annotation["label"] = [
+            label_remap.get(label, label) for label in annotation["label"]
+        ]
+        return json.dumps(annotation).encode()
+
+    def download(
+        self,
+        bucket_client: BucketClient,
+        get_destination_path: Callable[[ManifestSample, str], str],
+        convert_annotation: Callable[[bytes], bytes] | None = None,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ) -> int:
+        """
+        Downloads the samples' images and annotations, remapping the annotations' labels.
+
+        Files already present locally are skipped, and each file is written to a partial
+        file moved in place once complete, so an interrupted download can be resumed.
+
+        Args:
+            bucket_client (BucketClient): The client to download with.
+            get_destination_path (Callable[[ManifestSample, str], str]): Returns the local
+                path of a sample's file from the sample and the file's extension.
+            convert_annotation (Callable[[bytes], bytes] | None): Converts the remapped
+                annotations before they are written, e.g. to another format.
+            max_workers (int): The number of samples downloaded concurrently.
+
+        Returns:
+            int: The number of files downloaded.
+        """
+
+        def download_sample(sample: ManifestSample) -> int:
+            downloaded = 0
+
+            image_path = get_destination_path(sample, sample.image_extension)
+            if not os.path.exists(image_path):
+                response = bucket_client.get_object(
+                    sample.bucket_name, sample.image_object_name
+                )
+                try:
+                    write_local_file(
+                        image_path,
+                        lambda f: shutil.copyfileobj(response, f, 1024 * 1024),
+                    )
+                finally:
+                    response.close()
+                    response.release_conn()
+                downloaded += 1
+
+            annotation_path = get_destination_path(sample, "json")
+            if not os.path.exists(annotation_path):
+                response = bucket_client.get_object(
+                    sample.bucket_name, sample.annotation_object_name
+                )
+                try:
+                    data = self.remap_annotation(sample, response.read())
+                finally:
+                    response.close()
+                    response.release_conn()
+                if convert_annotation is not None:
+                    data = convert_annotation(data)
+                write_local_file(annotation_path, lambda f: f.write(data))
+                downloaded += 1
+
+            return downloaded
+
+        downloaded = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for _, future in tqdm.tqdm(
+                bounded_as_completed(
+                    executor,
+                    download_sample,
+                    self.samples,
+                    max_in_flight=IN_FLIGHT_PER_WORKER * max_workers,
+                ),
+                total=len(self.samples),
+                desc="Downloading samples",
+            ):
+                downloaded += future.result()
+        return downloaded
@@ -0,0 +1,454 @@
+import bisect
+import json
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Generator, Iterable
+
+from minio.datatypes import Object
+
+from src.models.model_bucket_client import (
+    BucketClient,
+    BucketClientDecorator,
+    BufferData,
+    BulkOperationReport,
+)
+
+# Upper bounds of the latency histogram's buckets, in seconds
+LATENCY_BUCKETS = (
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+    math.inf,
+)
+METRICS_PREFIX = "bucket_client"
+
+
+class OperationMetrics:
+    """Counters and latency histogram of one kind of BucketClient call."""
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.items = 0
+        self.item_errors = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.latency_sum = 0.0
+        self.latency_max = 0.0
+        self.latency_buckets = [0] * len(LATENCY_BUCKETS)
+
+    def observe(self, seconds: float, error: bool) -> None:
+        self.count += 1
+        self.errors += int(error)
+        self.latency_sum += seconds
+        self.latency_max = max(self.latency_max, seconds)
+        self.latency_buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+
+    def latency_quantile(self, q: float) -> float:
+        """
+        Estimates a latency quantile from the histogram, as the upper bound of its bucket.
+
+        Args:
+            q (float): The quantile, between 0 and 1.
+
+        Returns:
+            float: The estimated latency, in seconds, capped by the slowest call.
+        """
+        rank = q * self.count
+        cumulated_count = 0
+        for upper_bound, bucket_count in zip(LATENCY_BUCKETS, self.latency_buckets):
+            cumulated_count += bucket_count
+            if cumulated_count >= rank and bucket_count:
+                return min(upper_bound, self.latency_max)
+        return self.latency_max
+
+    def to_dict(self, elapsed_seconds: float) -> dict:
+        return {
+            "count": self.count,
+            "errors": self.errors,
+            "error_rate": self.errors / self.count if self.count else 0.0,
+            "items": self.items,
+            "item_errors": self.item_errors,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "throughput_bytes_per_second": (
+                (self.bytes_in + self.bytes_out) / elapsed_seconds
+                if elapsed_seconds
+                else 0.0
+            ),
+            "latency_sum": self.latency_sum,
+            "latency_mean": self.latency_sum / self.count if self.count else 0.0,
+            "latency_p50": self.latency_quantile(0.5),
+            "latency_p95": self.latency_quantile(0.95),
+            "latency_p99": self.latency_quantile(0.99),
+            "latency_max": self.latency_max,
+            "latency_buckets": dict(
+                zip(map(str, LATENCY_BUCKETS), self.latency_buckets)
+            ),
+        }
+
+
+class BucketClientMetrics:
+    """
+    Thread-safe registry of the metrics of a BucketClient's calls, per operation, along with
+    the number of calls in flight.
+    """
+
+    def __init__(self):
+        self._operations: dict[str, OperationMetrics] = {}
+        self._lock = threading.Lock()
+        self._start_time = time.monotonic()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _get_operation(self, operation: str) -> OperationMetrics:
+        if operation not in self._operations:
+            self._operations[operation] = OperationMetrics()
+        return self._operations[operation]
+
+    @contextmanager
+    def track(self, operation: str) -> Generator[None, None, None]:
+        """Measures a call's latency and outcome, and counts it as in flight meanwhile."""
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+
+        start = time.monotonic()
+        error = False
+        try:
+            yield
+        except GeneratorExit:
+            # A listing closed before its end did not fail
+            raise
+        except BaseException:
+            error = True
+            raise
+        finally:
+            seconds = time.monotonic() - start
+            with self._lock:
+                self.in_flight -= 1
+                self._get_operation(operation).observe(seconds, error)
+
+    def add(
+        self,
+        operation: str,
+        bytes_in: int = 0,
+        bytes_out: int = 0,
+        items: int = 0,
+        item_errors: int = 0,
+    ) -> None:
+        with self._lock:
+            metrics = self._get_operation(operation)
+            metrics.bytes_in += bytes_in
+            metrics.bytes_out += bytes_out
+            metrics.items += items
+            metrics.item_errors += item_errors
+
+    def reset(self) -> None:
+        with self._lock:
+            self._operations.clear()
+            self._start_time = time.monotonic()
+            self.max_in_flight = self.in_flight
+
+    def snapshot(self) -> dict:
+        """
+        Returns:
+            dict: The metrics of every operation, and the concurrency, since the last reset.
+        """
+        with self._lock:
+            elapsed_seconds = time.monotonic() - self._start_time
+            return {
+                "elapsed_seconds": elapsed_seconds,
+                "in_flight": self.in_flight,
+                "max_in_flight": self.max_in_flight,
+                "operations": {
+                    operation: metrics.to_dict(elapsed_seconds)
+                    for operation, metrics in sorted(self._operations.items())
+                },
+            }
+
+    def to_flat_dict(self) -> dict[str, float]:
+        """
+        Returns:
+            dict[str, float]: The scalar metrics keyed as `{operation}.{metric}`, e.g. to be
+                logged to an experiment tracker.
+        """
+        snapshot = self.snapshot()
+        flat_metrics = {
+            "elapsed_seconds": snapshot["elapsed_seconds"],
+            "max_in_flight": snapshot["max_in_flight"],
+        }
+        for operation, metrics in snapshot["operations"].items():
+            for name, value in metrics.items():
+                if not isinstance(value, dict):
+                    flat_metrics[f"{operation}.{name}"] = value
+        return flat_metrics
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot(), indent=2)
+
+    def to_prometheus(self) -> str:
+        """
+        Returns:
+            str: The metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        operations = snapshot["operations"]
+        lines = []
+
+        def add_header(name: str, metric_type: str, help_text: str) -> None:
+            lines.append(f"# HELP {METRICS_PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {METRICS_PREFIX}_{name} {metric_type}")
+
+        counters = (
+            ("requests_total", "count", "Number of calls."),
+            ("errors_total", "errors", "Number of failed calls."),
+            ("items_total", "items", "Number of objects listed, copied or removed."),
+            (
+                "item_errors_total",
+                "item_errors",
+                "Number of objects failed in bulk calls.",
+            ),
+            ("received_bytes_total", "bytes_in", "Number of bytes downloaded."),
+            ("sent_bytes_total", "bytes_out", "Number of bytes uploaded."),
+        )
+        for name, key, help_text in counters:
+            add_header(name, "counter", help_text)
+            for operation, metrics in operations.items():
+                lines.append(
+                    f'{METRICS_PREFIX}_{name}{{operation="{operation}"}} {metrics[key]}'
+                )
+
+        add_header("latency_seconds", "histogram", "Latency of the calls.")
+        for operation, metrics in operations.items():
+            cumulated_count = 0
+            for upper_bound, bucket_count in zip(
+                LATENCY_BUCKETS, metrics["latency_buckets"].values()
+            ):
+                cumulated_count += bucket_count
+                le = "+Inf" if math.isinf(upper_bound) else upper_bound
+                lines.append(
+                    f"{METRICS_PREFIX}_latency_seconds_bucket"
+                    f'{{operation="{operation}",le="{le}"}} {cumulated_count}'
+                )
+            lines.append(
+                f'{METRICS_PREFIX}_latency_seconds_sum{{operation="{operation}"}}'
+                f" {metrics['latency_sum']}"
+            )
+            lines.append(
+                f'{METRICS_PREFIX}_latency_seconds_count{{operation="{operation}"}}'
+                f" {metrics['count']}"
+            )
+
+        add_header("in_flight", "gauge", "Number of calls in progress.")
+        lines.append(f"{METRICS_PREFIX}_in_flight {snapshot['in_flight']}")
+        add_header("max_in_flight", "gauge", "Highest number of calls in progress.")
+        lines.append(f"{METRICS_PREFIX}_max_in_flight {snapshot['max_in_flight']}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self) -> str:
+        """
+        Returns:
+            str: A human-readable table of the metrics of every operation.
+        """
+        snapshot = self.snapshot()
+        lines = [
+            f"Bucket client calls over {snapshot['elapsed_seconds']:.1f}s"
+            f" (max {snapshot['max_in_flight']} in flight):"
+        ]
+        for operation, metrics in snapshot["operations"].items():
+            lines.append(
+                f"  {operation}: {metrics['count']} calls, {metrics['errors']} errors,"
+                f" {metrics['items']} items, {metrics['bytes_in'] / 1e6:.1f} MB in,"
+                f" {metrics['bytes_out'] / 1e6:.1f} MB out,"
+                f" p50 {metrics['latency_p50'] * 1000:.0f}ms,"
+                f" p99 {metrics['latency_p99'] * 1000:.0f}ms,"
+                f" max {metrics['latency_max'] * 1000:.0f}ms"
+            )
+        return "\n".join(lines)
+
+
+class CountingResponse:
+    """Proxy of an object's response counting the bytes read from it."""
+
+    def __init__(self, response, metrics: BucketClientMetrics, operation: str):
+        self._response = response
+        self._metrics = metrics
+        self._operation = operation
+
+    def read(self, *args, **kwargs) -> bytes:
+        data = self._response.read(*args, **kwargs)
+        self._metrics.add(self._operation, bytes_in=len(data))
+        return data
+
+    def stream(self, *args, **kwargs) -> Generator[bytes, Any, None]:
+        for data in self._response.stream(*args, **kwargs):
+            self._metrics.add(self._operation, bytes_in=len(data))
+            yield data
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._response, name)
+
+    def __enter__(self) -> "CountingResponse":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self._response.close()
+
+
+class InstrumentedBucketClient(BucketClientDecorator):
+    """
+    BucketClient recording the count, latency, errors and bytes transferred of each call,
+    and the number of calls in flight.
+
+    Folder downloads are measured as a whole: their latency and outcome are recorded, but
+    the bytes they transfer are only known to the wrapped client.
+    """
+
+    def __init__(self, bucket_client: BucketClient):
+        super().__init__(bucket_client)
+        self.metrics = BucketClientMetrics()
+
+    def check_connection(self) -> None:
+        with self.metrics.track("check_connection"):
+            self.bucket_client.check_connection()
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        with self.metrics.track("bucket_exists"):
+            return self.bucket_client.bucket_exists(bucket_name)
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        with self.metrics.track("folder_exists"):
+            return self.bucket_client.folder_exists(bucket_name, folder_name)
+
+    def make_bucket(self, bucket_name: str, enable_versioning: bool):
+        with self.metrics.track("make_bucket"):
+            return self.bucket_client.make_bucket(bucket_name, enable_versioning)
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ):
+        with self.metrics.track("upload_file"):
+            result = self.bucket_client.upload_file(
+                bucket_name, object_name, file_path, metadata
+            )
+        self.metrics.add("upload_file", bytes_out=os.path.getsize(file_path))
+        return result
+
+    def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO | BufferData,
+        length: int,
+        metadata: dict | None = None,
+    ):
+        with self.metrics.track("upload_data"):
+            result = self.bucket_client.upload_data(
+                bucket_name, object_name, data, length, metadata
+            )
+        self.metrics.add("upload_data", bytes_out=length)
+        return result
+
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> Generator[Object, Any, None]:
+        # The listing is measured until it is exhausted or closed
+        with self.metrics.track("list_objects"):
+            for obj in self.bucket_client.list_objects(bucket_name, prefix, recursive):
+                self.metrics.add("list_objects", items=1)
+                yield obj
+
+    def get_object(self, bucket_name: str, object_name: str) -> CountingResponse:
+        # Measured until the response's headers are received, the body being read later
+        with self.metrics.track("get_object"):
+            response = self.bucket_client.get_object(bucket_name, object_name)
+        return CountingResponse(response, self.metrics, "get_object")
+
+    def head_object(self, bucket_name: str, object_name: str) -> Object:
+        with self.metrics.track("head_object"):
+            return self.bucket_client.head_object(bucket_name, object_name)
+
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        with self.metrics.track("get_object_range"):
+            data = self.bucket_client.get_object_range(
+                bucket_name, object_name, offset, length
+            )
+        self.metrics.add("get_object_range", bytes_in=len(data))
+        return data
+
+    def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ):
+        with self.metrics.track("copy_object"):
+            return self.bucket_client.copy_object(
+                source_bucket_name,
+                source_object_name,
+                destination_bucket_name,
+                destination_object_name,
+            )
+
+    def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        with self.metrics.track("download_folder"):
+            self.bucket_client.download_folder(
+                bucket_name, folder_name, destination_path
+            )
+
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> BulkOperationReport:
+        with self.metrics.track("copy_objects"):
+            report = self.bucket_client.copy_objects(
+                source_bucket_name, destination_bucket_name, object_name_pairs
+            )
+        self.metrics.add(
+            "copy_objects",
+            items=report.succeeded + report.failed,
+            item_errors=report.failed,
+        )
+        return report
+
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> BulkOperationReport:
+        with self.metrics.track("remove_objects"):
+            report = self.bucket_client.remove_objects(
+                bucket_name, prefix, object_names
+            )
+        self.metrics.add(
+            "remove_objects",
+            items=report.succeeded + report.failed,
+            item_errors=report.failed,
+        )
+        return report
@@ -0,0 +1,568 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Generator, Iterable
+
+import ulid
+from minio.datatypes import Object
+from minio.helpers import ObjectWriteResult
+from urllib3 import HTTPHeaderDict
+
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    BufferData,
+    BulkOperationReport,
+    download_objects,
+    is_empty_range,
+)
+from src.utils.concurrency_helper import bounded_as_completed
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not available on Windows
+    fcntl = None
+
+# ioctl request cloning a file's extents (copy-on-write) on btrfs, XFS, ...
+FICLONE = 0x40049409
+
+BUCKET_CONFIG_FILE_NAME = ".bucket.json"
+METADATA_FOLDER_NAME = ".metadata"
+VERSIONS_FOLDER_NAME = ".versions"
+TEMPORARY_FOLDER_NAME = ".tmp"
+RESERVED_NAMES = (
+    BUCKET_CONFIG_FILE_NAME,
+    METADATA_FOLDER_NAME,
+    VERSIONS_FOLDER_NAME,
+    TEMPORARY_FOLDER_NAME,
+)
+
+
+def clone_file(
+    source_path: str, destination_path: str, allow_hardlink: bool = True
+) -> None:
+    """
+    Makes `destination_path` hold the content of `source_path` as cheaply as possible.
+
+    A reflink (copy-on-write clone) is tried first, then a hardlink, then a regular copy.
+    Hardlinks share writes with the source, so they are only safe when neither file is
+    ever modified in place.
+
+    Args:
+        source_path (str): The file to clone.
+        destination_path (str): The path of the clone, replaced if it exists.
+        allow_hardlink (bool): Whether a hardlink may be used when reflinks are not supported.
+    """
+    if os.path.lexists(destination_path):
+        os.remove(destination_path)
+
+    if fcntl is not None:
+        try:
+            with open(source_path, "rb") as source, open(
+                destination_path, "wb"
+            ) as destination:
+                fcntl.ioctl(destination.fileno(), FICLONE, source.fileno())
+            return
+        except OSError:
+            os.remove(destination_path)
+
+    if allow_hardlink:
+        try:
+            os.link(source_path, destination_path)
+            return
+        except OSError:
+            pass
+
+    shutil.copyfile(source_path, destination_path)
+
+
+class LocalObjectResponse:
+    """File-backed stand-in for the HTTP response returned by `MinioClient.get_object`."""
+
+    def __init__(self, file_path: str, offset: int = 0, length: int | None = None):
+        self._file = open(file_path, "rb")
+        self._file.seek(offset)
+        self._remaining = length
+
+    def read(self, amt: int | None = None) -> bytes:
+        if self._remaining is not None:
+            amt = self._remaining if amt is None else min(amt, self._remaining)
+        data = self._file.read(-1 if amt is None else amt)
+        if self._remaining is not None:
+            self._remaining -= len(data)
+        return data
+
+    def stream(self, amt: int = 64 * 1024) -> Generator[bytes, Any, None]:
+        while data := self.read(amt):
+            yield data
+
+    def close(self) -> None:
+        self._file.close()
+
+    def release_conn(self) -> None:
+        pass
+
+    def __enter__(self) -> "LocalObjectResponse":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+
+class LocalFsBucketClient(BucketClient):
+    """
+    BucketClient storing buckets as folders of a local directory tree.
+
+    Objects live at `{root_path}/{bucket_name}/{object_name}`, next to hidden folders
+    holding a JSON metadata sidecar per object and, for versioned buckets, the previous
+    versions of each object. Objects are always written to a temporary file and moved in
+    place, never modified in place, so copies and downloads can share the stored files
+    through reflinks or hardlinks.
+    """
+
+    def __init__(self, root_path: str, max_workers: int = DEFAULT_MAX_WORKERS):
+        # Absolute, so the folders walked by `list_objects` compare equal to the bucket's
+        self.root_path = os.path.abspath(root_path)
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+
+    def _get_bucket_path(self, bucket_name: str) -> str:
+        return os.path.join(self.root_path, bucket_name)
+
+    def _get_object_path(self, bucket_name: str, object_name: str) -> str:
+        return os.path.join(self.root_path, bucket_name, object_name)
+
+    def _get_metadata_path(self, bucket_name: str, object_name: str) -> str:
+        return os.path.join(
+            self.root_path, bucket_name, METADATA_FOLDER_NAME, f"{object_name}.json"
+        )
+
+    def _get_version_path(
+        self, bucket_name: str, object_name: str, version_id: str
+    ) -> str:
+        return os.path.join(
+            self.root_path, bucket_name, VERSIONS_FOLDER_NAME, object_name, version_id
+        )
+
+    def _is_versioning_enabled(self, bucket_name: str) -> bool:
+        config_path = os.path.join(
+            self._get_bucket_path(bucket_name), BUCKET_CONFIG_FILE_NAME
+        )
+        try:
+            with open(config_path) as f:
+                return json.load(f).get("versioning", False)
+        except FileNotFoundError:
+            return False
+
+    def _read_object_info(self, bucket_name: str, object_name: str) -> dict:
+        try:
+            with open(self._get_metadata_path(bucket_name, object_name)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            # Object written without sidecar, e.g. a file dropped in the bucket's folder
+            object_path = self._get_object_path(bucket_name, object_name)
+            stat = os.stat(object_path)
+            return {
+                "etag": None,
+                "size": stat.st_size,
+                "last_modified": datetime.fromtimestamp(
+                    stat.st_mtime, tz=timezone.utc
+                ).isoformat(),
+                "version_id": None,
+                "metadata": {},
+            }
+
+    def _to_object(self, bucket_name: str, object_name: str) -> Object:
+        info = self._read_object_info(bucket_name, object_name)
+        return Object(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            last_modified=datetime.fromisoformat(info["last_modified"]),
+            etag=info["etag"],
+            size=info["size"],
+            metadata=info["metadata"],
+            version_id=info["version_id"],
+            is_latest="true",
+        )
+
+    def _check_bucket(self, bucket_name: str) -> None:
+        if not self.bucket_exists(bucket_name):
+            raise FileNotFoundError(f"The bucket '{bucket_name}' does not exist.")
+
+    def _make_temporary_path(self, bucket_name: str) -> str:
+        temporary_folder = os.path.join(
+            self._get_bucket_path(bucket_name), TEMPORARY_FOLDER_NAME
+        )
+        os.makedirs(temporary_folder, exist_ok=True)
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=temporary_folder)
+        os.close(file_descriptor)
+        return temporary_path
+
+    def _commit_object(
+        self,
+        bucket_name: str,
+        object_name: str,
+        temporary_path: str,
+        etag: str,
+        metadata: dict | None = None,
+    ) -> ObjectWriteResult:
+        """
+        Moves a fully written temporary file in place and writes its metadata sidecar.
+        On versioned buckets the current version is kept under the versions folder.
+        """
+        object_path = self._get_object_path(bucket_name, object_name)
+        metadata_path = self._get_metadata_path(bucket_name, object_name)
+        versioning_enabled = self._is_versioning_enabled(bucket_name)
+
+        info = {
+            "etag": etag,
+            "size": os.path.getsize(temporary_path),
+            "last_modified": datetime.now(tz=timezone.utc).isoformat(),
+            "version_id": str(ulid.new()) if versioning_enabled else None,
+            "metadata": {str(k): str(v) for k, v in (metadata or {}).items()},
+        }
+
+        with self._lock:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.makedirs(os.path.dirname(metadata_path), exist_ok=True)
+
+            if versioning_enabled and os.path.exists(object_path):
+                self._archive_current_version(bucket_name, object_name)
+
+            os.replace(temporary_path, object_path)
+            with open(metadata_path, "w") as f:
+                json.dump(info, f)
+
+        return ObjectWriteResult(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            version_id=info["version_id"],
+            etag=etag,
+            http_headers=HTTPHeaderDict(),
+            last_modified=datetime.fromisoformat(info["last_modified"]),
+        )
+
+    def _archive_current_version(self, bucket_name: str, object_name: str) -> None:
+        info = self._read_object_info(bucket_name, object_name)
+        version_id = info["version_id"] or "null"
+        version_path = self._get_version_path(bucket_name, object_name, version_id)
+        os.makedirs(os.path.dirname(version_path), exist_ok=True)
+
+        os.replace(self._get_object_path(bucket_name, object_name), version_path)
+        with open(f"{version_path}.json", "w") as f:
+            json.dump(info, f)
+
+    def _write_stream(self, bucket_name: str, stream: BinaryIO) -> tuple[str, str]:
+        temporary_path = self._make_temporary_path(bucket_name)
+        hasher = hashlib.md5()
+        with open(temporary_path, "wb") as f:
+            for chunk in iter(lambda: stream.read(1024 * 1024), b""):
+                hasher.update(chunk)
+                f.write(chunk)
+        return temporary_path, hasher.hexdigest()
+
+    def check_connection(self) -> None:
+        if not os.path.isdir(self.root_path):
+            raise ConnectionError(
+                f"The local bucket root '{self.root_path}' is not a directory."
+            )
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return os.path.isdir(self._get_bucket_path(bucket_name))
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        if not folder_name.endswith("/"):
+            folder_name += "/"
+
+        for _ in self.list_objects(bucket_name=bucket_name, prefix=folder_name):
+            return True
+        return False
+
+    def make_bucket(self, bucket_name: str, enable_versioning: bool):
+        bucket_path = self._get_bucket_path(bucket_name)
+        os.makedirs(bucket_path, exist_ok=True)
+        with open(os.path.join(bucket_path, BUCKET_CONFIG_FILE_NAME), "w") as f:
+            json.dump({"versioning": enable_versioning}, f)
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ) -> ObjectWriteResult:
+        self._check_bucket(bucket_name)
+        with open(file_path, "rb") as f:
+            temporary_path, etag = self._write_stream(bucket_name, f)
+        return self._commit_object(
+            bucket_name, object_name, temporary_path, etag, metadata
+        )
+
+    def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO | BufferData,
+        length: int,
+        metadata: dict | None = None,
+    ) -> ObjectWriteResult:
+        self._check_bucket(bucket_name)
+        if isinstance(data, BufferData):
+            temporary_path = self._make_temporary_path(bucket_name)
+            with open(temporary_path, "wb") as f:
+                f.write(data)
+            etag = hashlib.md5(data).hexdigest()
+        else:
+            temporary_path, etag = self._write_stream(bucket_name, data)
+        return self._commit_object(
+            bucket_name, object_name, temporary_path, etag, metadata
+        )
+
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> Generator[Object, Any, None]:
+        self._check_bucket(bucket_name)
+        prefix = prefix or ""
+        bucket_path = self._get_bucket_path(bucket_name)
+
+        # Only walk the deepest folder that can contain keys starting with the prefix
+        base_folder = prefix.rsplit("/", 1)[0] if "/" in prefix else ""
+        object_names = []
+        for current_directory, directory_names, file_names in os.walk(
+            os.path.normpath(os.path.join(bucket_path, base_folder))
+        ):
+            if current_directory == bucket_path:
+                directory_names[:] = [
+                    name for name in directory_names if name not in RESERVED_NAMES
+                ]
+                file_names = [name for name in file_names if name not in RESERVED_NAMES]
+
+            relative_directory = os.path.relpath(current_directory, bucket_path)
+            for file_name in file_names:
+                object_name = (
+                    file_name
+                    if relative_directory == "."
+                    else f"{relative_directory}/{file_name}".replace(os.sep, "/")
+                )
+                if object_name.startswith(prefix):
+                    object_names.append(object_name)
+
+        emitted_folders = set()
+        for object_name in sorted(object_names):
+            remainder = object_name[len(prefix) :]
+            if not recursive and "/" in remainder:
+                folder_name = prefix + remainder[: remainder.index("/") + 1]
+                if folder_name not in emitted_folders:
+                    emitted_folders.add(folder_name)
+                    yield Object(bucket_name=bucket_name, object_name=folder_name)
+                continue
+
+            yield self._to_object(bucket_name, object_name)
+
+    def get_object(
+        self, bucket_name: str, object_name: str, version_id: str | None = None
+    ) -> LocalObjectResponse:
+        self._check_bucket(bucket_name)
+        object_path = self._get_object_path(bucket_name, object_name)
+
+        if version_id is not None:
+            current_version_id = self._read_object_info(bucket_name, object_name)[
+                "version_id"
+            ]
+            if version_id != current_version_id:
+                object_path = self._get_version_path(
+                    bucket_name, object_name, version_id
+                )
+
+        if not os.path.isfile(object_path):
+            raise FileNotFoundError(
+                f"The object '{object_name}' does not exist in bucket '{bucket_name}'."
+            )
+        return LocalObjectResponse(object_path)
+
+    def head_object(self, bucket_name: str, object_name: str) -> Object:
+        self._check_bucket(bucket_name)
+        if not os.path.isfile(self._get_object_path(bucket_name, object_name)):
+            raise FileNotFoundError(
+                f"The object '{object_name}' does not exist in bucket '{bucket_name}'."
+            )
+        return self._to_object(bucket_name, object_name)
+
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        if is_empty_range(length):
+            return b""
+
+        self._check_bucket(bucket_name)
+        object_path = self._get_object_path(bucket_name, object_name)
+        if not os.path.isfile(object_path):
+            raise FileNotFoundError(
+                f"The object '{object_name}' does not exist in bucket '{bucket_name}'."
+            )
+
+        with LocalObjectResponse(object_path, offset=offset, length=length) as response:
+            return response.read()
+
+    def list_object_versions(self, bucket_name: str, object_name: str) -> list[Object]:
+        """
+        Lists the current and previous versions of an object, latest first.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            object_name (str): Name of the object.
+
+        Returns:
+            list[Object]: The versions of the object.
+        """
+        versions = []
+        versions_folder = os.path.dirname(
+            self._get_version_path(bucket_name, object_name, "_")
+        )
+        if os.path.isdir(versions_folder):
+            for file_name in os.listdir(versions_folder):
+                if file_name.endswith(".json"):
+                    with open(os.path.join(versions_folder, file_name)) as f:
+                        info = json.load(f)
+                    versions.append(
+                        Object(
+                            bucket_name=bucket_name,
+                            object_name=object_name,
+                            last_modified=datetime.fromisoformat(info["last_modified"]),
+                            etag=info["etag"],
+                            size=info["size"],
+                            metadata=info["metadata"],
+                            version_id=info["version_id"],
+                            is_latest="false",
+                        )
+                    )
+        versions.sort(key=lambda version: version.last_modified, reverse=True)
+
+        if os.path.isfile(self._get_object_path(bucket_name, object_name)):
+            versions.insert(0, self._to_object(bucket_name, object_name))
+        return versions
+
+    def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> ObjectWriteResult:
+        self._check_bucket(destination_bucket_name)
+        source_info = self._read_object_info(source_bucket_name, source_object_name)
+
+        temporary_path = self._make_temporary_path(destination_bucket_name)
+        clone_file(
+            self._get_object_path(source_bucket_name, source_object_name),
+            temporary_path,
+        )
+        return self._commit_object(
+            destination_bucket_name,
+            destination_object_name,
+            temporary_path,
+            source_info["etag"],
+            source_info["metadata"],
+        )
+
+    def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        os.makedirs(destination_path, exist_ok=True)
+
+        # Downloaded files get their own modification time and may be edited, so they
+        # never share an inode with the stored objects
+        download_objects(
+            objects=self.list_objects(
+                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            ),
+            destination_path=destination_path,
+            fetch_object=lambda obj, file_path: clone_file(
+                self._get_object_path(bucket_name, obj.object_name),
+                file_path,
+                allow_hardlink=False,
+            ),
+            max_workers=self.max_workers,
+        )
+
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> BulkOperationReport:
+        report = BulkOperationReport(description="Copying objects")
+
+        def copy(object_name_pair: tuple[str, str]) -> None:
+            source_object_name, destination_object_name = object_name_pair
+            self.copy_object(
+                source_bucket_name=source_bucket_name,
+                source_object_name=source_object_name,
+                destination_bucket_name=destination_bucket_name,
+                destination_object_name=destination_object_name,
+            )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for (source_object_name, _), future in bounded_as_completed(
+                executor, copy, object_name_pairs, max_in_flight=self.max_workers * 4
+            ):
+                error = future.exception()
+                if error is None:
+                    report.add_successes()
+                else:
+                    report.add_failure(source_object_name, error)
+
+        return report.finish()
+
+    def _remove_object(self, bucket_name: str, object_name: str) -> None:
+        """
+        Removes an object. On versioned buckets the current version is kept under the
+        versions folder, like an S3 delete marker hiding it from listings.
+        """
+        object_path = self._get_object_path(bucket_name, object_name)
+        if not os.path.isfile(object_path):
+            raise FileNotFoundError(
+                f"The object '{object_name}' does not exist in bucket '{bucket_name}'."
+            )
+
+        with self._lock:
+            if self._is_versioning_enabled(bucket_name):
+                self._archive_current_version(bucket_name, object_name)
+            else:
+                os.remove(object_path)
+
+            metadata_path = self._get_metadata_path(bucket_name, object_name)
+            if os.path.exists(metadata_path):
+                os.remove(metadata_path)
+
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> BulkOperationReport:
+        if (prefix is None) == (object_names is None):
+            raise ValueError("Exactly one of `prefix` or `object_names` must be given.")
+
+        if prefix is not None:
+            object_names = [
+                obj.object_name
+                for obj in self.list_objects(
+                    bucket_name=bucket_name, prefix=prefix, recursive=True
+                )
+            ]
+
+        report = BulkOperationReport(description="Removing objects")
+        for object_name in object_names:
+            try:
+                self._remove_object(bucket_name, object_name)
+                report.add_successes()
+            except OSError as e:
+                report.add_failure(object_name, e)
+
+        return report.finish()
@@ -0,0 +1,644 @@
+import json
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Generator, Iterable
+
+from minio.datatypes import Object
+from minio.helpers import ObjectWriteResult
+
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    BucketClientDecorator,
+    BufferData,
+    BulkOperationReport,
+)
+from src.utils.concurrency_helper import bounded_as_completed
+
+
+def _get_prefix_upper_bound(prefix: str) -> str:
+    """The smallest string greater than every string starting with `prefix`."""
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class ObjectCatalog:
+    """
+    Local SQLite index of the objects stored in the datalake's buckets.
+
+    Each object is recorded with its size, etag and last modified date, and optionally the
+    data source it belongs to, its split, its set of labels and free-form metadata, so
+    existence checks, deduplication and dataset selection are indexed queries instead of
+    bucket listings. The catalog is filled incrementally by `CatalogBucketClient` and by the
+    uploader, and `reconcile` brings a prefix back in sync with a bucket.
+    """
+
+    def __init__(self, database_path: str):
+        self.database_path = database_path
+        self._local = threading.local()
+
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        with self._get_connection() as connection:
+            connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS objects (
+                    bucket TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    size INTEGER,
+                    etag TEXT,
+                    last_modified TEXT,
+                    data_source_uuid TEXT,
+                    split TEXT,
+                    metadata TEXT,
+                    PRIMARY KEY (bucket, key)
+                );
+                CREATE INDEX IF NOT EXISTS objects_etag ON objects (etag);
+                CREATE INDEX IF NOT EXISTS objects_data_source
+                    ON objects (data_source_uuid, split);
+                CREATE TABLE IF NOT EXISTS object_labels (
+                    bucket TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    label TEXT NOT NULL,
+                    PRIMARY KEY (bucket, key, label)
+                );
+                CREATE INDEX IF NOT EXISTS object_labels_label ON object_labels (label);
+                CREATE TABLE IF NOT EXISTS reconciled_prefixes (
+                    bucket TEXT NOT NULL,
+                    prefix TEXT NOT NULL,
+                    reconciliation_date TEXT NOT NULL,
+                    PRIMARY KEY (bucket, prefix)
+                );
+                """
+            )
+
+    def _get_connection(self) -> sqlite3.Connection:
+        """SQLite connections cannot be shared between threads, so each thread opens its own."""
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.database_path, timeout=60)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+    @staticmethod
+    def _get_prefix_clause(prefix: str | None) -> tuple[str, list]:
+        if not prefix:
+            return "", []
+        return " AND key >= ? AND key < ?", [prefix, _get_prefix_upper_bound(prefix)]
+
+    def record(
+        self,
+        bucket_name: str,
+        object_name: str,
+        size: int | None = None,
+        etag: str | None = None,
+        last_modified: datetime | None = None,
+        data_source_uuid: str | None = None,
+        split: str | None = None,
+        labels: Iterable | None = None,
+        metadata: dict | None = None,
+    ) -> None:
+        """
+        Adds an object to the catalog, or updates it. Fields left to None keep their value.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            object_name (str): Name of the object.
+            size (int | None): Size of the object, in bytes.
+            etag (str | None): Etag of the object.
+            last_modified (datetime | None): Last modification date of the object.
+            data_source_uuid (str | None): UUID of the data source the object comes from.
+            split (str | None): Split of the object, e.g. "train".
+            labels (Iterable | None): Labels annotated on the object.
+            metadata (dict | None): Any other JSON-serializable information.
+        """
+        with self._get_connection() as connection:
+            connection.execute(
+                """
+                INSERT INTO objects VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (bucket, key) DO UPDATE SET
+                    size = COALESCE(excluded.size, size),
+                    etag = COALESCE(excluded.etag, etag),
+                    last_modified = COALESCE(excluded.last_modified, last_modified),
+                    data_source_uuid = COALESCE(excluded.data_source_uuid, data_source_uuid),
+                    split = COALESCE(excluded.split, split),
+                    metadata = COALESCE(excluded.metadata, metadata)
+                """,
+                (
+                    bucket_name,
+                    object_name,
+                    size,
+                    (etag or "").strip('"') or None,
+                    last_modified.isoformat() if last_modified else None,
+                    data_source_uuid,
+                    split,
+                    json.dumps(metadata, default=str) if metadata is not None else None,
+                ),
+            )
+            if labels is not None:
+                connection.execute(
+                    "DELETE FROM object_labels WHERE bucket = ? AND key = ?",
+                    (bucket_name, object_name),
+                )
+                connection.executemany(
+                    "INSERT INTO object_labels VALUES (?, ?, ?)",
+                    [(bucket_name, object_name, str(label)) for label in set(labels)],
+                )
+
+    def record_copy(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> bool:
+        """
+        Records a copy of a cataloged object, with the source's size, etag, data source,
+        split, metadata and labels.
+
+        Args:
+            source_bucket_name (str): Name of the source bucket.
+            source_object_name (str): Name of the source object.
+            destination_bucket_name (str): Name of the destination bucket.
+            destination_object_name (str): Name of the copy.
+
+        Returns:
+            bool: Whether the source object was cataloged, nothing being recorded otherwise.
+        """
+        with self._get_connection() as connection:
+            cursor = connection.execute(
+                """
+                INSERT OR REPLACE INTO objects
+                SELECT ?, ?, size, etag, ?, data_source_uuid, split, metadata
+                FROM objects WHERE bucket = ? AND key = ?
+                """,
+                (
+                    destination_bucket_name,
+                    destination_object_name,
+                    datetime.now(tz=timezone.utc).isoformat(),
+                    source_bucket_name,
+                    source_object_name,
+                ),
+            )
+            if not cursor.rowcount:
+                return False
+
+            connection.execute(
+                """
+                INSERT OR REPLACE INTO object_labels
+                SELECT ?, ?, label FROM object_labels WHERE bucket = ? AND key = ?
+                """,
+                (
+                    destination_bucket_name,
+                    destination_object_name,
+                    source_bucket_name,
+                    source_object_name,
+                ),
+            )
+        return True
+
+    def forget(self, bucket_name: str, object_names: Iterable[str]) -> None:
+        """
+        Removes objects from the catalog.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            object_names (Iterable[str]): Names of the removed objects.
+        """
+        rows = [(bucket_name, object_name) for object_name in object_names]
+        with self._get_connection() as connection:
+            connection.executemany(
+                "DELETE FROM objects WHERE bucket = ? AND key = ?", rows
+            )
+            connection.executemany(
+                "DELETE FROM object_labels WHERE bucket = ? AND key = ?", rows
+            )
+
+    def is_reconciled(self, bucket_name: str, prefix: str | None = None) -> bool:
+        """
+        Whether a reconciliation covered this prefix, in which case the catalog is a
+        complete view of it as long as writes go through a `CatalogBucketClient`.
+        """
+        prefix = prefix or ""
+        for (reconciled_prefix,) in self._get_connection().execute(
+            "SELECT prefix FROM reconciled_prefixes WHERE bucket = ?", (bucket_name,)
+        ):
+            if prefix.startswith(reconciled_prefix):
+                return True
+        return False
+
+    def object_exists(self, bucket_name: str, object_name: str) -> bool:
+        row = (
+            self._get_connection()
+            .execute(
+                "SELECT 1 FROM objects WHERE bucket = ? AND key = ?",
+                (bucket_name, object_name),
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        if not folder_name.endswith("/"):
+            folder_name += "/"
+
+        prefix_clause, parameters = self._get_prefix_clause(folder_name)
+        row = (
+            self._get_connection()
+            .execute(
+                f"SELECT 1 FROM objects WHERE bucket = ?{prefix_clause} LIMIT 1",
+                [bucket_name, *parameters],
+            )
+            .fetchone()
+        )
+        return row is not None
+
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> Generator[Object, Any, None]:
+        """
+        Lists the cataloged objects under a prefix, with the same semantics as a bucket listing.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str | None): Only list objects whose name starts with this prefix.
+            recursive (bool): List all the objects rather than emulating folders.
+
+        Yields:
+            Object: The cataloged objects, and the folders when not recursive.
+        """
+        prefix = prefix or ""
+        prefix_clause, parameters = self._get_prefix_clause(prefix)
+        rows = self._get_connection().execute(
+            "SELECT key, size, etag, last_modified, metadata FROM objects"
+            f" WHERE bucket = ?{prefix_clause} ORDER BY key",
+            [bucket_name, *parameters],
+        )
+
+        last_folder_name = None
+        for object_name, size, etag, last_modified, metadata in rows:
+            remainder = object_name[len(prefix) :]
+            if not recursive and "/" in remainder:
+                folder_name = prefix + remainder[: remainder.index("/") + 1]
+                if folder_name != last_folder_name:
+                    last_folder_name = folder_name
+                    yield Object(bucket_name=bucket_name, object_name=folder_name)
+                continue
+
+            yield Object(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                last_modified=(
+                    datetime.fromisoformat(last_modified) if last_modified else None
+                ),
+                etag=etag,
+                size=size,
+                metadata=json.loads(metadata) if metadata else None,
+            )
+
+    def find_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        data_source_uuid: str | None = None,
+        split: str | None = None,
+        labels: Iterable | None = None,
+    ) -> list[str]:
+        """
+        Selects objects by data source, split and labels, e.g. to build a dataset.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            prefix (str | None): Only select objects whose name starts with this prefix.
+            data_source_uuid (str | None): Only select objects of this data source.
+            split (str | None): Only select objects of this split.
+            labels (Iterable | None): Only select objects annotated with one of these labels.
+
+        Returns:
+            list[str]: The names of the selected objects.
+        """
+        prefix_clause, parameters = self._get_prefix_clause(prefix)
+        query = f"SELECT key FROM objects WHERE bucket = ?{prefix_clause}"
+        parameters = [bucket_name, *parameters]
+
+        if data_source_uuid is not None:
+            query += " AND data_source_uuid = ?"
+            parameters.append(data_source_uuid)
+        if split is not None:
+            query += " AND split = ?"
+            parameters.append(split)
+        if labels is not None:
+            labels = [str(label) for label in labels]
+            query += (
+                " AND key IN (SELECT key FROM object_labels WHERE bucket = ?"
+                f" AND label IN ({', '.join('?' * len(labels))}))"
+            )
+            parameters.extend([bucket_name, *labels])
+
+        return [
+            key
+            for (key,) in self._get_connection().execute(
+                query + " ORDER BY key", parameters
+            )
+        ]
+
+    def find_duplicates(self, etag: str) -> list[tuple[str, str]]:
+        """
+        Finds the objects having a given etag, i.e. the same content for single-part uploads.
+
+        Args:
+            etag (str): The etag to look for.
+
+        Returns:
+            list[tuple[str, str]]: The bucket and name of each matching object.
+        """
+        return (
+            self._get_connection()
+            .execute(
+                "SELECT bucket, key FROM objects WHERE etag = ?", (etag.strip('"'),)
+            )
+            .fetchall()
+        )
+
+    def reconcile(
+        self, bucket_client: BucketClient, bucket_name: str, prefix: str | None = None
+    ) -> tuple[int, int]:
+        """
+        Brings the catalog in sync with a bucket: listed objects are recorded, keeping their
+        data source, split and labels, and cataloged objects missing from the bucket are removed.
+
+        Args:
+            bucket_client (BucketClient): The client to list the bucket with.
+            bucket_name (str): Name of the bucket.
+            prefix (str | None): Only reconcile objects whose name starts with this prefix.
+
+        Returns:
+            tuple[int, int]: The number of listed objects and of removed catalog entries.
+        """
+        prefix = prefix or ""
+        connection = self._get_connection()
+        connection.execute(
+            "CREATE TEMP TABLE IF NOT EXISTS listed_keys (key TEXT PRIMARY KEY)"
+        )
+        connection.execute("DELETE FROM listed_keys")
+
+        listed = 0
+        rows = []
+        for obj in bucket_client.list_objects(
+            bucket_name=bucket_name, prefix=prefix, recursive=True
+        ):
+            if obj.is_dir:
+                continue
+            rows.append(
+                (
+                    bucket_name,
+                    obj.object_name,
+                    obj.size,
+                    (obj.etag or "").strip('"') or None,
+                    obj.last_modified.isoformat() if obj.last_modified else None,
+                )
+            )
+            if len(rows) >= 10000:
+                listed += self._record_listed_rows(rows)
+                rows = []
+        listed += self._record_listed_rows(rows)
+
+        prefix_clause, parameters = self._get_prefix_clause(prefix)
+        with connection:
+            stale_keys = [
+                key
+                for (key,) in connection.execute(
+                    f"SELECT key FROM objects WHERE bucket = ?{prefix_clause}"
+                    " AND key NOT IN (SELECT key FROM listed_keys)",
+                    [bucket_name, *parameters],
+                )
+            ]
+            connection.execute(
+                "INSERT OR REPLACE INTO reconciled_prefixes VALUES (?, ?, ?)",
+                (bucket_name, prefix, datetime.now(tz=timezone.utc).isoformat()),
+            )
+        self.forget(bucket_name, stale_keys)
+
+        return listed, len(stale_keys)
+
+    def _record_listed_rows(self, rows: list[tuple]) -> int:
+        with self._get_connection() as connection:
+            connection.executemany(
+                """
+                INSERT INTO objects (bucket, key, size, etag, last_modified)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (bucket, key) DO UPDATE SET
+                    size = excluded.size,
+                    etag = excluded.etag,
+                    last_modified = excluded.last_modified
+                """,
+                rows,
+            )
+            connection.executemany(
+                "INSERT OR IGNORE INTO listed_keys VALUES (?)",
+                [(row[1],) for row in rows],
+            )
+        return len(rows)
+
+
+class CatalogBucketClient(BucketClientDecorator):
+    """
+    BucketClient recording its writes in an ObjectCatalog, and answering existence checks
+    and listings from it.
+
+    Listings are only served from the catalog for prefixes covered by a reconciliation;
+    a folder missing from the catalog is still looked up in the bucket.
+    """
+
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        catalog: ObjectCatalog,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        super().__init__(bucket_client)
+        self.catalog = catalog
+        # Concurrent lookups of the copies of objects missing from the catalog
+        self.max_workers = max_workers
+
+    def _record_write(
+        self,
+        bucket_name: str,
+        object_name: str,
+        result: ObjectWriteResult | None,
+        size: int | None,
+        metadata: dict | None = None,
+    ) -> None:
+        self.catalog.record(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            size=size,
+            etag=result.etag if result is not None else None,
+            last_modified=(
+                (result.last_modified or datetime.now(tz=timezone.utc))
+                if result is not None
+                else None
+            ),
+            metadata=metadata,
+        )
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        if self.catalog.folder_exists(bucket_name, folder_name):
+            return True
+        if self.catalog.is_reconciled(bucket_name, folder_name):
+            return False
+        return self.bucket_client.folder_exists(bucket_name, folder_name)
+
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ):
+        if self.catalog.is_reconciled(bucket_name, prefix):
+            return self.catalog.list_objects(bucket_name, prefix, recursive)
+        return self.bucket_client.list_objects(bucket_name, prefix, recursive)
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ):
+        result = self.bucket_client.upload_file(
+            bucket_name, object_name, file_path, metadata
+        )
+        self._record_write(
+            bucket_name, object_name, result, os.path.getsize(file_path), metadata
+        )
+        return result
+
+    def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO | BufferData,
+        length: int,
+        metadata: dict | None = None,
+    ):
+        result = self.bucket_client.upload_data(
+            bucket_name, object_name, data, length, metadata
+        )
+        self._record_write(bucket_name, object_name, result, length, metadata)
+        return result
+
+    def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> ObjectWriteResult:
+        result = self.bucket_client.copy_object(
+            source_bucket_name,
+            source_object_name,
+            destination_bucket_name,
+            destination_object_name,
+        )
+        self._record_copy(
+            source_bucket_name,
+            source_object_name,
+            destination_bucket_name,
+            destination_object_name,
+        )
+        return result
+
+    def _record_copy(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ) -> None:
+        """
+        Records a copy, carrying over what the catalog knows about the source object, or
+        what the bucket reports about the copy when the source is not cataloged.
+        """
+        if self.catalog.record_copy(
+            source_bucket_name,
+            source_object_name,
+            destination_bucket_name,
+            destination_object_name,
+        ):
+            return
+
+        self._record_stat(
+            destination_bucket_name,
+            destination_object_name,
+            self.bucket_client.head_object(
+                destination_bucket_name, destination_object_name
+            ),
+        )
+
+    def _record_stat(self, bucket_name: str, object_name: str, obj: Object) -> None:
+        self.catalog.record(
+            bucket_name=bucket_name,
+            object_name=object_name,
+            size=obj.size,
+            etag=obj.etag,
+            last_modified=obj.last_modified or datetime.now(tz=timezone.utc),
+        )
+
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> BulkOperationReport:
+        object_name_pairs = list(object_name_pairs)
+        report = self.bucket_client.copy_objects(
+            source_bucket_name, destination_bucket_name, object_name_pairs
+        )
+
+        failed_object_names = {object_name for object_name, _ in report.failures}
+        uncataloged_object_names = [
+            destination_object_name
+            for source_object_name, destination_object_name in object_name_pairs
+            if source_object_name not in failed_object_names
+            and not self.catalog.record_copy(
+                source_bucket_name,
+                source_object_name,
+                destination_bucket_name,
+                destination_object_name,
+            )
+        ]
+        if not uncataloged_object_names:
+            return report
+
+        # The copies of objects missing from the catalog are looked up in the bucket
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for object_name, future in bounded_as_completed(
+                executor,
+                lambda object_name: self.bucket_client.head_object(
+                    destination_bucket_name, object_name
+                ),
+                uncataloged_object_names,
+                max_in_flight=self.max_workers * 4,
+            ):
+                self._record_stat(destination_bucket_name, object_name, future.result())
+        return report
+
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> BulkOperationReport:
+        if object_names is not None:
+            object_names = list(object_names)
+        report = self.bucket_client.remove_objects(bucket_name, prefix, object_names)
+
+        if object_names is None:
+            object_names = list(self.catalog.find_objects(bucket_name, prefix=prefix))
+        failed_object_names = {object_name for object_name, _ in report.failures}
+        self.catalog.forget(
+            bucket_name,
+            (name for name in object_names if name not in failed_object_names),
+        )
+        return report
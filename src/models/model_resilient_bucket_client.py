@@ -0,0 +1,527 @@
+import collections
+import os
+import random
+import shutil
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, BinaryIO, Callable, Generator, Iterable
+
+import urllib3
+from minio import S3Error
+from minio.datatypes import Object
+from minio.error import InvalidResponseError, ServerError
+
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    BucketClientDecorator,
+    BufferData,
+    BulkOperationReport,
+    download_objects,
+)
+
+DEFAULT_MAX_ATTEMPTS = 4
+DEFAULT_BASE_DELAY = 0.1
+DEFAULT_MAX_DELAY = 5.0
+DEFAULT_REQUEST_TIMEOUT = 60.0
+DEFAULT_HEDGE_PERCENTILE = 0.95
+# Transfers small enough to be given a deadline, and reads small enough to be hedged
+DEFAULT_SMALL_OBJECT_MAX_SIZE = 1024 * 1024
+# Latencies kept to estimate the hedging threshold, and needed before hedging at all
+LATENCY_WINDOW_SIZE = 1000
+LATENCY_MIN_SAMPLES = 50
+
+# Errors worth another attempt: the server is overloaded, restarting or lost a quorum
+RETRYABLE_S3_ERROR_CODES = frozenset(
+    {
+        "InternalError",
+        "RequestTimeout",
+        "ServiceUnavailable",
+        "SlowDown",
+        "XMinioServerNotInitialized",
+        "XMinioReadQuorum",
+        "XMinioWriteQuorum",
+    }
+)
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Tells transient failures, worth retrying, from errors a retry would only repeat.
+
+    Args:
+        error (BaseException): The error raised by a bucket client.
+
+    Returns:
+        bool: Whether the operation may succeed if retried.
+    """
+    if isinstance(error, S3Error):
+        return error.code in RETRYABLE_S3_ERROR_CODES
+    if isinstance(error, ServerError):
+        return error.status_code >= 500
+    return isinstance(
+        error,
+        (
+            ConnectionError,
+            TimeoutError,
+            InvalidResponseError,
+            urllib3.exceptions.HTTPError,
+        ),
+    )
+
+
+def _release_abandoned_response(future: Future) -> None:
+    """
+    Closes the response returned by an abandoned request, e.g. a `get_object` past its
+    deadline or outrun by its hedge, whose connection would otherwise never be released.
+    """
+    if future.cancelled() or future.exception() is not None:
+        return
+    response = future.result()
+    if hasattr(response, "release_conn"):
+        response.close()
+        response.release_conn()
+
+
+class LatencyTracker:
+    """Sliding window of request latencies, giving their percentiles."""
+
+    def __init__(
+        self,
+        window_size: int = LATENCY_WINDOW_SIZE,
+        min_samples: int = LATENCY_MIN_SAMPLES,
+    ):
+        self.min_samples = min_samples
+        self._samples: collections.deque = collections.deque(maxlen=window_size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, q: float) -> float | None:
+        """
+        Args:
+            q (float): The percentile, between 0 and 1.
+
+        Returns:
+            float | None: The latency under which a fraction `q` of the recent requests
+                completed, or None until enough requests were recorded.
+        """
+        with self._lock:
+            if len(self._samples) < self.min_samples:
+                return None
+            samples = sorted(self._samples)
+        return samples[int(q * (len(samples) - 1))]
+
+
+class ResilientBucketClient(BucketClientDecorator):
+    """
+    BucketClient retrying transient failures and hedging slow reads of small objects.
+
+    Failed requests are retried when the error is transient (connection resets, timeouts,
+    overloaded or restarting server), waiting a random delay of up to `base_delay` doubled
+    at each attempt (full jitter). Metadata requests and transfers of up to
+    `small_object_max_size` bytes have a deadline of `request_timeout` seconds, past which
+    they are abandoned and retried. Reads of such small objects taking longer than the
+    `hedge_percentile` of the recent reads are duplicated, the first response winning, which
+    cuts the tail latency caused by a single slow request.
+    """
+
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        max_attempts: int = DEFAULT_MAX_ATTEMPTS,
+        base_delay: float = DEFAULT_BASE_DELAY,
+        max_delay: float = DEFAULT_MAX_DELAY,
+        request_timeout: float | None = DEFAULT_REQUEST_TIMEOUT,
+        hedge_percentile: float | None = DEFAULT_HEDGE_PERCENTILE,
+        small_object_max_size: int = DEFAULT_SMALL_OBJECT_MAX_SIZE,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+    ):
+        super().__init__(bucket_client)
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.request_timeout = request_timeout
+        self.hedge_percentile = hedge_percentile
+        self.small_object_max_size = small_object_max_size
+        self.max_workers = max_workers
+
+        self.retries = 0
+        self.hedged_requests = 0
+
+        self._latency_tracker = LatencyTracker()
+        self._stats_lock = threading.Lock()
+        # Requests run on their own pool so they can be abandoned past their deadline, or
+        # duplicated. It is twice the callers' pool to leave room for the duplicates.
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers * 2, thread_name_prefix="bucket-request"
+        )
+
+    def _get_backoff_delay(self, attempt: int) -> float:
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2**attempt))
+
+    def _record_retry(self) -> None:
+        with self._stats_lock:
+            self.retries += 1
+
+    def _wait_first(
+        self, futures: list[Future], deadline: float | None, timeout: float | None
+    ) -> Future | None:
+        """Waits for one of the futures, up to `timeout` seconds and the deadline."""
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            timeout = remaining if timeout is None else min(timeout, remaining)
+
+        done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+        return next(iter(done), None)
+
+    @staticmethod
+    def _abandon(futures: list[Future]) -> None:
+        """Cancels requests whose result is not needed anymore, or releases it later."""
+        for future in futures:
+            if not future.cancel():
+                future.add_done_callback(_release_abandoned_response)
+
+    def _request(
+        self, operation: Callable, *args, hedged: bool = False, **kwargs
+    ) -> Any:
+        """
+        Runs a single request within its deadline, duplicating it once if hedged and slower
+        than the hedging threshold. The response of an abandoned attempt is released once
+        it arrives.
+        """
+        start = time.monotonic()
+        deadline = start + self.request_timeout if self.request_timeout else None
+        hedge_delay = (
+            self._latency_tracker.percentile(self.hedge_percentile)
+            if hedged and self.hedge_percentile
+            else None
+        )
+
+        futures = [self._executor.submit(operation, *args, **kwargs)]
+        if hedge_delay is not None:
+            if self._wait_first(futures, deadline, hedge_delay) is None:
+                futures.append(self._executor.submit(operation, *args, **kwargs))
+                with self._stats_lock:
+                    self.hedged_requests += 1
+
+        error = None
+        while futures:
+            future = self._wait_first(futures, deadline, None)
+            if future is None:
+                self._abandon(futures)
+                raise TimeoutError(
+                    f"The request did not complete within {self.request_timeout}s."
+                )
+
+            futures.remove(future)
+            if future.exception() is None:
+                self._abandon(futures)
+                if hedged:
+                    self._latency_tracker.record(time.monotonic() - start)
+                return future.result()
+            error = future.exception()
+
+        raise error
+
+    def _call(
+        self,
+        operation: Callable,
+        *args,
+        timed: bool = True,
+        hedged: bool = False,
+        rewind: Callable[[], Any] | None = None,
+        **kwargs,
+    ) -> Any:
+        """
+        Runs a request, retrying it on transient failures.
+
+        Args:
+            operation (Callable): The bucket client's method to call.
+            timed (bool): Whether attempts are abandoned past `request_timeout`. Large
+                transfers and streams, which an abandoned attempt would keep reading,
+                are not timed.
+            hedged (bool): Whether slow attempts are duplicated.
+            rewind (Callable | None): Called before each retry, e.g. to seek back a stream.
+
+        Returns:
+            Any: The result of the first successful attempt.
+        """
+        timed = timed and self.request_timeout is not None
+        for attempt in range(self.max_attempts):
+            try:
+                if timed or hedged:
+                    return self._request(operation, *args, hedged=hedged, **kwargs)
+                return operation(*args, **kwargs)
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable_error(e):
+                    raise
+
+            self._record_retry()
+            time.sleep(self._get_backoff_delay(attempt))
+            if rewind is not None:
+                rewind()
+
+    def _retry_failures(
+        self,
+        report: BulkOperationReport,
+        retry: Callable[[list[str]], BulkOperationReport],
+    ) -> BulkOperationReport:
+        """
+        Retries the objects of a bulk operation that failed with a retryable error, merging
+        the outcomes in `report`. Other failures are kept as they are.
+        """
+        for attempt in range(self.max_attempts - 1):
+            retryable_object_names = [
+                object_name
+                for object_name, error in report.failures
+                if is_retryable_error(error)
+            ]
+            if not retryable_object_names:
+                break
+
+            self._record_retry()
+            time.sleep(self._get_backoff_delay(attempt))
+            retry_report = retry(retryable_object_names)
+            report.succeeded += retry_report.succeeded
+            report.failures = [
+                (object_name, error)
+                for object_name, error in report.failures
+                if not is_retryable_error(error)
+            ] + retry_report.failures
+            report.elapsed_seconds += retry_report.elapsed_seconds
+
+        return report
+
+    @property
+    def stats(self) -> dict:
+        """
+        Counters of this client's resilience mechanisms since it was created.
+
+        Returns:
+            dict: The number of retries and of hedged requests, and the hedging threshold.
+        """
+        with self._stats_lock:
+            return {
+                "retries": self.retries,
+                "hedged_requests": self.hedged_requests,
+                "hedge_delay": (
+                    self._latency_tracker.percentile(self.hedge_percentile)
+                    if self.hedge_percentile
+                    else None
+                ),
+            }
+
+    def check_connection(self) -> None:
+        self._call(self.bucket_client.check_connection)
+
+    def bucket_exists(self, bucket_name: str) -> bool:
+        return self._call(self.bucket_client.bucket_exists, bucket_name)
+
+    def folder_exists(self, bucket_name: str, folder_name: str) -> bool:
+        return self._call(self.bucket_client.folder_exists, bucket_name, folder_name)
+
+    def make_bucket(self, bucket_name: str, enable_versioning: bool):
+        return self._call(
+            self.bucket_client.make_bucket, bucket_name, enable_versioning
+        )
+
+    def upload_file(
+        self,
+        bucket_name: str,
+        object_name: str,
+        file_path: str,
+        metadata: dict | None = None,
+    ):
+        return self._call(
+            self.bucket_client.upload_file,
+            bucket_name,
+            object_name,
+            file_path,
+            metadata,
+            timed=os.path.getsize(file_path) <= self.small_object_max_size,
+        )
+
+    def upload_data(
+        self,
+        bucket_name: str,
+        object_name: str,
+        data: BinaryIO | BufferData,
+        length: int,
+        metadata: dict | None = None,
+    ):
+        rewind = None
+        if not isinstance(data, BufferData):
+            if not data.seekable():
+                # A consumed stream cannot be sent again
+                return self.bucket_client.upload_data(
+                    bucket_name,
+                    object_name,
+                    data,
+                    length,
+                    metadata,
+                )
+
+            position = data.tell()
+
+            def rewind() -> None:
+                data.seek(position)
+
+        return self._call(
+            self.bucket_client.upload_data,
+            bucket_name,
+            object_name,
+            data,
+            length,
+            metadata,
+            timed=rewind is None and length <= self.small_object_max_size,
+            rewind=rewind,
+        )
+
+    def list_objects(
+        self, bucket_name: str, prefix: str | None = None, recursive: bool = False
+    ) -> Generator[Object, Any, None]:
+        # Listings are ordered, so an interrupted one resumes after the last yielded object
+        last_object_name = None
+        attempt = 0
+        while True:
+            try:
+                for obj in self.bucket_client.list_objects(
+                    bucket_name, prefix, recursive
+                ):
+                    if (
+                        last_object_name is not None
+                        and obj.object_name <= last_object_name
+                    ):
+                        continue
+                    yield obj
+                    last_object_name = obj.object_name
+                    attempt = 0
+                return
+            except Exception as e:
+                if attempt + 1 >= self.max_attempts or not is_retryable_error(e):
+                    raise
+
+            self._record_retry()
+            time.sleep(self._get_backoff_delay(attempt))
+            attempt += 1
+
+    def get_object(self, bucket_name: str, object_name: str):
+        return self._call(self.bucket_client.get_object, bucket_name, object_name)
+
+    def head_object(self, bucket_name: str, object_name: str) -> Object:
+        return self._call(self.bucket_client.head_object, bucket_name, object_name)
+
+    def get_object_range(
+        self, bucket_name: str, object_name: str, offset: int, length: int
+    ) -> bytes:
+        return self._call(
+            self.bucket_client.get_object_range,
+            bucket_name,
+            object_name,
+            offset,
+            length,
+            timed=length <= self.small_object_max_size,
+            hedged=length <= self.small_object_max_size,
+        )
+
+    def copy_object(
+        self,
+        source_bucket_name: str,
+        source_object_name: str,
+        destination_bucket_name: str,
+        destination_object_name: str,
+    ):
+        return self._call(
+            self.bucket_client.copy_object,
+            source_bucket_name,
+            source_object_name,
+            destination_bucket_name,
+            destination_object_name,
+            timed=False,
+        )
+
+    def _read_object(self, bucket_name: str, object_name: str) -> bytes:
+        response = self.bucket_client.get_object(bucket_name, object_name)
+        try:
+            return response.read()
+        finally:
+            response.close()
+            response.release_conn()
+
+    def _write_object(self, bucket_name: str, object_name: str, file_path: str) -> None:
+        response = self.bucket_client.get_object(bucket_name, object_name)
+        try:
+            with open(file_path, "wb") as f:
+                shutil.copyfileobj(response, f, 1024 * 1024)
+        finally:
+            response.close()
+            response.release_conn()
+
+    def download_folder(
+        self, bucket_name: str, folder_name: str, destination_path: str
+    ) -> None:
+        os.makedirs(destination_path, exist_ok=True)
+
+        def fetch_object(obj: Object, file_path: str) -> None:
+            if obj.size is not None and obj.size <= self.small_object_max_size:
+                data = self._call(
+                    self._read_object, bucket_name, obj.object_name, hedged=True
+                )
+                with open(file_path, "wb") as f:
+                    f.write(data)
+            else:
+                self._call(
+                    self._write_object,
+                    bucket_name,
+                    obj.object_name,
+                    file_path,
+                    timed=False,
+                )
+
+        download_objects(
+            objects=self.list_objects(
+                bucket_name=bucket_name, prefix=folder_name, recursive=True
+            ),
+            destination_path=destination_path,
+            fetch_object=fetch_object,
+            max_workers=self.max_workers,
+        )
+
+    def copy_objects(
+        self,
+        source_bucket_name: str,
+        destination_bucket_name: str,
+        object_name_pairs: Iterable[tuple[str, str]],
+    ) -> BulkOperationReport:
+        object_name_pairs = list(object_name_pairs)
+        report = self.bucket_client.copy_objects(
+            source_bucket_name, destination_bucket_name, object_name_pairs
+        )
+
+        def retry(failed_object_names: list[str]) -> BulkOperationReport:
+            failed_object_names = set(failed_object_names)
+            return self.bucket_client.copy_objects(
+                source_bucket_name,
+                destination_bucket_name,
+                [pair for pair in object_name_pairs if pair[0] in failed_object_names],
+            )
+
+        return self._retry_failures(report, retry)
+
+    def remove_objects(
+        self,
+        bucket_name: str,
+        prefix: str | None = None,
+        object_names: Iterable[str] | None = None,
+    ) -> BulkOperationReport:
+        report = self.bucket_client.remove_objects(bucket_name, prefix, object_names)
+        return self._retry_failures(
+            report,
+            lambda failed_object_names: self.bucket_client.remove_objects(
+                bucket_name, object_names=failed_object_names
+            ),
+        )
@@ -0,0 +1,517 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tarfile
+import tempfile
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import tqdm
+
+from src.models.model_bucket_client import (
+    DEFAULT_MAX_WORKERS,
+    BucketClient,
+    BufferData,
+    write_local_file,
+)
+
+STORAGE_LAYOUT_OBJECTS = "objects"
+STORAGE_LAYOUT_SHARDS = "shards"
+STORAGE_LAYOUTS = (STORAGE_LAYOUT_OBJECTS, STORAGE_LAYOUT_SHARDS)
+
+SHARDS_FOLDER_NAME = "shards"
+SHARD_EXTENSION = ".tar"
+SHARD_INDEX_EXTENSION = ".index.json"
+DEFAULT_SHARD_MAX_BYTES = 256 * 1024 * 1024
+
+
+def get_member_name(key: str, extension: str) -> str:
+    return f"{key}.{extension}" if extension else key
+
+
+def split_member_name(member_name: str) -> tuple[str, str]:
+    """
+    Splits a shard member's name into its sample key and extension, the WebDataset way:
+    the files of a sample share everything up to the first dot of their base name.
+
+    Args:
+        member_name (str): The member's name, e.g. "folder/1a2b.png".
+
+    Returns:
+        tuple[str, str]: The sample key and the extension, e.g. ("folder/1a2b", "png").
+    """
+    folder_name, _, base_name = member_name.rpartition("/")
+    stem, _, extension = base_name.partition(".")
+    return f"{folder_name}/{stem}" if folder_name else stem, extension
+
+
+class ShardWriter:
+    """
+    Packs samples into tar shards of about `max_bytes`, uploaded as they fill up.
+
+    Each shard `{prefix}/{shard_name_prefix}-{number}.tar` is followed by an index
+    `{prefix}/{shard_name_prefix}-{number}.index.json` mapping its sample keys to the byte
+    range of each of their files, so a single sample can be read with one ranged GET. The
+    index is uploaded after its shard, hence a shard without index is incomplete. The
+    files of the `hashed_extensions` also have their MD5 in the index, to tell whether a
+    sample changed without reading it.
+
+    A shard is written to a local temporary file while the previous one is uploaded, so
+    packing and uploading overlap. `add` can be called from several threads. Once a
+    shard and its index are stored, `on_upload` is called with the shard's object name.
+    """
+
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        bucket_name: str,
+        prefix: str,
+        max_bytes: int = DEFAULT_SHARD_MAX_BYTES,
+        metadata: dict | None = None,
+        shard_name_prefix: str = "shard",
+        first_shard_number: int = 0,
+        on_upload: Callable[[str], None] | None = None,
+        hashed_extensions: tuple[str, ...] = ("json",),
+    ):
+        self.bucket_client = bucket_client
+        self.bucket_name = bucket_name
+        self.prefix = prefix.rstrip("/")
+        self.max_bytes = max_bytes
+        self.metadata = metadata
+        self.shard_name_prefix = shard_name_prefix
+        self.on_upload = on_upload
+        self.hashed_extensions = hashed_extensions
+
+        # Names and sizes of the shards uploaded so far
+        self.uploaded_shards: list[tuple[str, int]] = []
+
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._pending_upload: Future | None = None
+        self._shard_number = first_shard_number
+        self._open_shard()
+
+    def _open_shard(self) -> None:
+        file_descriptor, self._shard_path = tempfile.mkstemp(suffix=SHARD_EXTENSION)
+        self._shard_file = os.fdopen(file_descriptor, "wb")
+        self._tar = tarfile.open(
+            fileobj=self._shard_file, mode="w", format=tarfile.PAX_FORMAT
+        )
+        self._index: dict[str, dict[str, tuple]] = {}
+
+    def get_shard_object_name(self, shard_number: int) -> str:
+        return f"{self.prefix}/{self.shard_name_prefix}-{shard_number:06d}{SHARD_EXTENSION}"
+
+    def add(self, key: str, files: dict[str, bytes | BufferData]) -> None:
+        """
+        Appends a sample to the current shard, and uploads it once it exceeds `max_bytes`.
+
+        Args:
+            key (str): The sample's key, unique within the shards of the prefix.
+            files (dict[str, bytes | BufferData]): The sample's files keyed by extension,
+                e.g. {"png": ..., "json": ...}, stored as `{key}.{extension}`.
+        """
+        # A float mtime would need a PAX header for each member
+        modification_time = int(time.time())
+        md5s = {
+            extension: hashlib.md5(data).hexdigest()
+            for extension, data in files.items()
+            if extension in self.hashed_extensions
+        }
+
+        with self._lock:
+            entry = {}
+            for extension, data in files.items():
+                tar_info = tarfile.TarInfo(get_member_name(key, extension))
+                tar_info.size = len(data)
+                tar_info.mtime = modification_time
+                self._tar.addfile(tar_info, io.BytesIO(data))
+
+                # The data ends where the tar's offset is, before its padding to 512 bytes
+                padded_size = -(-tar_info.size // tarfile.BLOCKSIZE) * tarfile.BLOCKSIZE
+                entry[extension] = (self._tar.offset - padded_size, tar_info.size)
+                if extension in md5s:
+                    entry[extension] += (md5s[extension],)
+            self._index[key] = entry
+
+            if self._tar.offset >= self.max_bytes:
+                self._rotate()
+
+    def _rotate(self) -> None:
+        """Closes the current shard and uploads it in the background."""
+        self._tar.close()
+        self._shard_file.close()
+
+        # At most one shard waits for its upload, bounding the disk space used
+        if self._pending_upload is not None:
+            self._pending_upload.result()
+        self._pending_upload = self._executor.submit(
+            self._upload_shard, self._shard_path, self._shard_number, self._index
+        )
+
+        self._shard_number += 1
+        self._open_shard()
+
+    def _upload_shard(
+        self,
+        shard_path: str,
+        shard_number: int,
+        index: dict[str, dict[str, tuple]],
+    ) -> None:
+        shard_object_name = self.get_shard_object_name(shard_number)
+        try:
+            self.bucket_client.upload_file(
+                self.bucket_name, shard_object_name, shard_path, self.metadata
+            )
+            shard_size = os.path.getsize(shard_path)
+        finally:
+            os.remove(shard_path)
+
+        index_data = json.dumps(
+            {"shard": shard_object_name.rpartition("/")[2], "samples": index}
+        ).encode()
+        self.bucket_client.upload_data(
+            self.bucket_name,
+            get_shard_index_object_name(shard_object_name),
+            io.BytesIO(index_data),
+            len(index_data),
+            self.metadata,
+        )
+        self.uploaded_shards.append((shard_object_name, shard_size))
+        if self.on_upload is not None:
+            self.on_upload(shard_object_name)
+
+    def close(self) -> None:
+        """Uploads the last shard, unless empty, and waits for every upload to finish."""
+        with self._lock:
+            try:
+                if self._index:
+                    self._rotate()
+                if self._pending_upload is not None:
+                    self._pending_upload.result()
+            finally:
+                self._release()
+
+    def abort(self) -> None:
+        """
+        Discards the current shard without uploading it. A full shard being uploaded is
+        waited for, its failure being ignored, so the shards already stored stay complete.
+        """
+        with self._lock:
+            self._release()
+
+    def _release(self) -> None:
+        self._tar.close()
+        self._shard_file.close()
+        if os.path.exists(self._shard_path):
+            os.remove(self._shard_path)
+        self._executor.shutdown()
+
+    def __enter__(self) -> "ShardWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        # A failed `with` body leaves a partial shard, which is not worth uploading
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+
+class ShardIndex:
+    """
+    Maps the sample keys of a prefix's shards to the byte ranges of their files. A sample
+    packed again, e.g. because it changed, is found in the last shard holding it.
+    """
+
+    def __init__(
+        self,
+        entries: dict[str, tuple[str, dict[str, tuple[int, int]]]],
+        md5s: dict[str, dict[str, str]] | None = None,
+    ):
+        self.entries = entries
+        # MD5 of the samples' hashed files, keyed by sample key and extension
+        self.md5s = md5s if md5s is not None else {}
+
+    @classmethod
+    def load(
+        cls,
+        bucket_client: BucketClient,
+        bucket_name: str,
+        prefix: str,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        shard_object_names: list[str] | None = None,
+    ) -> "ShardIndex":
+        """
+        Reads the indexes of every shard stored under a prefix.
+
+        Args:
+            bucket_client (BucketClient): The client to read the indexes with.
+            bucket_name (str): Name of the bucket.
+            prefix (str): The prefix the shards were written to.
+            max_workers (int): The number of indexes read concurrently.
+            shard_object_names (list[str] | None): The shards whose indexes to read, all
+                of the prefix's shards if None.
+
+        Returns:
+            ShardIndex: The index of every sample of the shards.
+        """
+        if shard_object_names is None:
+            index_object_names = [
+                obj.object_name
+                for obj in bucket_client.list_objects(
+                    bucket_name, prefix, recursive=True
+                )
+                if obj.object_name.endswith(SHARD_INDEX_EXTENSION)
+            ]
+        else:
+            index_object_names = [
+                get_shard_index_object_name(shard_object_name)
+                for shard_object_name in shard_object_names
+            ]
+
+        def read_index(index_object_name: str) -> tuple[str, dict]:
+            response = bucket_client.get_object(bucket_name, index_object_name)
+            try:
+                index = json.loads(response.read())
+            finally:
+                response.close()
+                response.release_conn()
+
+            folder_name = index_object_name.rpartition("/")[0]
+            shard_object_name = (
+                f"{folder_name}/{index['shard']}" if folder_name else index["shard"]
+            )
+            return shard_object_name, index["samples"]
+
+        entries = {}
+        md5s = {}
+        # The indexes are read in the shards' order, so later shards override earlier ones
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for shard_object_name, samples in executor.map(
+                read_index, index_object_names
+            ):
+                for key, files in samples.items():
+                    # An entry is [offset, size], followed by the MD5 of hashed files
+                    entries[key] = (
+                        shard_object_name,
+                        {
+                            extension: (entry[0], entry[1])
+                            for extension, entry in files.items()
+                        },
+                    )
+                    md5s[key] = {
+                        extension: entry[2]
+                        for extension, entry in files.items()
+                        if len(entry) > 2
+                    }
+        return cls(entries, md5s)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.entries
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def keys(self):
+        return self.entries.keys()
+
+    def read_sample(
+        self, bucket_client: BucketClient, bucket_name: str, key: str
+    ) -> dict[str, bytes]:
+        """
+        Reads the files of a sample with a single ranged GET, its files being contiguous.
+
+        Args:
+            bucket_client (BucketClient): The client to read the shard with.
+            bucket_name (str): Name of the bucket.
+            key (str): The sample's key.
+
+        Returns:
+            dict[str, bytes]: The sample's files keyed by extension.
+
+        Raises:
+            KeyError: If no shard holds the sample.
+        """
+        shard_object_name, files = self.entries[key]
+        start = min(offset for offset, _ in files.values())
+        end = max(offset + size for offset, size in files.values())
+
+        data = bucket_client.get_object_range(
+            bucket_name, shard_object_name, start, end - start
+        )
+        return {
+            extension: data[offset - start : offset - start + size]
+            for extension, (offset, size) in files.items()
+        }
+
+
+def get_shard_index_object_name(shard_object_name: str) -> str:
+    return shard_object_name[: -len(SHARD_EXTENSION)] + SHARD_INDEX_EXTENSION
+
+
+def get_next_shard_number(shard_object_names: list[str], shard_name_prefix: str) -> int:
+    """
+    Gets the number after the ones of existing shards, for a `ShardWriter` to add shards
+    next to them instead of overwriting them.
+
+    Args:
+        shard_object_names (list[str]): The object names of the existing shards.
+        shard_name_prefix (str): The prefix of the shards' names to number after.
+
+    Returns:
+        int: The first unused shard number.
+    """
+    shard_numbers = [
+        int(shard_name[len(shard_name_prefix) + 1 : -len(SHARD_EXTENSION)])
+        for shard_name in (
+            object_name.rpartition("/")[2] for object_name in shard_object_names
+        )
+        if shard_name.startswith(f"{shard_name_prefix}-")
+        and shard_name[len(shard_name_prefix) + 1 : -len(SHARD_EXTENSION)].isdigit()
+    ]
+    return max(shard_numbers, default=-1) + 1
+
+
+def list_shards(
+    bucket_client: BucketClient, bucket_name: str, prefix: str
+) -> list[str]:
+    """
+    Lists the complete shards stored under a prefix, i.e. the ones with an index.
+
+    Args:
+        bucket_client (BucketClient): The client to list the shards with.
+        bucket_name (str): Name of the bucket.
+        prefix (str): The prefix the shards were written to.
+
+    Returns:
+        list[str]: The object names of the shards.
+    """
+    object_names = {
+        obj.object_name
+        for obj in bucket_client.list_objects(bucket_name, prefix, recursive=True)
+    }
+    return sorted(
+        object_name
+        for object_name in object_names
+        if object_name.endswith(SHARD_EXTENSION)
+        and get_shard_index_object_name(object_name) in object_names
+    )
+
+
+def extract_shard(
+    bucket_client: BucketClient,
+    bucket_name: str,
+    shard_object_name: str,
+    get_destination_path: Callable[[str], str | None],
+    member_converters: dict[str, Callable[[bytes], bytes]] | None = None,
+) -> int:
+    """
+    Streams a shard and writes its files locally, without storing the shard itself.
+
+    Args:
+        bucket_client (BucketClient): The client to read the shard with.
+        bucket_name (str): Name of the bucket.
+        shard_object_name (str): The shard's object name.
+        get_destination_path (Callable[[str], str | None]): Returns the local path of a
+            member from its name, or None to skip it.
+        member_converters (dict[str, Callable[[bytes], bytes]] | None): Converters of the
+            members' content keyed by extension, other members being copied as they are.
+
+    Returns:
+        int: The number of files extracted.
+    """
+    member_converters = member_converters or {}
+    extracted = 0
+    response = bucket_client.get_object(bucket_name, shard_object_name)
+    try:
+        with tarfile.open(fileobj=response, mode="r|") as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                destination_path = get_destination_path(member.name)
+                if destination_path is None:
+                    continue
+
+                convert = member_converters.get(split_member_name(member.name)[1])
+                with tar.extractfile(member) as source:
+                    if convert is None:
+                        write_local_file(
+                            destination_path,
+                            lambda f: shutil.copyfileobj(source, f, 1024 * 1024),
+                        )
+                    else:
+                        data = convert(source.read())
+                        write_local_file(
+                            destination_path, lambda f, data=data: f.write(data)
+                        )
+                extracted += 1
+    finally:
+        response.close()
+        response.release_conn()
+    return extracted
+
+
+def download_shards(
+    bucket_client: BucketClient,
+    bucket_name: str,
+    prefix: str,
+    get_destination_path: Callable[[str, str], str | None],
+    member_converters: dict[str, Callable[[bytes], bytes]] | None = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> int:
+    """
+    Extracts every complete shard stored under a prefix, several shards at once. A sample
+    packed again is only extracted from the last shard holding it.
+
+    Args:
+        bucket_client (BucketClient): The client to read the shards with.
+        bucket_name (str): Name of the bucket.
+        prefix (str): The prefix the shards were written to.
+        get_destination_path (Callable[[str, str], str | None]): Returns the local path of a
+            member from the shard's object name and the member's name, or None to skip it.
+        member_converters (dict[str, Callable[[bytes], bytes]] | None): Converters of the
+            members' content keyed by extension, see `extract_shard`.
+        max_workers (int): The number of shards streamed concurrently.
+
+    Returns:
+        int: The number of files extracted.
+    """
+    shard_object_names = list_shards(bucket_client, bucket_name, prefix)
+    shard_index = ShardIndex.load(
+        bucket_client,
+        bucket_name,
+        prefix,
+        max_workers=max_workers,
+        shard_object_names=shard_object_names,
+    )
+
+    def extract(shard_object_name: str) -> int:
+        def get_member_path(member_name: str) -> str | None:
+            # The copies of a sample packed again in a later shard are outdated
+            key = split_member_name(member_name)[0]
+            if key in shard_index and shard_index.entries[key][0] != shard_object_name:
+                return None
+            return get_destination_path(shard_object_name, member_name)
+
+        return extract_shard(
+            bucket_client,
+            bucket_name,
+            shard_object_name,
+            get_member_path,
+            member_converters,
+        )
+
+    extracted = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for count in tqdm.tqdm(
+            executor.map(extract, shard_object_names),
+            total=len(shard_object_names),
+            desc="Extracting shards",
+        ):
+            extracted += count
+    return extracted
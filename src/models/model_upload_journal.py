@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_JOURNAL_FLUSH_SIZE = 1000
+DEFAULT_JOURNAL_FLUSH_INTERVAL = 5.0
+
+
+class UploadJournal:
+    """
+    Local SQLite journal of the items of a data source whose upload is committed, so an
+    interrupted upload resumes where it stopped instead of starting over.
+
+    Items are identified by a key unique within their data source, e.g. a file's relative
+    path or a HuggingFace item's split and index. Committed keys are buffered and written
+    in a single transaction every `flush_size` keys or `flush_interval` seconds, so the
+    journal never slows the upload down; a crash loses at most the last batch, whose items
+    are uploaded again. Once a data source is completely uploaded its entries are cleared,
+    later uploads being left to the incremental mode of the uploader.
+    """
+
+    def __init__(
+        self,
+        database_path: str,
+        flush_size: int = DEFAULT_JOURNAL_FLUSH_SIZE,
+        flush_interval: float = DEFAULT_JOURNAL_FLUSH_INTERVAL,
+    ):
+        self.database_path = database_path
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+
+        self._lock = threading.Lock()
+        self._pending: list[tuple[str, str, str]] = []
+        self._last_flush = time.monotonic()
+
+        os.makedirs(os.path.dirname(os.path.abspath(database_path)), exist_ok=True)
+        # Every write goes through `_lock`, so a single connection is shared by the threads
+        self._connection = sqlite3.connect(
+            database_path, timeout=60, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        with self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS committed_items (
+                    bucket TEXT NOT NULL,
+                    data_source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    PRIMARY KEY (bucket, data_source, key)
+                )
+                """
+            )
+
+    def get_committed(self, bucket_name: str, data_source_name: str) -> set[str]:
+        """
+        Gets the keys of the items of a data source committed by previous uploads.
+
+        Args:
+            bucket_name (str): Name of the bucket the data source is uploaded to.
+            data_source_name (str): Name of the data source.
+
+        Returns:
+            set[str]: The keys of the committed items.
+        """
+        with self._lock:
+            self._flush()
+            return {
+                key
+                for (key,) in self._connection.execute(
+                    "SELECT key FROM committed_items WHERE bucket = ? AND data_source = ?",
+                    (bucket_name, data_source_name),
+                )
+            }
+
+    def record(self, bucket_name: str, data_source_name: str, key: str) -> None:
+        """
+        Marks an item as committed, once all of its objects are uploaded.
+
+        Args:
+            bucket_name (str): Name of the bucket the data source is uploaded to.
+            data_source_name (str): Name of the data source.
+            key (str): The key of the item.
+        """
+        with self._lock:
+            self._pending.append((bucket_name, data_source_name, key))
+            if (
+                len(self._pending) >= self.flush_size
+                or time.monotonic() - self._last_flush >= self.flush_interval
+            ):
+                self._flush()
+
+    def complete(self, bucket_name: str, data_source_name: str) -> None:
+        """
+        Clears the entries of a completely uploaded data source.
+
+        Args:
+            bucket_name (str): Name of the bucket the data source was uploaded to.
+            data_source_name (str): Name of the data source.
+        """
+        with self._lock:
+            self._pending = [
+                entry
+                for entry in self._pending
+                if entry[:2] != (bucket_name, data_source_name)
+            ]
+            with self._connection:
+                self._connection.execute(
+                    "DELETE FROM committed_items WHERE bucket = ? AND data_source = ?",
+                    (bucket_name, data_source_name),
+                )
+
+    def flush(self) -> None:
+        """Writes the buffered keys to the journal."""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._pending:
+            with self._connection:
+                self._connection.executemany(
+                    "INSERT OR IGNORE INTO committed_items VALUES (?, ?, ?)",
+                    self._pending,
+                )
+            self._pending = []
+        self._last_flush = time.monotonic()
+
+    def close(self) -> None:
+        """Flushes the buffered keys and closes the journal."""
+        self.flush()
+        self._connection.close()
+
+    def __enter__(self) -> "UploadJournal":
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
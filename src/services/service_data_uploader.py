@@ -1,108 +1,832 @@
+import asyncio
 import hashlib
 import io
 import json
 import os
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from functools import partial
+from typing import Callable, Generator
 
 import PIL.Image
 import tqdm
+from datasets import DatasetDict, IterableDataset, IterableDatasetDict, load_dataset
+from datasets import Image as HuggingFaceImage
+from zenml.logger import get_logger
 
-from datasets import load_dataset
-
-from src.models.model_bucket_client import BucketClient
+from src.models.model_annotation_table import (
+    ANNOTATION_TABLE_FILE_NAME,
+    AnnotationTable,
+    AnnotationTableBuilder,
+)
+from src.models.model_async_bucket_client import AsyncBucketClient
+from src.models.model_bucket_client import BucketClient, BufferData
 from src.models.model_data_source import (
     DataSource,
     HuggingFaceDataSource,
     LocalDataSource,
 )
+from src.models.model_object_catalog import ObjectCatalog
+from src.models.model_shard import (
+    DEFAULT_SHARD_MAX_BYTES,
+    SHARDS_FOLDER_NAME,
+    STORAGE_LAYOUT_OBJECTS,
+    STORAGE_LAYOUT_SHARDS,
+    STORAGE_LAYOUTS,
+    ShardIndex,
+    ShardWriter,
+    get_member_name,
+    get_next_shard_number,
+    get_shard_index_object_name,
+    list_shards,
+    split_member_name,
+)
+from src.models.model_upload_journal import UploadJournal
+from src.utils.concurrency_helper import (
+    attach_shared_buffer,
+    bounded_as_completed,
+    ensure_shared_memory_tracker,
+    run_bounded,
+    share_buffer,
+)
+from src.utils.image_helper import (
+    IMAGE_HEADER_SIZE,
+    get_image_dimensions,
+    read_image_dimensions,
+    sniff_image_format,
+)
+
+UPLOAD_MAX_WORKERS = 10
+# Items submitted per worker and not processed yet, each one holding its image
+IN_FLIGHT_PER_WORKER = 4
+ASYNC_MAX_IN_FLIGHT = 256
+# Image formats uploaded as they are, with their file extension, others being converted to PNG
+UPLOADED_IMAGE_FORMATS = {"png": "png", "jpeg": "jpg"}
+
+SAMPLE_ADDED = "added"
+SAMPLE_CHANGED = "changed"
+SAMPLE_SKIPPED = "skipped"
+
+# HuggingFace dataset read by the processes of the CPU stage, set by `_init_image_worker`
+_worker_hf_data_source: DatasetDict | None = None
+
+
+def get_item_key(split: str, index: int) -> str:
+    """The key of a HuggingFace item in the upload journal."""
+    return f"{split}/{index}"
+
+
+class IngestionReport:
+    """Counts of the samples of a data source added, changed or skipped by an upload."""
+
+    def __init__(self, data_source_name: str):
+        self.data_source_name = data_source_name
+        self.added = 0
+        self.changed = 0
+        self.skipped = 0
+
+        self._lock = threading.Lock()
+
+    def record(self, outcome: str, count: int = 1) -> None:
+        """
+        Counts samples.
+
+        Args:
+            outcome (str): One of `SAMPLE_ADDED`, `SAMPLE_CHANGED` or `SAMPLE_SKIPPED`.
+            count (int): The number of samples with this outcome.
+        """
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + count)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.data_source_name}: {self.added} samples added, {self.changed} changed,"
+            f" {self.skipped} skipped"
+        )
+
+
+class ExistingSamples:
+    """
+    The samples of a data source already stored, keyed by their image's hash, to upload
+    only the new or changed ones.
+    """
+
+    def __init__(self, image_ids: set[str], annotation_md5s: dict[str, str] | None):
+        self.image_ids = image_ids
+        # MD5 of the samples' annotations, None when unknown
+        self.annotation_md5s = annotation_md5s
+
+    @classmethod
+    def list(
+        cls, bucket_client: BucketClient, bucket_name: str, dataset_name: str
+    ) -> "ExistingSamples":
+        """
+        Lists the images and annotations of a data source stored as objects, the etags of
+        the annotations, uploaded in a single part, being their MD5.
+
+        Args:
+            bucket_client (BucketClient): The client to list the objects with.
+            bucket_name (str): Name of the bucket.
+            dataset_name (str): Name of the data source.
+
+        Returns:
+            ExistingSamples: The data source's samples.
+        """
+        image_ids = {
+            obj.object_name.rpartition("/")[2].partition(".")[0]
+            for obj in bucket_client.list_objects(
+                bucket_name, f"{dataset_name}/images/", recursive=True
+            )
+        }
+        annotation_md5s = {
+            obj.object_name.rpartition("/")[2].partition(".")[0]: (
+                obj.etag or ""
+            ).strip('"')
+            for obj in bucket_client.list_objects(
+                bucket_name, f"{dataset_name}/annotations/", recursive=True
+            )
+        }
+        return cls(image_ids, annotation_md5s)
+
+    @classmethod
+    def from_shard_index(cls, shard_index: ShardIndex) -> "ExistingSamples":
+        """
+        Gets the samples of a data source stored as shards, the MD5 of their annotations
+        being in the shards' index.
+
+        Args:
+            shard_index (ShardIndex): The index of the data source's shards.
+
+        Returns:
+            ExistingSamples: The data source's samples.
+        """
+        return cls(
+            set(shard_index.keys()),
+            {
+                key: md5s["json"]
+                for key, md5s in shard_index.md5s.items()
+                if "json" in md5s
+            },
+        )
+
+    def get_outcome(self, unique_id: str, json_data: bytes | None) -> str:
+        """
+        Tells whether a sample is new, has a changed annotation, or is already stored.
+
+        Args:
+            unique_id (str): The hash of the sample's image.
+            json_data (bytes | None): The sample's encoded annotation, None if it has
+                none.
+
+        Returns:
+            str: One of `SAMPLE_ADDED`, `SAMPLE_CHANGED` or `SAMPLE_SKIPPED`.
+        """
+        if unique_id not in self.image_ids:
+            return SAMPLE_ADDED
+        if json_data is None or self.annotation_md5s is None:
+            return SAMPLE_SKIPPED
+        if self.annotation_md5s.get(unique_id) == hashlib.md5(json_data).hexdigest():
+            return SAMPLE_SKIPPED
+        return SAMPLE_CHANGED
+
+
+class SharedImage:
+    """An image prepared by the CPU stage, whose bytes wait in a shared memory block."""
+
+    def __init__(
+        self, unique_id: str, shared_memory_name: str, size: int, extension: str
+    ):
+        self.unique_id = unique_id
+        self.shared_memory_name = shared_memory_name
+        self.size = size
+        self.extension = extension
+
+
+def _init_image_worker(hf_data_source: DatasetDict | None) -> None:
+    """
+    Initializes a process of the CPU stage. Datasets loaded from HuggingFace's cache are
+    memory-mapped, so they are sent to the processes as references to their files, and
+    streamed datasets are not sent at all.
+    """
+    global _worker_hf_data_source
+    _worker_hf_data_source = hf_data_source
+
+
+def _prepare_shared_image(split: str, index: int) -> SharedImage:
+    """
+    Prepares an item's image in a process of the CPU stage, its bytes being handed over to
+    the uploading process in shared memory.
+
+    Args:
+        split (str): The item's split.
+        index (int): The item's index in its split.
+
+    Returns:
+        SharedImage: The prepared image.
+    """
+    return _share_prepared_image(_worker_hf_data_source[split][index]["image"])
+
+
+def _prepare_streamed_shared_image(indexed_item: tuple[int, dict]) -> SharedImage:
+    """
+    Prepares the image of an item sent by the uploading process, streamed datasets having
+    no files for the CPU stage to read the images from.
+
+    Args:
+        indexed_item (tuple[int, dict]): The streamed item's index, and the item with its
+            undecoded image.
+
+    Returns:
+        SharedImage: The prepared image.
+    """
+    return _share_prepared_image(indexed_item[1]["image"])
+
+
+def _share_prepared_image(image: dict) -> SharedImage:
+    unique_id, image_data, extension = DataUploaderService._prepare_image(image)
+    return SharedImage(unique_id, share_buffer(image_data), len(image_data), extension)
 
 
 class DataUploaderService:
-    def __init__(self, bucket_client: BucketClient):
+    def __init__(
+        self,
+        bucket_client: BucketClient,
+        async_bucket_client: AsyncBucketClient | None = None,
+        catalog: ObjectCatalog | None = None,
+        storage_layout: str = STORAGE_LAYOUT_OBJECTS,
+        shard_max_bytes: int = DEFAULT_SHARD_MAX_BYTES,
+        max_workers: int = UPLOAD_MAX_WORKERS,
+        cpu_workers: int = 0,
+        incremental: bool = False,
+        journal: UploadJournal | None = None,
+    ):
+        if storage_layout not in STORAGE_LAYOUTS:
+            raise ValueError(
+                f"Unknown storage layout '{storage_layout}', expected one of {STORAGE_LAYOUTS}."
+            )
+
         self.bucket_client = bucket_client
+        self.async_bucket_client = async_bucket_client
+        self.catalog = catalog
+        self.storage_layout = storage_layout
+        self.shard_max_bytes = shard_max_bytes
+        # Threads uploading, and processes preparing the images (0 to do it in the threads)
+        self.max_workers = max_workers
+        self.cpu_workers = cpu_workers
+        # Upload only the samples not stored yet, or whose annotation changed
+        self.incremental = incremental
+        # Records the committed items, for an interrupted upload to resume where it stopped
+        self.journal = journal
 
-    def upload_data(self, bucket_name: str, data_source: DataSource) -> None:
+    def upload_data(self, bucket_name: str, data_source: DataSource) -> IngestionReport:
         """
         Uploads data from the given dataset to a specified bucket using the bucket client.
         The upload method varies depending on the dataset type.
 
+        With the shards storage layout, files are packed into tar shards stored under
+        `{data_source_name}/shards/` rather than uploaded as one object each.
+
+        In incremental mode, the data source's stored samples are listed first, and only
+        the new ones, or the ones whose annotation changed, are uploaded. Local files are
+        compared by path, size and MD5, and sharded samples by key and by the MD5 of their
+        annotation.
+
+        With a journal, the items committed by an interrupted upload of the data source are
+        skipped before being read, and the journal is cleared once the upload completes.
+        A sharded upload records its shards instead, an interrupted one keeping them.
+
+        The boxes of the annotations read by the upload are saved to the data source's
+        annotation table, `{data_source_name}/annotations.npz`, replacing their previous
+        rows. The table is saved even if the upload fails, so a resumed upload keeps the
+        rows of the samples it skips.
+
         Args:
             bucket_name (str): Name of the bucket where the dataset will be uploaded.
             data_source (DataSource): Dataset object to be uploaded.
+
+        Returns:
+            IngestionReport: The number of samples added, changed and skipped.
+        """
+        report = IngestionReport(data_source.name)
+        annotation_table = AnnotationTableBuilder()
+        try:
+            if isinstance(data_source, LocalDataSource):
+                self._upload_imported_data_source(
+                    bucket_name, data_source, report, annotation_table
+                )
+            elif isinstance(data_source, HuggingFaceDataSource):
+                self._upload_huggingface_data_source(
+                    bucket_name, data_source, report, annotation_table
+                )
+            else:
+                raise TypeError(
+                    f"Unsupported data source's type: {type(data_source).__name__}"
+                )
+        except BaseException:
+            if self.journal is not None:
+                self.journal.flush()
+            # The upload's error is the one to raise, a failed save being only logged
+            try:
+                self._save_annotation_table(bucket_name, data_source, annotation_table)
+            except Exception as e:
+                get_logger(__name__).warning(
+                    f"Couldn't save the annotation table of {data_source.name}: {e}"
+                )
+            raise
+
+        self._save_annotation_table(bucket_name, data_source, annotation_table)
+        if self.journal is not None:
+            self.journal.complete(bucket_name, data_source.name)
+        return report
+
+    def _save_annotation_table(
+        self,
+        bucket_name: str,
+        data_source: DataSource,
+        annotation_table: AnnotationTableBuilder,
+    ) -> None:
         """
-        if isinstance(data_source, LocalDataSource):
-            self._upload_imported_data_source(bucket_name, data_source)
-        elif isinstance(data_source, HuggingFaceDataSource):
-            self._upload_huggingface_data_source(bucket_name, data_source)
+        Merges the annotations read by an upload into the data source's annotation table,
+        their rows replacing the previous ones of the same images. Does nothing if no
+        annotation was read.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            data_source (DataSource): The uploaded data source.
+            annotation_table (AnnotationTableBuilder): The annotations read by the upload.
+        """
+        if not len(annotation_table):
+            return
+
+        object_name = f"{data_source.name}/{ANNOTATION_TABLE_FILE_NAME}"
+        tables = [annotation_table.build()]
+        previous_table = AnnotationTable.load(
+            self.bucket_client, bucket_name, object_name
+        )
+        if previous_table is not None:
+            tables.append(previous_table)
+        AnnotationTable.concatenate(tables).save(
+            self.bucket_client, bucket_name, object_name
+        )
+
+    @staticmethod
+    def _get_local_image_paths(files: list[tuple[str, int]]) -> dict[str, str]:
+        """
+        Gets the images of a local data source keyed by their name without extension, the
+        key of their annotation whichever folder it is in.
+
+        Args:
+            files (list[tuple[str, int]]): The data source's files and their sizes.
+
+        Returns:
+            dict[str, str]: The relative paths of the images.
+        """
+        return {
+            os.path.basename(relative_path).partition(".")[0]: relative_path
+            for relative_path, _ in files
+            if relative_path.rpartition(".")[2] in UPLOADED_IMAGE_FORMATS.values()
+        }
+
+    @staticmethod
+    def _add_local_annotation(
+        annotation_table: AnnotationTableBuilder,
+        root_folder_path: str,
+        relative_path: str,
+        image_paths: dict[str, str],
+    ) -> None:
+        """
+        Adds a local JSON annotation to the annotation table, keyed by its name like the
+        images' objects, along with the dimensions read from its image's header. JSON files
+        which are not annotations, e.g. a label map, are ignored.
+
+        Args:
+            annotation_table (AnnotationTableBuilder): The annotations read by the upload.
+            root_folder_path (str): The data source's folder.
+            relative_path (str): The JSON file.
+            image_paths (dict[str, str]): The data source's images, from
+                `_get_local_image_paths`.
+        """
+        with open(os.path.join(root_folder_path, relative_path)) as f:
+            annotation = json.load(f)
+        if not AnnotationTableBuilder.is_annotation(annotation):
+            return
+
+        key = os.path.basename(relative_path).partition(".")[0]
+        image_path = image_paths.get(key)
+        annotation_table.add(
+            key,
+            annotation,
+            (
+                read_image_dimensions(os.path.join(root_folder_path, image_path))
+                if image_path is not None
+                else None
+            ),
+        )
+
+    def _get_committed_keys(
+        self, bucket_name: str, data_source: DataSource, report: IngestionReport
+    ) -> set[str]:
+        """
+        Gets the keys of the items committed by an interrupted upload of a data source,
+        counted as skipped.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            data_source (DataSource): The data source being uploaded.
+            report (IngestionReport): Counts the skipped items.
+
+        Returns:
+            set[str]: The committed keys, empty without a journal.
+        """
+        if self.journal is None:
+            return set()
+
+        committed_keys = self.journal.get_committed(bucket_name, data_source.name)
+        report.record(SAMPLE_SKIPPED, len(committed_keys))
+        return committed_keys
+
+    def _get_existing_shards(
+        self, bucket_name: str, data_source: DataSource
+    ) -> tuple[list[str], list[str], ExistingSamples | None]:
+        """
+        Lists the shards of a data source, and the samples of the ones kept: all of them in
+        incremental mode, otherwise the ones recorded in the journal by an interrupted
+        upload, which resumes from their indexes. New shards are numbered after the
+        existing ones, the others being removed once the upload completes, so a failed
+        upload never loses the previous shards.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            data_source (DataSource): The data source being uploaded.
+
+        Returns:
+            tuple[list[str], list[str], ExistingSamples | None]: The object names of the
+                shards and of the ones to replace, and the samples of the kept ones, None
+                if no shard is kept.
+        """
+        prefix = f"{data_source.name}/{SHARDS_FOLDER_NAME}/"
+        shard_object_names = list_shards(self.bucket_client, bucket_name, prefix)
+        if self.incremental:
+            kept_shard_object_names = shard_object_names
+        elif self.journal is not None:
+            committed_keys = self.journal.get_committed(bucket_name, data_source.name)
+            kept_shard_object_names = [
+                shard_object_name
+                for shard_object_name in shard_object_names
+                if shard_object_name in committed_keys
+            ]
         else:
-            raise TypeError(
-                f"Unsupported data source's type: {type(data_source).__name__}"
-            )
+            kept_shard_object_names = []
+
+        replaced_shard_object_names = [
+            shard_object_name
+            for shard_object_name in shard_object_names
+            if shard_object_name not in kept_shard_object_names
+        ]
+        if not kept_shard_object_names:
+            return shard_object_names, replaced_shard_object_names, None
+
+        return (
+            shard_object_names,
+            replaced_shard_object_names,
+            ExistingSamples.from_shard_index(
+                ShardIndex.load(
+                    self.bucket_client,
+                    bucket_name,
+                    prefix,
+                    shard_object_names=kept_shard_object_names,
+                )
+            ),
+        )
+
+    def _record_shard(
+        self, bucket_name: str, data_source: DataSource
+    ) -> Callable[[str], None] | None:
+        """
+        Gets the callback recording a data source's uploaded shards in the journal, for an
+        interrupted upload to keep them. None without a journal.
+        """
+        if self.journal is None:
+            return None
+        return lambda shard_object_name: self.journal.record(
+            bucket_name, data_source.name, shard_object_name
+        )
+
+    def _remove_replaced_shards(
+        self, bucket_name: str, replaced_shard_object_names: list[str]
+    ) -> None:
+        """
+        Removes the shards replaced by an upload along with their indexes.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            replaced_shard_object_names (list[str]): The shards to remove, as listed by
+                `_get_existing_shards`.
+        """
+        if not replaced_shard_object_names:
+            return
+
+        report = self.bucket_client.remove_objects(
+            bucket_name,
+            object_names=[
+                object_name
+                for shard_object_name in replaced_shard_object_names
+                for object_name in (
+                    shard_object_name,
+                    get_shard_index_object_name(shard_object_name),
+                )
+            ],
+        )
+        if report.failures:
+            raise RuntimeError(f"Couldn't remove the replaced shards: {report}")
+
+    @staticmethod
+    def _is_same_file(obj, file_path: str, size: int) -> bool:
+        """
+        Compares a stored object with a local file, by MD5 when the etag is one, i.e. when
+        it was not uploaded in parts, and by size otherwise.
+        """
+        if obj.size != size:
+            return False
+
+        etag = (obj.etag or "").strip('"')
+        if "-" in etag:
+            return True
+        with open(file_path, "rb") as f:
+            return hashlib.file_digest(f, "md5").hexdigest() == etag
+
+    @staticmethod
+    def _get_local_metadata(
+        data_source: LocalDataSource, files: list[tuple[str, int]]
+    ) -> dict:
+        """
+        Builds the metadata of a local data source once for all of its files, with the
+        size and number of files found by the scan.
+
+        Args:
+            data_source (LocalDataSource): The data source being uploaded.
+            files (list[tuple[str, int]]): The data source's files and their sizes.
+
+        Returns:
+            dict: The metadata attached to the uploaded objects.
+        """
+        metadata = data_source.get_metadata()
+        metadata.size = sum(size for _, size in files)
+        metadata.number_of_records = len(files)
+        return metadata.to_dict()
 
     def _upload_imported_data_source(
-        self, bucket_name: str, data_source: LocalDataSource
+        self,
+        bucket_name: str,
+        data_source: LocalDataSource,
+        report: IngestionReport,
+        annotation_table: AnnotationTableBuilder,
     ) -> None:
         """
         Uploads a local dataset to a specified bucket.
 
+        The data source's folder is scanned once, then its files are uploaded by a pool of
+        `max_workers` threads, at most `IN_FLIGHT_PER_WORKER` per worker being submitted
+        but not uploaded yet. JSON annotations are added to the annotation table along with
+        the dimensions of the image sharing their name, uploaded or not.
+
         Args:
             bucket_name (str): Name of the bucket where the dataset will be uploaded.
             data_source (LocalDataSource): A LocalDataset object to upload.
+            report (IngestionReport): Counts the uploaded and skipped files.
+            annotation_table (AnnotationTableBuilder): Collects the annotations.
         """
-        for current_directory, _, file_list in os.walk(data_source.root_folder_path):
-            for file_name in file_list:
-                file_path_on_disk = os.path.join(current_directory, file_name)
-                relative_path = os.path.relpath(
-                    file_path_on_disk, start=data_source.root_folder_path
+        files = data_source.scan_files()
+        metadata = self._get_local_metadata(data_source, files)
+
+        if self.storage_layout == STORAGE_LAYOUT_SHARDS:
+            self._upload_imported_data_source_sharded(
+                bucket_name, data_source, files, metadata, report, annotation_table
+            )
+            return
+
+        existing_objects = (
+            {
+                obj.object_name: obj
+                for obj in self.bucket_client.list_objects(
+                    bucket_name, f"{data_source.name}/", recursive=True
                 )
-                bucket_object_path = os.path.join(data_source.name, relative_path)
-                self.bucket_client.upload_file(
-                    bucket_name,
-                    bucket_object_path,
-                    file_path_on_disk,
-                    data_source.get_metadata().to_dict(),
+            }
+            if self.incremental
+            else {}
+        )
+        committed_keys = self._get_committed_keys(bucket_name, data_source, report)
+        pending_files = [
+            (relative_path, size)
+            for relative_path, size in files
+            if relative_path not in committed_keys
+        ]
+        image_paths = self._get_local_image_paths(files)
+
+        def upload_file(file: tuple[str, int]) -> str:
+            relative_path, size = file
+            if relative_path.endswith(".json"):
+                self._add_local_annotation(
+                    annotation_table,
+                    data_source.root_folder_path,
+                    relative_path,
+                    image_paths,
                 )
+            file_path_on_disk = os.path.join(
+                data_source.root_folder_path, relative_path
+            )
+            bucket_object_path = os.path.join(data_source.name, relative_path)
 
-    def _upload_huggingface_data_source(
-        self, bucket_name: str, data_source: HuggingFaceDataSource
+            existing_object = existing_objects.get(bucket_object_path)
+            if existing_object is None:
+                outcome = SAMPLE_ADDED
+            elif self._is_same_file(existing_object, file_path_on_disk, size):
+                return SAMPLE_SKIPPED
+            else:
+                outcome = SAMPLE_CHANGED
+
+            self.bucket_client.upload_file(
+                bucket_name, bucket_object_path, file_path_on_disk, metadata
+            )
+            if self.catalog is not None:
+                self.catalog.record(
+                    bucket_name=bucket_name,
+                    object_name=bucket_object_path,
+                    size=size,
+                    data_source_uuid=data_source.uuid,
+                )
+            return outcome
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for (relative_path, _), future in tqdm.tqdm(
+                bounded_as_completed(
+                    executor,
+                    upload_file,
+                    pending_files,
+                    max_in_flight=IN_FLIGHT_PER_WORKER * self.max_workers,
+                ),
+                total=len(pending_files),
+                desc="Uploading files",
+            ):
+                report.record(future.result())
+                if self.journal is not None:
+                    self.journal.record(bucket_name, data_source.name, relative_path)
+
+    def _upload_imported_data_source_sharded(
+        self,
+        bucket_name: str,
+        data_source: LocalDataSource,
+        files: list[tuple[str, int]],
+        metadata: dict,
+        report: IngestionReport,
+        annotation_table: AnnotationTableBuilder,
     ) -> None:
         """
-        Uploads a HuggingFace dataset to a specified bucket.
+        Packs the files of a local dataset into shards, each file keeping its relative path
+        as member name so that files sharing a stem form a sample. Samples are read by a
+        pool of threads while full shards are uploaded. The annotations of every sample,
+        packed or skipped, are added to the annotation table.
 
         Args:
             bucket_name (str): Name of the bucket where the dataset will be uploaded.
-            data_source (HuggingFaceDataSource): HuggingFaceDataSource object to be uploaded.
+            data_source (LocalDataSource): A LocalDataset object to upload.
+            files (list[tuple[str, int]]): The data source's files and their sizes.
+            metadata (dict): The metadata attached to the shards.
+            report (IngestionReport): Counts the packed and skipped samples.
+            annotation_table (AnnotationTableBuilder): Collects the annotations.
         """
-        hf_data_source = load_dataset(data_source.dataset_name)
+        (
+            shard_object_names,
+            replaced_shard_object_names,
+            existing_samples,
+        ) = self._get_existing_shards(bucket_name, data_source)
 
-        max_workers = 10
+        # The files of a sample are added together, to be stored contiguously
+        samples: dict[str, list[str]] = {}
+        for relative_path, _ in files:
+            key, _ = split_member_name(relative_path)
+            samples.setdefault(key, []).append(relative_path)
 
-        with ThreadPoolExecutor(max_workers=max_workers) as executor:
-            futures = []
+        image_paths = self._get_local_image_paths(files)
 
-            total_items = sum(
-                len(hf_data_source[split]) for split in hf_data_source.keys()
-            )
-            with tqdm.tqdm(
-                total=total_items, desc="Scheduling uploads"
-            ) as schedule_bar:
-                for split in hf_data_source.keys():
-                    for item in hf_data_source[split]:
-                        future = executor.submit(
-                            self._upload_task,
-                            bucket_name,
-                            data_source.name,
-                            item,
-                            data_source.get_metadata().to_dict(),
-                        )
-                        futures.append(future)
+        def pack_sample(sample: tuple[str, list[str]]) -> str:
+            key, relative_paths = sample
+            for relative_path in relative_paths:
+                if relative_path.endswith(".json"):
+                    self._add_local_annotation(
+                        annotation_table,
+                        data_source.root_folder_path,
+                        relative_path,
+                        image_paths,
+                    )
 
-                        schedule_bar.update(1)
+            outcome = SAMPLE_ADDED
+            if existing_samples is not None:
+                json_data = None
+                annotation_path = get_member_name(key, "json")
+                if annotation_path in relative_paths:
+                    with open(
+                        os.path.join(data_source.root_folder_path, annotation_path),
+                        "rb",
+                    ) as f:
+                        json_data = f.read()
+                outcome = existing_samples.get_outcome(key, json_data)
+                if outcome == SAMPLE_SKIPPED:
+                    return outcome
 
-            for _ in tqdm.tqdm(
-                as_completed(futures), total=len(futures), desc="Uploading files"
+            sample_files = {}
+            for relative_path in relative_paths:
+                with open(
+                    os.path.join(data_source.root_folder_path, relative_path), "rb"
+                ) as f:
+                    sample_files[split_member_name(relative_path)[1]] = f.read()
+            shard_writer.add(key, sample_files)
+            return outcome
+
+        with ShardWriter(
+            self.bucket_client,
+            bucket_name,
+            prefix=f"{data_source.name}/{SHARDS_FOLDER_NAME}",
+            max_bytes=self.shard_max_bytes,
+            metadata=metadata,
+            first_shard_number=get_next_shard_number(shard_object_names, "shard"),
+            on_upload=self._record_shard(bucket_name, data_source),
+        ) as shard_writer, ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            for _, future in tqdm.tqdm(
+                bounded_as_completed(
+                    executor,
+                    pack_sample,
+                    samples.items(),
+                    max_in_flight=IN_FLIGHT_PER_WORKER * self.max_workers,
+                ),
+                total=len(samples),
+                desc="Packing files",
             ):
-                pass
+                report.record(future.result())
+
+        self._catalog_shards(bucket_name, shard_writer, data_source.uuid)
+        self._remove_replaced_shards(bucket_name, replaced_shard_object_names)
+
+    def _upload_huggingface_data_source(
+        self,
+        bucket_name: str,
+        data_source: HuggingFaceDataSource,
+        report: IngestionReport,
+        annotation_table: AnnotationTableBuilder,
+    ) -> None:
+        """
+        Uploads a HuggingFace dataset to a specified bucket.
+
+        Args:
+            bucket_name (str): Name of the bucket where the dataset will be uploaded.
+            data_source (HuggingFaceDataSource): HuggingFaceDataSource object to be uploaded.
+            report (IngestionReport): Counts the uploaded and skipped samples.
+            annotation_table (AnnotationTableBuilder): Collects the annotations.
+        """
+        # Images are kept encoded, to be hashed and uploaded without being decoded
+        hf_data_source = load_dataset(
+            data_source.dataset_name, streaming=data_source.streaming
+        ).cast_column("image", HuggingFaceImage(decode=False))
+
+        existing_samples = (
+            ExistingSamples.list(self.bucket_client, bucket_name, data_source.name)
+            if self.incremental and self.storage_layout == STORAGE_LAYOUT_OBJECTS
+            else None
+        )
+        # Shards are resumed from their indexes, as their samples are committed in batches
+        committed_keys = (
+            self._get_committed_keys(bucket_name, data_source, report)
+            if self.storage_layout == STORAGE_LAYOUT_OBJECTS
+            else set()
+        )
+
+        if self.storage_layout == STORAGE_LAYOUT_SHARDS:
+            self._upload_huggingface_items_sharded(
+                bucket_name, data_source, hf_data_source, report, annotation_table
+            )
+        elif self.async_bucket_client is not None:
+            asyncio.run(
+                self._upload_huggingface_items_async(
+                    bucket_name,
+                    data_source,
+                    hf_data_source,
+                    existing_samples,
+                    committed_keys,
+                    report,
+                    annotation_table,
+                )
+            )
+        else:
+            self._upload_huggingface_items(
+                bucket_name,
+                data_source,
+                hf_data_source,
+                existing_samples,
+                committed_keys,
+                report,
+                annotation_table,
+            )
 
         label_map_path = os.path.join(data_source.name, "label_map.json")
         self._upload_json(
@@ -111,12 +835,337 @@ class DataUploaderService:
             data=data_source.label_map,
         )
 
+    def _upload_huggingface_items(
+        self,
+        bucket_name: str,
+        data_source: HuggingFaceDataSource,
+        hf_data_source: DatasetDict,
+        existing_samples: ExistingSamples | None,
+        committed_keys: set[str],
+        report: IngestionReport,
+        annotation_table: AnnotationTableBuilder,
+    ) -> None:
+        """
+        Uploads the items of every split of a HuggingFace dataset with a pool of threads.
+
+        Items are read lazily and at most `IN_FLIGHT_PER_WORKER` per worker are submitted but
+        not uploaded yet, so memory does not grow with the size of the dataset. The first
+        failed upload stops the scheduling and is raised once the running uploads are done.
+
+        Args:
+            bucket_name (str): Name of the bucket where the dataset will be uploaded.
+            data_source (HuggingFaceDataSource): The data source being uploaded.
+            hf_data_source (DatasetDict): The loaded HuggingFace dataset.
+            existing_samples (ExistingSamples | None): The samples not to upload again.
+            committed_keys (set[str]): The items committed by an interrupted upload.
+            report (IngestionReport): Counts the uploaded and skipped samples.
+            annotation_table (AnnotationTableBuilder): Collects the annotations.
+        """
+        metadata = data_source.get_metadata().to_dict()
+        total_items = self._count_items(hf_data_source)
+        if total_items is not None:
+            total_items -= len(committed_keys)
+
+        with self._start_cpu_stage(hf_data_source) as cpu_executor, ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            items = (
+                (split, index, item)
+                for split in hf_data_source.keys()
+                for index, item in self._iter_split_items(
+                    hf_data_source, split, cpu_executor, committed_keys
+                )
+            )
+            for (split, index, _), future in tqdm.tqdm(
+                bounded_as_completed(
+                    executor,
+                    lambda indexed_item: self._upload_task(
+                        bucket_name,
+                        data_source.name,
+                        indexed_item[2],
+                        metadata,
+                        data_source.uuid,
+                        indexed_item[0],
+                        existing_samples,
+                        report,
+                        annotation_table,
+                    ),
+                    items,
+                    max_in_flight=IN_FLIGHT_PER_WORKER * self.max_workers,
+                ),
+                total=total_items,
+                desc="Uploading files",
+            ):
+                future.result()
+                if self.journal is not None:
+                    self.journal.record(
+                        bucket_name, data_source.name, get_item_key(split, index)
+                    )
+
+    def _upload_huggingface_items_sharded(
+        self,
+        bucket_name: str,
+        data_source: HuggingFaceDataSource,
+        hf_data_source: DatasetDict,
+        report: IngestionReport,
+        annotation_table: AnnotationTableBuilder,
+    ) -> None:
+        """
+        Packs the items of each split of a HuggingFace dataset into the split's shards,
+        `{split}-{number}.tar`, the items being encoded by a pool of threads, or prepared by
+        the CPU stage, while full shards are uploaded.
+
+        Args:
+            bucket_name (str): Name of the bucket where the dataset will be uploaded.
+            data_source (HuggingFaceDataSource): The data source being uploaded.
+            hf_data_source (DatasetDict): The loaded HuggingFace dataset.
+            report (IngestionReport): Counts the packed and skipped samples.
+            annotation_table (AnnotationTableBuilder): Collects the annotations.
+        """
+        metadata = data_source.get_metadata().to_dict()
+        (
+            shard_object_names,
+            replaced_shard_object_names,
+            existing_samples,
+        ) = self._get_existing_shards(bucket_name, data_source)
+
+        with self._start_cpu_stage(hf_data_source) as cpu_executor, ThreadPoolExecutor(
+            max_workers=self.max_workers
+        ) as executor:
+            for split in hf_data_source.keys():
+                with ShardWriter(
+                    self.bucket_client,
+                    bucket_name,
+                    prefix=f"{data_source.name}/{SHARDS_FOLDER_NAME}",
+                    max_bytes=self.shard_max_bytes,
+                    metadata=metadata,
+                    shard_name_prefix=split,
+                    first_shard_number=get_next_shard_number(shard_object_names, split),
+                    on_upload=self._record_shard(bucket_name, data_source),
+                ) as shard_writer:
+                    for _, future in tqdm.tqdm(
+                        bounded_as_completed(
+                            executor,
+                            lambda item: self._shard_task(
+                                shard_writer,
+                                data_source.name,
+                                item,
+                                existing_samples,
+                                report,
+                                annotation_table,
+                            ),
+                            (
+                                item
+                                for _, item in self._iter_split_items(
+                                    hf_data_source, split, cpu_executor
+                                )
+                            ),
+                            max_in_flight=IN_FLIGHT_PER_WORKER * self.max_workers,
+                        ),
+                        total=self._count_items(hf_data_source, split),
+                        desc=f"Packing {split} files",
+                    ):
+                        future.result()
+
+                self._catalog_shards(bucket_name, shard_writer, data_source.uuid, split)
+
+        self._remove_replaced_shards(bucket_name, replaced_shard_object_names)
+
+    @staticmethod
+    def _count_items(
+        hf_data_source: DatasetDict | IterableDatasetDict, split: str | None = None
+    ) -> int | None:
+        """
+        Counts the items of a HuggingFace dataset, or of one of its splits.
+
+        Args:
+            hf_data_source (DatasetDict | IterableDatasetDict): The loaded HuggingFace dataset.
+            split (str | None): The split to count, all of them if None.
+
+        Returns:
+            int | None: The number of items, or None for a streamed dataset.
+        """
+        if isinstance(hf_data_source, IterableDatasetDict):
+            return None
+
+        splits = hf_data_source.keys() if split is None else [split]
+        return sum(len(hf_data_source[split]) for split in splits)
+
+    @contextmanager
+    def _start_cpu_stage(
+        self, hf_data_source: DatasetDict
+    ) -> Generator[ProcessPoolExecutor | None, None, None]:
+        """
+        Starts the pool of `cpu_workers` processes preparing the images of a HuggingFace
+        dataset, so decoding, encoding and hashing do not compete for the GIL with the
+        uploads.
+
+        Args:
+            hf_data_source (DatasetDict): The loaded HuggingFace dataset.
+
+        Yields:
+            ProcessPoolExecutor | None: The pool, or None without `cpu_workers`.
+        """
+        if self.cpu_workers <= 0:
+            yield None
+            return
+
+        # Streamed datasets have no files to read the images from, they are sent instead
+        if isinstance(hf_data_source, IterableDatasetDict):
+            hf_data_source = None
+
+        ensure_shared_memory_tracker()
+        with ProcessPoolExecutor(
+            max_workers=self.cpu_workers,
+            initializer=_init_image_worker,
+            initargs=(hf_data_source,),
+        ) as cpu_executor:
+            yield cpu_executor
+
+    def _iter_split_items(
+        self,
+        hf_data_source: DatasetDict,
+        split: str,
+        cpu_executor: ProcessPoolExecutor | None,
+        committed_keys: set[str] | None = None,
+    ) -> Generator[tuple[int, dict], None, None]:
+        """
+        Reads the items of a split, their images being prepared by the CPU stage if any.
+
+        With the CPU stage, items are yielded as their images are ready, as `SharedImage`.
+        The processes read the images from the dataset's files, so this process never does,
+        except for streamed datasets whose items are sent to the processes. Committed items
+        are skipped before their images are read or prepared, but streamed ones must still
+        be downloaded to reach the next items.
+
+        Args:
+            hf_data_source (DatasetDict): The loaded HuggingFace dataset.
+            split (str): The split to read.
+            cpu_executor (ProcessPoolExecutor | None): The CPU stage's pool.
+            committed_keys (set[str] | None): The items committed by an interrupted upload.
+
+        Yields:
+            tuple[int, dict]: The split's items, with their index in the split.
+        """
+        split_data_source = hf_data_source[split]
+        committed_keys = committed_keys or set()
+
+        if isinstance(split_data_source, IterableDataset):
+            indexed_items = (
+                (index, item)
+                for index, item in enumerate(split_data_source)
+                if get_item_key(split, index) not in committed_keys
+            )
+            if cpu_executor is None:
+                yield from indexed_items
+                return
+
+            for (index, item), future in bounded_as_completed(
+                cpu_executor,
+                _prepare_streamed_shared_image,
+                indexed_items,
+                max_in_flight=IN_FLIGHT_PER_WORKER * self.cpu_workers,
+            ):
+                item["image"] = future.result()
+                yield index, item
+            return
+
+        indexes = [
+            index
+            for index in range(len(split_data_source))
+            if get_item_key(split, index) not in committed_keys
+        ]
+        if cpu_executor is None:
+            if len(indexes) < len(split_data_source):
+                split_data_source = split_data_source.select(indexes)
+            yield from zip(indexes, split_data_source)
+            return
+
+        annotations = split_data_source.remove_columns("image")
+        for index, future in bounded_as_completed(
+            cpu_executor,
+            partial(_prepare_shared_image, split),
+            indexes,
+            max_in_flight=IN_FLIGHT_PER_WORKER * self.cpu_workers,
+        ):
+            item = annotations[index]
+            item["image"] = future.result()
+            yield index, item
+
+    async def _upload_huggingface_items_async(
+        self,
+        bucket_name: str,
+        data_source: HuggingFaceDataSource,
+        hf_data_source: DatasetDict,
+        existing_samples: ExistingSamples | None,
+        committed_keys: set[str],
+        report: IngestionReport,
+        annotation_table: AnnotationTableBuilder,
+    ) -> None:
+        """
+        Uploads the items of every split of a HuggingFace dataset with the async bucket client,
+        keeping at most `ASYNC_MAX_IN_FLIGHT` items in flight.
+
+        Args:
+            bucket_name (str): Name of the bucket where the dataset will be uploaded.
+            data_source (HuggingFaceDataSource): The data source being uploaded.
+            hf_data_source (DatasetDict): The loaded HuggingFace dataset.
+            existing_samples (ExistingSamples | None): The samples not to upload again.
+            committed_keys (set[str]): The items committed by an interrupted upload.
+            report (IngestionReport): Counts the uploaded and skipped samples.
+            annotation_table (AnnotationTableBuilder): Collects the annotations.
+        """
+        metadata = data_source.get_metadata().to_dict()
+        items = (
+            (split, index, item)
+            for split in hf_data_source.keys()
+            for index, item in self._iter_split_items(
+                hf_data_source, split, None, committed_keys
+            )
+        )
+        total_items = self._count_items(hf_data_source)
+        if total_items is not None:
+            total_items -= len(committed_keys)
+
+        def on_result(indexed_item: tuple[str, int, dict], _) -> None:
+            progress_bar.update(1)
+            if self.journal is not None:
+                self.journal.record(
+                    bucket_name,
+                    data_source.name,
+                    get_item_key(indexed_item[0], indexed_item[1]),
+                )
+
+        async with self.async_bucket_client:
+            with tqdm.tqdm(total=total_items, desc="Uploading files") as progress_bar:
+                await run_bounded(
+                    lambda indexed_item: self._upload_task_async(
+                        bucket_name,
+                        data_source.name,
+                        indexed_item[2],
+                        metadata,
+                        data_source.uuid,
+                        indexed_item[0],
+                        existing_samples,
+                        report,
+                        annotation_table,
+                    ),
+                    items,
+                    max_in_flight=ASYNC_MAX_IN_FLIGHT,
+                    on_result=on_result,
+                )
+
     def _upload_task(
         self,
         bucket_name: str,
         dataset_name: str,
         item: dict,
         metadata: dict | None = None,
+        data_source_uuid: str | None = None,
+        split: str | None = None,
+        existing_samples: ExistingSamples | None = None,
+        report: IngestionReport | None = None,
+        annotation_table: AnnotationTableBuilder | None = None,
     ) -> None:
         """
         Task to upload an image and its corresponding JSON to the bucket.
@@ -126,45 +1175,332 @@ class DataUploaderService:
             dataset_name (str): Name of the dataset.
             item (dict): An item from the dataset containing image and metadata.
             metadata (metadata: dict | None): The file's metadata.
+            data_source_uuid (str | None): UUID of the data source, recorded in the catalog.
+            split (str | None): The item's split, recorded in the catalog.
+            existing_samples (ExistingSamples | None): The samples not to upload again.
+            report (IngestionReport | None): Counts the uploaded and skipped samples.
+            annotation_table (AnnotationTableBuilder | None): Collects the annotations of
+                the items, skipped or not.
         """
-        unique_id = self._hash_image(item["image"])
+        with self._open_image(item["image"]) as (unique_id, image_data, extension):
+            image_path = f"{dataset_name}/images/{unique_id}.{extension}"
+            item["litter"]["image_path"] = image_path
+            json_data = self._encode_json(item["litter"])
+            if annotation_table is not None:
+                annotation_table.add(
+                    unique_id, item["litter"], get_image_dimensions(image_data)
+                )
+
+            outcome = (
+                existing_samples.get_outcome(unique_id, json_data)
+                if existing_samples is not None
+                else SAMPLE_ADDED
+            )
+            if outcome == SAMPLE_SKIPPED:
+                if report is not None:
+                    report.record(outcome)
+                return
+
+            if outcome == SAMPLE_ADDED:
+                self._upload_image(
+                    bucket_name=bucket_name,
+                    image_path=image_path,
+                    image_data=image_data,
+                    metadata=metadata,
+                )
 
-        image_path = f"{dataset_name}/images/{unique_id}.png"
-        self._upload_image(
+        json_path = f"{dataset_name}/annotations/{unique_id}.json"
+        self.bucket_client.upload_data(
             bucket_name=bucket_name,
-            image_path=image_path,
-            image=item["image"],
+            object_name=json_path,
+            data=json_data,
+            length=len(json_data),
             metadata=metadata,
         )
 
+        self._catalog_item(
+            bucket_name, [image_path, json_path], item, data_source_uuid, split
+        )
+        if report is not None:
+            report.record(outcome)
+
+    async def _upload_task_async(
+        self,
+        bucket_name: str,
+        dataset_name: str,
+        item: dict,
+        metadata: dict | None = None,
+        data_source_uuid: str | None = None,
+        split: str | None = None,
+        existing_samples: ExistingSamples | None = None,
+        report: IngestionReport | None = None,
+        annotation_table: AnnotationTableBuilder | None = None,
+    ) -> None:
+        """
+        Asynchronous counterpart of `_upload_task`, sending the image and its JSON concurrently.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            dataset_name (str): Name of the dataset.
+            item (dict): An item from the dataset containing image and metadata.
+            metadata (metadata: dict | None): The file's metadata.
+            data_source_uuid (str | None): UUID of the data source, recorded in the catalog.
+            split (str | None): The item's split, recorded in the catalog.
+            existing_samples (ExistingSamples | None): The samples not to upload again.
+            report (IngestionReport | None): Counts the uploaded and skipped samples.
+            annotation_table (AnnotationTableBuilder | None): Collects the annotations of
+                the items, skipped or not.
+        """
+        # Hashing, transcoding and measuring the image run in a worker thread, so they
+        # do not stall the uploads awaited on the event loop meanwhile
+        unique_id, image_data, extension, image_size = await asyncio.to_thread(
+            self._prepare_image_with_size, item["image"]
+        )
+
+        image_path = f"{dataset_name}/images/{unique_id}.{extension}"
         json_path = f"{dataset_name}/annotations/{unique_id}.json"
         item["litter"]["image_path"] = image_path
 
-        self._upload_json(
-            bucket_name=bucket_name,
-            json_path=json_path,
-            data=item["litter"],
-            metadata=metadata,
+        json_data = self._encode_json(item["litter"])
+        if annotation_table is not None:
+            annotation_table.add(unique_id, item["litter"], image_size)
+        outcome = (
+            existing_samples.get_outcome(unique_id, json_data)
+            if existing_samples is not None
+            else SAMPLE_ADDED
         )
+        if outcome == SAMPLE_SKIPPED:
+            if report is not None:
+                report.record(outcome)
+            return
+
+        uploads = [
+            self.async_bucket_client.upload_data(
+                bucket_name=bucket_name,
+                object_name=json_path,
+                data=json_data,
+                metadata=metadata,
+            )
+        ]
+        if outcome == SAMPLE_ADDED:
+            uploads.append(
+                self.async_bucket_client.upload_data(
+                    bucket_name=bucket_name,
+                    object_name=image_path,
+                    data=image_data,
+                    metadata=metadata,
+                )
+            )
+        json_etag, *image_etags = await asyncio.gather(*uploads)
+
+        if self.catalog is not None:
+            for image_etag in image_etags:
+                self.catalog.record(
+                    bucket_name, image_path, size=image_data.nbytes, etag=image_etag
+                )
+            self.catalog.record(
+                bucket_name, json_path, size=len(json_data), etag=json_etag
+            )
+        self._catalog_item(
+            bucket_name, [image_path, json_path], item, data_source_uuid, split
+        )
+        if report is not None:
+            report.record(outcome)
+
+    def _shard_task(
+        self,
+        shard_writer: ShardWriter,
+        dataset_name: str,
+        item: dict,
+        existing_samples: ExistingSamples | None = None,
+        report: IngestionReport | None = None,
+        annotation_table: AnnotationTableBuilder | None = None,
+    ) -> None:
+        """
+        Task to pack an image and its corresponding JSON into the current shard.
+
+        The annotation's `image_path` remains the one of the objects layout, the sample
+        being found in the shards by its key, the image's hash. Samples already packed in
+        a previous shard are skipped unless their annotation changed, in which case they
+        are packed again, shards being immutable.
+
+        Args:
+            shard_writer (ShardWriter): The writer of the data source's shards.
+            dataset_name (str): Name of the dataset.
+            item (dict): An item from the dataset containing image and metadata.
+            existing_samples (ExistingSamples | None): The samples not to pack again.
+            report (IngestionReport | None): Counts the packed and skipped samples.
+            annotation_table (AnnotationTableBuilder | None): Collects the annotations of
+                the items, skipped or not.
+        """
+        with self._open_image(item["image"]) as (unique_id, image_data, extension):
+            if annotation_table is not None:
+                annotation_table.add(
+                    unique_id, item["litter"], get_image_dimensions(image_data)
+                )
+            item["litter"][
+                "image_path"
+            ] = f"{dataset_name}/images/{unique_id}.{extension}"
+            json_data = self._encode_json(item["litter"])
+            outcome = (
+                existing_samples.get_outcome(unique_id, json_data)
+                if existing_samples is not None
+                else SAMPLE_ADDED
+            )
+            if outcome != SAMPLE_SKIPPED:
+                shard_writer.add(unique_id, {extension: image_data, "json": json_data})
+        if report is not None:
+            report.record(outcome)
+
+    def _catalog_shards(
+        self,
+        bucket_name: str,
+        shard_writer: ShardWriter,
+        data_source_uuid: str,
+        split: str | None = None,
+    ) -> None:
+        """
+        Records the uploaded shards in the catalog. Does nothing without a catalog.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            shard_writer (ShardWriter): The closed writer of the shards.
+            data_source_uuid (str): UUID of the data source.
+            split (str | None): The split of the shards' items.
+        """
+        if self.catalog is None:
+            return
+
+        for shard_object_name, size in shard_writer.uploaded_shards:
+            self.catalog.record(
+                bucket_name=bucket_name,
+                object_name=shard_object_name,
+                size=size,
+                data_source_uuid=data_source_uuid,
+                split=split,
+            )
+
+    def _catalog_item(
+        self,
+        bucket_name: str,
+        object_names: list[str],
+        item: dict,
+        data_source_uuid: str | None,
+        split: str | None,
+    ) -> None:
+        """
+        Records an uploaded item's objects in the catalog, along with their data source, split
+        and labels. Does nothing without a catalog.
+
+        Args:
+            bucket_name (str): Name of the bucket.
+            object_names (list[str]): The objects uploaded for the item.
+            item (dict): The uploaded item.
+            data_source_uuid (str | None): UUID of the data source.
+            split (str | None): The item's split.
+        """
+        if self.catalog is None:
+            return
+
+        for object_name in object_names:
+            self.catalog.record(
+                bucket_name=bucket_name,
+                object_name=object_name,
+                data_source_uuid=data_source_uuid,
+                split=split,
+                labels=item["litter"].get("label", []),
+            )
+
+    @contextmanager
+    def _open_image(
+        self, image: SharedImage | dict | PIL.Image.Image
+    ) -> Generator[tuple[str, BufferData, str], None, None]:
+        """
+        Gets an image's hash, bytes and extension, from the CPU stage's shared memory or by
+        preparing it, the shared memory being released on exit.
+
+        Args:
+            image (SharedImage | dict | PIL.Image.Image): The prepared, undecoded or decoded
+                image.
+
+        Yields:
+            tuple[str, BufferData, str]: The hash, the bytes and the extension of the image.
+        """
+        if not isinstance(image, SharedImage):
+            yield self._prepare_image(image)
+            return
+
+        with attach_shared_buffer(image.shared_memory_name, image.size) as image_data:
+            yield image.unique_id, image_data, image.extension
+
+    @classmethod
+    def _prepare_image_with_size(
+        cls, image: dict | PIL.Image.Image
+    ) -> tuple[str, BufferData, str, tuple[int, int]]:
+        """
+        Prepares an image like `_prepare_image`, also reading its dimensions.
+
+        Args:
+            image (dict | PIL.Image.Image): The undecoded or decoded image.
+
+        Returns:
+            tuple[str, BufferData, str, tuple[int, int]]: The hash, the bytes, the extension
+                and the dimensions of the image.
+        """
+        unique_id, image_data, extension = cls._prepare_image(image)
+        return unique_id, image_data, extension, get_image_dimensions(image_data)
+
+    @classmethod
+    def _prepare_image(
+        cls, image: dict | PIL.Image.Image
+    ) -> tuple[str, BufferData, str]:
+        """
+        Gets the bytes to upload for an image, along with their hash and file extension.
+
+        Undecoded HuggingFace images, {"bytes": ..., "path": ...}, are uploaded as they are
+        when their format is one of `UPLOADED_IMAGE_FORMATS`, so they are never compressed
+        again. Other formats, and decoded images, are encoded as PNG once.
+
+        Args:
+            image (dict | PIL.Image.Image): The undecoded or decoded image.
+
+        Returns:
+            tuple[str, BufferData, str]: The hash, the bytes and the extension of the image.
+        """
+        if isinstance(image, dict):
+            image_data = image["bytes"]
+            if image_data is None:
+                with open(image["path"], "rb") as f:
+                    image_data = f.read()
+
+            image_format = sniff_image_format(image_data[:IMAGE_HEADER_SIZE])
+            if image_format in UPLOADED_IMAGE_FORMATS:
+                image_data = memoryview(image_data)
+                return (
+                    cls._hash_image(image_data),
+                    image_data,
+                    UPLOADED_IMAGE_FORMATS[image_format],
+                )
+
+            with PIL.Image.open(io.BytesIO(image_data)) as decoded_image:
+                image_data = cls._encode_image(decoded_image)
+        else:
+            image_data = cls._encode_image(image)
+
+        return cls._hash_image(image_data), image_data, "png"
 
     @staticmethod
-    def _hash_image(image: PIL.Image) -> str:
+    def _hash_image(image_data: BufferData) -> str:
         """
-        Generates a SHA-256 hash for a given image.
+        Generates a SHA-256 hash for a given encoded image.
 
         Args:
-            image (PIL.Image): Image object to be hashed.
+            image_data (BufferData): The encoded image to be hashed.
 
         Returns:
             str: Hexadecimal hash of the image.
         """
-        img_byte_arr = io.BytesIO()
-        image.save(img_byte_arr, format=image.format)
-        img_byte_arr = img_byte_arr.getvalue()
-
-        hasher = hashlib.sha256()
-        hasher.update(img_byte_arr)
-        return hasher.hexdigest()
+        return hashlib.sha256(image_data).hexdigest()
 
     def _upload_file(
         self,
@@ -193,26 +1529,23 @@ class DataUploaderService:
         self,
         bucket_name: str,
         image_path: str,
-        image: PIL.Image,
+        image_data: BufferData,
         metadata: dict | None = None,
     ) -> None:
         """
-        Uploads an image to a specified bucket.
+        Uploads an encoded image to a specified bucket.
 
         Args:
             bucket_name (str): Name of the bucket where the image will be uploaded.
             image_path (str): Path within the bucket where the image will be stored.
-            image (PIL.Image): Image object to be uploaded.
+            image_data (BufferData): The encoded image to be uploaded.
             metadata (metadata: dict | None): The image's metadata.
         """
-        image_buffer = io.BytesIO()
-        image.save(image_buffer, format="PNG")
-        image_buffer.seek(0)
         self.bucket_client.upload_data(
             bucket_name=bucket_name,
             object_name=image_path,
-            data=image_buffer,
-            length=image_buffer.getbuffer().nbytes,
+            data=image_data,
+            length=image_data.nbytes,
             metadata=metadata,
         )
 
@@ -228,15 +1561,42 @@ class DataUploaderService:
             data (dict): Data to be serialized to JSON and uploaded.
             metadata (metadata: dict | None): The json's metadata.
         """
-        json_data = json.dumps(data)
-        json_buffer = io.BytesIO(json_data.encode())
+        json_data = self._encode_json(data)
         self.bucket_client.upload_data(
             bucket_name=bucket_name,
             object_name=json_path,
-            data=json_buffer,
+            data=json_data,
             length=len(json_data),
             metadata=metadata,
         )
 
+    @staticmethod
+    def _encode_image(image: PIL.Image) -> BufferData:
+        """
+        Encodes an image as PNG.
+
+        Args:
+            image (PIL.Image): Image object to be encoded.
+
+        Returns:
+            BufferData: A view on the encoded bytes.
+        """
+        image_buffer = io.BytesIO()
+        image.save(image_buffer, format="PNG")
+        return image_buffer.getbuffer()
+
+    @staticmethod
+    def _encode_json(data: dict) -> bytes:
+        """
+        Serializes data to UTF-8 encoded JSON.
+
+        Args:
+            data (dict): Data to be serialized.
+
+        Returns:
+            bytes: The encoded JSON document.
+        """
+        return json.dumps(data).encode()
+
     def _upload_label_map(self, bucket_name: str, label_map: dict[int, str]):
         return
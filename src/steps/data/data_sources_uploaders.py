@@ -1,13 +1,28 @@
+import os
+
 from zenml import step
 from zenml.logger import get_logger
 
 from src.config.settings import (
+    BUCKET_METRICS_PATH,
+    DATALAKE_STORAGE_LAYOUT,
     MINIO_DATA_SOURCES_BUCKET_NAME,
+    SHARD_MAX_BYTES,
+    UPLOAD_CPU_WORKERS,
+    UPLOAD_INCREMENTAL,
+    UPLOAD_JOURNAL_PATH,
+    UPLOAD_MAX_WORKERS,
 )
 from src.models.model_bucket_client import BucketClient
 from src.models.model_data_source import DataSource, DataSourceList
+from src.models.model_object_catalog import CatalogBucketClient
+from src.models.model_upload_journal import UploadJournal
 from src.services.service_data_uploader import DataUploaderService
-from src.steps.data.datalake_initializers import validate_bucket_connection
+from src.steps.data.datalake_initializers import (
+    get_async_minio_client,
+    validate_bucket_connection,
+)
+from src.utils.metrics_helper import report_bucket_client_metrics
 
 
 def get_data_sources_bucket_name() -> str:
@@ -36,12 +51,13 @@ def upload_data(
     data_source: DataSource,
 ) -> None:
     """
-    Uploads data from the provided path to the bucket.
+    Uploads data from the provided path to the bucket, and logs how many samples were
+    added, changed or skipped.
     """
     logger = get_logger(__name__)
 
     try:
-        data_uploader_service.upload_data(
+        report = data_uploader_service.upload_data(
             bucket_name=bucket_name, data_source=data_source
         )
     except TypeError:
@@ -51,23 +67,68 @@ def upload_data(
         )
         raise
 
+    logger.info(str(report))
+
 
 @step
 def data_sources_uploader(
-    bucket_client: BucketClient, data_source_list: DataSourceList
+    bucket_client: BucketClient,
+    data_source_list: DataSourceList,
+    use_async_bucket_client: bool = False,
 ) -> None:
     """
     Flow for preparing data sources, which includes validating the data path, checking the bucket connection,
     configuring the bucket, and uploading the data.
+
+    With `use_async_bucket_client`, samples are uploaded through the asyncio MinIO client
+    rather than a pool of threads. When the bucket client is backed by the object catalog,
+    the samples' data source, split and labels are recorded in it. Samples are stored
+    with the `DATALAKE_STORAGE_LAYOUT` layout, one object per file or tar shards, their
+    images being prepared by `UPLOAD_CPU_WORKERS` processes and uploaded by
+    `UPLOAD_MAX_WORKERS` threads. With `UPLOAD_INCREMENTAL`, the samples already stored
+    are skipped, so a data source can be uploaded again cheaply. With `UPLOAD_JOURNAL_PATH`,
+    an interrupted upload resumes from the samples it had committed. The boxes of the
+    samples' annotations are saved to each data source's columnar annotation table.
     """
-    data_uploader_service = DataUploaderService(bucket_client)
+    journal = (
+        UploadJournal(os.path.abspath(UPLOAD_JOURNAL_PATH))
+        if UPLOAD_JOURNAL_PATH
+        else None
+    )
+    data_uploader_service = DataUploaderService(
+        bucket_client,
+        async_bucket_client=(
+            get_async_minio_client() if use_async_bucket_client else None
+        ),
+        catalog=(
+            bucket_client.catalog
+            if isinstance(bucket_client, CatalogBucketClient)
+            else None
+        ),
+        storage_layout=DATALAKE_STORAGE_LAYOUT,
+        shard_max_bytes=SHARD_MAX_BYTES,
+        max_workers=UPLOAD_MAX_WORKERS,
+        cpu_workers=UPLOAD_CPU_WORKERS,
+        incremental=UPLOAD_INCREMENTAL,
+        journal=journal,
+    )
     validate_bucket_connection(bucket_client=bucket_client)
 
-    for data_source in data_source_list.data_sources:
-        verify_data_source_path(data_source=data_source)
+    try:
+        for data_source in data_source_list.data_sources:
+            verify_data_source_path(data_source=data_source)
 
-        upload_data(
-            data_uploader_service=data_uploader_service,
-            bucket_name=get_data_sources_bucket_name(),
-            data_source=data_source,
-        )
+            upload_data(
+                data_uploader_service=data_uploader_service,
+                bucket_name=get_data_sources_bucket_name(),
+                data_source=data_source,
+            )
+    finally:
+        if journal is not None:
+            journal.close()
+
+    report_bucket_client_metrics(
+        bucket_client,
+        step_name="data_sources_uploader",
+        export_path=BUCKET_METRICS_PATH or None,
+    )
@@ -1,21 +1,44 @@
+import os
 from typing import List
 
 from zenml import step
 from zenml.logger import get_logger
 
 from src.config.settings import (
+    BUCKET_CACHE_MAX_BYTES,
+    BUCKET_CACHE_PATH,
+    BUCKET_HEDGE_PERCENTILE,
+    BUCKET_REQUEST_TIMEOUT,
+    BUCKET_RETRY_MAX_ATTEMPTS,
+    LOCAL_BUCKETS_ROOT_PATH,
+    MINIO_ASYNC_MAX_CONCURRENCY,
+    MINIO_ASYNC_MAX_CONNECTIONS,
+    MINIO_CONNECTION_CHECK_TTL,
     MINIO_DATA_SOURCES_BUCKET_NAME,
     MINIO_DATASETS_BUCKET_NAME,
     MINIO_ENDPOINT,
+    MINIO_LIST_CONCURRENCY,
+    MINIO_MAX_POOL_CONNECTIONS,
+    MINIO_MAX_WORKERS,
+    MINIO_MULTIPART_THRESHOLD,
+    MINIO_PARALLEL_UPLOADS,
+    MINIO_PART_SIZE,
     MINIO_PENDING_ANNOTATIONS_BUCKET_NAME,
     MINIO_PENDING_REVIEWS_BUCKET_NAME,
     MINIO_ROOT_PASSWORD,
     MINIO_ROOT_USER,
+    OBJECT_CATALOG_PATH,
 )
 from src.materializers.materializer_bucket_client import BucketClientMaterializer
 from src.materializers.materializer_data_source import DataSourceMaterializer
+from src.models.model_async_bucket_client import AsyncMinioClient
 from src.models.model_bucket_client import BucketClient, MinioClient
+from src.models.model_caching_bucket_client import CachingBucketClient
 from src.models.model_data_source import DataSourceList, HuggingFaceDataSource
+from src.models.model_instrumented_bucket_client import InstrumentedBucketClient
+from src.models.model_local_bucket_client import LocalFsBucketClient
+from src.models.model_object_catalog import CatalogBucketClient, ObjectCatalog
+from src.models.model_resilient_bucket_client import ResilientBucketClient
 
 
 @step
@@ -72,9 +95,139 @@ def minio_client_initializer() -> MinioClient:
         access_key=MINIO_ROOT_USER,
         secret_key=MINIO_ROOT_PASSWORD,
         secure=False,
+        max_workers=MINIO_MAX_WORKERS,
+        part_size=MINIO_PART_SIZE,
+        multipart_threshold=MINIO_MULTIPART_THRESHOLD,
+        parallel_uploads=MINIO_PARALLEL_UPLOADS,
+        list_concurrency=MINIO_LIST_CONCURRENCY,
+        max_pool_connections=MINIO_MAX_POOL_CONNECTIONS,
+        connection_check_ttl=MINIO_CONNECTION_CHECK_TTL,
     )
 
 
+def get_async_minio_client() -> AsyncMinioClient:
+    """
+    Build an asyncio MinIO client from the configuration. Its session is bound to an event
+    loop, so it is created within the step using it rather than passed between steps.
+
+    Returns:
+        AsyncMinioClient: The asyncio client for the MinIO datalake.
+    """
+    return AsyncMinioClient(
+        endpoint=MINIO_ENDPOINT,
+        access_key=MINIO_ROOT_USER,
+        secret_key=MINIO_ROOT_PASSWORD,
+        secure=False,
+        max_connections=MINIO_ASYNC_MAX_CONNECTIONS,
+        max_concurrency=MINIO_ASYNC_MAX_CONCURRENCY,
+    )
+
+
+@step(output_materializers=BucketClientMaterializer)
+def local_fs_client_initializer() -> LocalFsBucketClient:
+    """
+    Local stand-in for `minio_client_initializer`, storing the buckets on the local disk.
+
+    Returns:
+        LocalFsBucketClient: A bucket client rooted at `LOCAL_BUCKETS_ROOT_PATH`.
+    """
+    os.makedirs(LOCAL_BUCKETS_ROOT_PATH, exist_ok=True)
+    return LocalFsBucketClient(
+        root_path=os.path.abspath(LOCAL_BUCKETS_ROOT_PATH),
+        max_workers=MINIO_MAX_WORKERS,
+    )
+
+
+@step(output_materializers=BucketClientMaterializer)
+def caching_client_initializer(bucket_client: BucketClient) -> CachingBucketClient:
+    """
+    Wrap a bucket client with the local object cache, so objects already downloaded by a
+    previous run are not fetched again.
+
+    Args:
+        bucket_client (BucketClient): The bucket client to wrap.
+
+    Returns:
+        CachingBucketClient: The bucket client reading through the cache.
+    """
+    return CachingBucketClient(
+        bucket_client=bucket_client,
+        cache_path=os.path.abspath(BUCKET_CACHE_PATH),
+        max_bytes=BUCKET_CACHE_MAX_BYTES,
+        max_workers=MINIO_MAX_WORKERS,
+    )
+
+
+@step(output_materializers=BucketClientMaterializer)
+def instrumented_client_initializer(
+    bucket_client: BucketClient,
+) -> InstrumentedBucketClient:
+    """
+    Wrap a bucket client with metrics of its calls, reported at the end of the steps using it
+    with `report_bucket_client_metrics`.
+
+    Args:
+        bucket_client (BucketClient): The bucket client to wrap.
+
+    Returns:
+        InstrumentedBucketClient: The bucket client recording its metrics.
+    """
+    return InstrumentedBucketClient(bucket_client=bucket_client)
+
+
+@step(output_materializers=BucketClientMaterializer)
+def resilient_client_initializer(bucket_client: BucketClient) -> ResilientBucketClient:
+    """
+    Wrap a bucket client with retries of transient failures, request deadlines and hedged
+    reads of small objects.
+
+    Args:
+        bucket_client (BucketClient): The bucket client to wrap.
+
+    Returns:
+        ResilientBucketClient: The bucket client retrying and hedging its requests.
+    """
+    return ResilientBucketClient(
+        bucket_client=bucket_client,
+        max_attempts=BUCKET_RETRY_MAX_ATTEMPTS,
+        request_timeout=BUCKET_REQUEST_TIMEOUT or None,
+        hedge_percentile=BUCKET_HEDGE_PERCENTILE or None,
+        max_workers=MINIO_MAX_WORKERS,
+    )
+
+
+@step(output_materializers=BucketClientMaterializer)
+def catalog_client_initializer(
+    bucket_client: BucketClient, bucket_name_list: list[str], reconcile: bool = False
+) -> CatalogBucketClient:
+    """
+    Wrap a bucket client with the object catalog, so listings and existence checks are
+    answered locally and uploads are indexed as they happen.
+
+    Args:
+        bucket_client (BucketClient): The bucket client to wrap.
+        bucket_name_list (list[str]): The buckets to reconcile.
+        reconcile (bool): Whether to resynchronize the catalog with the buckets first.
+
+    Returns:
+        CatalogBucketClient: The bucket client backed by the catalog.
+    """
+    logger = get_logger(__name__)
+
+    catalog = ObjectCatalog(os.path.abspath(OBJECT_CATALOG_PATH))
+    if reconcile:
+        for bucket_name in bucket_name_list:
+            if not bucket_client.bucket_exists(bucket_name):
+                continue
+            listed, removed = catalog.reconcile(bucket_client, bucket_name)
+            logger.info(
+                f"Reconciled the catalog with {bucket_name}: {listed} objects listed,"
+                f" {removed} stale entries removed"
+            )
+
+    return CatalogBucketClient(bucket_client=bucket_client, catalog=catalog)
+
+
 @step
 def bucket_name_list_initializer() -> List[str]:
     """
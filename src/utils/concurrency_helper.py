@@ -0,0 +1,255 @@
+"""Helper functions for concurrent execution.
+
+This module contains helpers to run many small I/O tasks through an executor
+without scheduling the whole workload up front, and to hand buffers over between
+processes through shared memory.
+"""
+
+import asyncio
+import queue
+import threading
+from concurrent.futures import (
+    FIRST_COMPLETED,
+    Executor,
+    Future,
+    ThreadPoolExecutor,
+    wait,
+)
+from contextlib import contextmanager
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+from typing import (
+    AsyncGenerator,
+    AsyncIterable,
+    Awaitable,
+    Callable,
+    Generator,
+    Iterable,
+    TypeVar,
+)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+_END_OF_ITEMS = object()
+
+
+def bounded_as_completed(
+    executor: Executor,
+    task: Callable[[T], R],
+    items: Iterable[T],
+    max_in_flight: int,
+) -> Generator[tuple[T, Future], None, None]:
+    """
+    Submits `task(item)` for every item while keeping at most `max_in_flight` futures pending.
+
+    Items are pulled lazily from the iterable, so memory stays proportional to the window
+    rather than to the number of items. Futures are yielded as they complete.
+
+    Args:
+        executor (Executor): The executor running the tasks.
+        task (Callable): The function applied to each item.
+        items (Iterable): The items to process, consumed lazily.
+        max_in_flight (int): The maximum number of submitted but not yet yielded futures.
+
+    Yields:
+        tuple[T, Future]: The item and its completed future.
+    """
+    max_in_flight = max(1, max_in_flight)
+    pending: dict[Future, T] = {}
+
+    try:
+        for item in items:
+            pending[executor.submit(task, item)] = item
+
+            while len(pending) >= max_in_flight:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield pending.pop(future), future
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+class _SourceDrainer:
+    """
+    Drains the sources of `merge_concurrently` into a bounded buffer, each item being
+    paired with the error ending its source, if any, until the consumer stops.
+    """
+
+    def __init__(self, max_buffered: int):
+        self.buffer: queue.Queue = queue.Queue(maxsize=max(1, max_buffered))
+        self.stopped = threading.Event()
+
+    def put(self, item, error: BaseException | None = None) -> bool:
+        """Buffers an item, returning False if the consumer stopped meanwhile."""
+        while not self.stopped.is_set():
+            try:
+                self.buffer.put((item, error), timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def drain(self, source: Callable[[], Iterable[T]]) -> None:
+        """Buffers the items of a source, then its end or its error."""
+        try:
+            for item in source():
+                if not self.put(item):
+                    return
+        except BaseException as e:
+            self.put(_END_OF_ITEMS, e)
+        else:
+            self.put(_END_OF_ITEMS)
+
+
+def merge_concurrently(
+    sources: Iterable[Callable[[], Iterable[T]]],
+    max_workers: int,
+    max_buffered: int = 10000,
+) -> Generator[T, None, None]:
+    """
+    Drains several iterables on a pool of threads and yields their items as they arrive.
+
+    Items go through a bounded buffer, so fast sources wait for the consumer instead of
+    piling up in memory. The first error raised by a source is raised to the consumer, and
+    closing the generator stops the sources at their next item.
+
+    Args:
+        sources (Iterable[Callable]): Functions returning the iterables to merge.
+        max_workers (int): The number of sources drained at once.
+        max_buffered (int): The maximum number of items produced but not yet yielded.
+
+    Yields:
+        T: The items of every source, in no particular order.
+    """
+    drainer = _SourceDrainer(max_buffered)
+    executor = ThreadPoolExecutor(max_workers=max(1, max_workers))
+    try:
+        remaining = 0
+        for source in sources:
+            executor.submit(drainer.drain, source)
+            remaining += 1
+
+        while remaining:
+            item, error = drainer.buffer.get()
+            if error is not None:
+                raise error
+            if item is _END_OF_ITEMS:
+                remaining -= 1
+                continue
+            yield item
+    finally:
+        drainer.stopped.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def _iterate_in_thread(items: Iterable[T]) -> AsyncGenerator[T, None]:
+    """Yields the items of a synchronous iterable, each being pulled in a worker thread."""
+    iterator = iter(items)
+    while True:
+        item = await asyncio.to_thread(next, iterator, _END_OF_ITEMS)
+        if item is _END_OF_ITEMS:
+            return
+        yield item
+
+
+async def run_bounded(
+    task: Callable[[T], Awaitable[R]],
+    items: Iterable[T] | AsyncIterable[T],
+    max_in_flight: int,
+    on_result: Callable[[T, R], None] | None = None,
+) -> None:
+    """
+    Awaits `task(item)` for every item with at most `max_in_flight` tasks running at once.
+
+    A fixed set of workers consumes a bounded queue fed from the items, so neither the
+    number of coroutines nor the number of buffered items grows with the workload. The
+    items of a synchronous iterable are pulled in a worker thread, so that producing them,
+    e.g. reading them from disk, never blocks the event loop. The first failing task
+    cancels the others and its exception is raised in an ExceptionGroup.
+
+    Args:
+        task (Callable): The coroutine function applied to each item.
+        items (Iterable | AsyncIterable): The items to process, consumed lazily.
+        max_in_flight (int): The number of concurrent workers.
+        on_result (Callable | None): Called with each item and its result once done.
+    """
+    max_in_flight = max(1, max_in_flight)
+    queue: asyncio.Queue = asyncio.Queue(maxsize=max_in_flight)
+
+    async def produce() -> None:
+        async for item in (
+            items if isinstance(items, AsyncIterable) else _iterate_in_thread(items)
+        ):
+            await queue.put(item)
+
+        for _ in range(max_in_flight):
+            await queue.put(_END_OF_ITEMS)
+
+    async def consume() -> None:
+        while (item := await queue.get()) is not _END_OF_ITEMS:
+            result = await task(item)
+            if on_result is not None:
+                on_result(item, result)
+
+    async with asyncio.TaskGroup() as task_group:
+        task_group.create_task(produce())
+        for _ in range(max_in_flight):
+            task_group.create_task(consume())
+
+
+def ensure_shared_memory_tracker() -> None:
+    """
+    Starts the process's resource tracker, to be called before creating a pool of processes
+    that share buffers with `share_buffer`.
+
+    The processes of the pool then register their shared memory blocks with the parent's
+    tracker, which removes the blocks left behind, e.g. by a failed pipeline, when the
+    parent exits.
+    """
+    resource_tracker.ensure_running()
+
+
+def share_buffer(data) -> str:
+    """
+    Copies a buffer into a new shared memory block, to hand it over to another process
+    without pickling it. The receiving process owns the block and releases it with
+    `attach_shared_buffer`.
+
+    Args:
+        data (bytes | bytearray | memoryview): The buffer to share.
+
+    Returns:
+        str: The name of the shared memory block.
+    """
+    shared_memory = SharedMemory(create=True, size=max(len(data), 1))
+    shared_memory.buf[: len(data)] = data
+    shared_memory.close()
+    return shared_memory.name
+
+
+@contextmanager
+def attach_shared_buffer(name: str, size: int) -> Generator[memoryview, None, None]:
+    """
+    Maps a buffer shared with `share_buffer`, and removes its block once done with it.
+
+    Args:
+        name (str): The name of the shared memory block.
+        size (int): The size of the shared buffer, the block being possibly larger.
+
+    Yields:
+        memoryview: A view on the shared buffer, valid until the context exits.
+    """
+    shared_memory = SharedMemory(name)
+    try:
+        with shared_memory.buf[:size] as data:
+            yield data
+    finally:
+        shared_memory.close()
+        shared_memory.unlink()
@@ -0,0 +1,71 @@
+"""Helper functions to hash many keys at once with NumPy.
+
+This module computes stable 64-bit hashes of string keys, vectorized over the
+whole key list, so that keys can be assigned to buckets, e.g. dataset splits,
+deterministically and independently of the order they are processed in.
+"""
+
+import numpy as np
+
+FNV_OFFSET_BASIS = np.uint64(0xCBF29CE484222325)
+FNV_PRIME = np.uint64(0x100000001B3)
+
+
+def _mix(hashes: np.ndarray) -> np.ndarray:
+    """
+    Applies the SplitMix64 finalizer, so similar keys get unrelated hashes in every bit.
+    """
+    hashes = (hashes ^ (hashes >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    hashes = (hashes ^ (hashes >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return hashes ^ (hashes >> np.uint64(31))
+
+
+def hash_keys(keys: list[str], seed: int = 0) -> np.ndarray:
+    """
+    Hashes string keys with a seeded FNV-1a over 64-bit words, one word position at a
+    time for every key at once.
+
+    Keys are laid out as rows of little-endian words, shorter keys being padded with zero
+    words which leave the hash unchanged, so the hash of a key only depends on the key and
+    the seed, never on the other keys or their order, and is stable across processes and
+    platforms. Keys are expected not to contain NUL characters.
+
+    Args:
+        keys (list[str]): The keys to hash.
+        seed (int): Seed changing every hash.
+
+    Returns:
+        np.ndarray: The uint64 hash of each key.
+    """
+    try:
+        encoded_keys = np.array(keys, dtype=bytes)
+    except UnicodeEncodeError:
+        encoded_keys = np.array([key.encode("utf-8") for key in keys], dtype=bytes)
+
+    width = -(-encoded_keys.dtype.itemsize // 8) * 8
+    words = encoded_keys.astype(f"S{width}").view("<u8").reshape(len(keys), width // 8)
+
+    seed_hash = _mix(np.array([seed], dtype=np.uint64) ^ FNV_OFFSET_BASIS)[0]
+    hashes = np.full(len(keys), seed_hash, dtype=np.uint64)
+    for position in range(words.shape[1]):
+        column = words[:, position]
+        hashes ^= column
+        is_key_word = column != 0
+        if is_key_word.all():
+            hashes *= FNV_PRIME
+        else:
+            hashes *= np.where(is_key_word, FNV_PRIME, np.uint64(1))
+    return _mix(hashes)
+
+
+def hash_to_unit_interval(hashes: np.ndarray) -> np.ndarray:
+    """
+    Maps 64-bit hashes uniformly to floats in [0, 1).
+
+    Args:
+        hashes (np.ndarray): uint64 hashes, e.g. from `hash_keys`.
+
+    Returns:
+        np.ndarray: A float64 in [0, 1) per hash.
+    """
+    return (hashes >> np.uint64(11)).astype(np.float64) * 2.0**-53
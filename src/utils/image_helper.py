@@ -0,0 +1,111 @@
+"""Helper functions to inspect image files from their first bytes.
+
+This module reads image formats and dimensions from file headers, so images
+stored in the datalake can be validated or indexed with ranged reads instead
+of full downloads.
+"""
+
+import io
+import struct
+
+from PIL import Image
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+# Signature, then the IHDR chunk's length, type, width and height
+PNG_HEADER_SIZE = 24
+# Enough bytes to recognize every format of `IMAGE_SIGNATURES`
+IMAGE_HEADER_SIZE = 32
+
+IMAGE_SIGNATURES = {
+    PNG_SIGNATURE: "png",
+    b"\xff\xd8\xff": "jpeg",
+    b"GIF87a": "gif",
+    b"GIF89a": "gif",
+    b"BM": "bmp",
+    b"II*\x00": "tiff",
+    b"MM\x00*": "tiff",
+}
+
+
+def sniff_image_format(header: bytes) -> str | None:
+    """
+    Recognizes an image format from the first bytes of a file.
+
+    Args:
+        header (bytes): The first `IMAGE_HEADER_SIZE` bytes of the file, or more.
+
+    Returns:
+        str | None: The format, e.g. "png" or "jpeg", or None if it is not recognized.
+    """
+    for signature, image_format in IMAGE_SIGNATURES.items():
+        if header.startswith(signature):
+            return image_format
+
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+def get_png_dimensions(header: bytes) -> tuple[int, int]:
+    """
+    Reads the width and height of a PNG image from its IHDR chunk.
+
+    Args:
+        header (bytes): The first `PNG_HEADER_SIZE` bytes of the file, or more.
+
+    Returns:
+        tuple[int, int]: The width and height of the image, in pixels.
+
+    Raises:
+        ValueError: If the header is not the one of a PNG image.
+    """
+    if (
+        len(header) < PNG_HEADER_SIZE
+        or not header.startswith(PNG_SIGNATURE)
+        or header[12:16] != b"IHDR"
+    ):
+        raise ValueError("Not a PNG header.")
+
+    width, height = struct.unpack(">II", header[16:24])
+    return width, height
+
+
+def get_image_dimensions(image_data: bytes | memoryview) -> tuple[int, int]:
+    """
+    Reads the width and height of an encoded image without decoding it.
+
+    PNG dimensions are read from the header's first bytes, other formats through PIL,
+    which only parses the header until the image's data is accessed.
+
+    Args:
+        image_data (bytes | memoryview): The encoded image.
+
+    Returns:
+        tuple[int, int]: The width and height of the image, in pixels.
+    """
+    header = bytes(image_data[:PNG_HEADER_SIZE])
+    if header.startswith(PNG_SIGNATURE):
+        return get_png_dimensions(header)
+
+    with Image.open(io.BytesIO(image_data)) as image:
+        return image.size
+
+
+def read_image_dimensions(file_path: str) -> tuple[int, int]:
+    """
+    Reads the width and height of a local image file without decoding it, like
+    `get_image_dimensions`.
+
+    Args:
+        file_path (str): Path to the image.
+
+    Returns:
+        tuple[int, int]: The width and height of the image, in pixels.
+    """
+    with open(file_path, "rb") as file:
+        header = file.read(PNG_HEADER_SIZE)
+    if header.startswith(PNG_SIGNATURE):
+        return get_png_dimensions(header)
+
+    with Image.open(file_path) as image:
+        return image.size
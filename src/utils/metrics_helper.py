@@ -0,0 +1,62 @@
+"""Helper functions for the bucket clients' metrics.
+
+This module contains helpers to report the metrics recorded by an instrumented
+bucket client to the logs, the active experiment tracker and, optionally, files.
+"""
+
+import os
+import time
+
+from zenml.logger import get_logger
+
+from src.models.model_bucket_client import BucketClient, BucketClientDecorator
+from src.models.model_instrumented_bucket_client import InstrumentedBucketClient
+from src.utils import tracker_helper
+
+
+def report_bucket_client_metrics(
+    bucket_client: BucketClient, step_name: str, export_path: str | None = None
+) -> None:
+    """
+    Log the metrics of an instrumented bucket client and push them to the active experiment
+    tracker. Does nothing if the bucket client, or none of the clients it wraps, is
+    instrumented.
+
+    Args:
+        bucket_client (BucketClient): The bucket client used by the step.
+        step_name (str): Name of the step, prefixing the metrics and naming the snapshots.
+        export_path (str | None): Folder to also write JSON and Prometheus snapshots of the
+            metrics to, if any.
+    """
+    logger = get_logger(__name__)
+
+    while not isinstance(bucket_client, InstrumentedBucketClient):
+        if not isinstance(bucket_client, BucketClientDecorator):
+            return
+        bucket_client = bucket_client.bucket_client
+
+    metrics = bucket_client.metrics
+    logger.info(metrics.summary())
+
+    try:
+        tracker_helper.log_metrics(
+            {
+                f"{step_name}.{name}": value
+                for name, value in metrics.to_flat_dict().items()
+            }
+        )
+        tracker_helper.log_dict(metrics.snapshot(), f"bucket_metrics/{step_name}.json")
+    except Exception as e:
+        logger.warning(f"Couldn't log the bucket client's metrics: {e}")
+
+    if not export_path:
+        return
+
+    os.makedirs(export_path, exist_ok=True)
+    snapshot_path = os.path.join(
+        export_path, f"{step_name}-{time.strftime('%Y%m%d-%H%M%S')}"
+    )
+    with open(f"{snapshot_path}.json", "w") as f:
+        f.write(metrics.to_json())
+    with open(f"{snapshot_path}.prom", "w") as f:
+        f.write(metrics.to_prometheus())
@@ -39,6 +39,26 @@ def log_metric(key: str, value: float) -> None:
         mlflow.log_metric(key, value)
 
 
+def log_metrics(metrics: dict[str, float]) -> None:
+    """Log several metrics at once to the active experiment tracker."""
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+    if isinstance(experiment_tracker, MLFlowExperimentTracker):
+        import mlflow
+
+        mlflow.log_metrics(metrics)
+
+
+def log_dict(dictionary: dict, artifact_file: str) -> None:
+    """Log a dictionary as a JSON artifact to the active experiment tracker."""
+
+    experiment_tracker = Client().active_stack.experiment_tracker
+    if isinstance(experiment_tracker, MLFlowExperimentTracker):
+        import mlflow
+
+        mlflow.log_dict(dictionary, artifact_file)
+
+
 def log_artifact(local_path: str, artifact_path: str) -> None:
     """Log an artifact to the active experiment tracker."""
 
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from src.models.model_annotation_table import AnnotationTable, AnnotationTableBuilder
+from src.models.model_local_bucket_client import LocalFsBucketClient
+
+
+def build_table(annotations: dict[str, tuple[list, list]]) -> AnnotationTable:
+    builder = AnnotationTableBuilder()
+    for key, (labels, boxes) in annotations.items():
+        builder.add(key, {"label": labels, "bbox": boxes}, (100, 50))
+    return builder.build()
+
+
+def get_boxes_by_key(table: AnnotationTable) -> dict[str, list[tuple[int, list]]]:
+    boxes_by_key: dict[str, list[tuple[int, list]]] = {
+        key: [] for key in table.keys.tolist()
+    }
+    for image_index, label, box in zip(
+        table.image_indexes.tolist(), table.labels.tolist(), table.boxes.tolist()
+    ):
+        boxes_by_key[table.keys[image_index]].append((label, box))
+    return boxes_by_key
+
+
+@pytest.fixture
+def table() -> AnnotationTable:
+    return build_table(
+        {
+            "a": ([0, 1], [[0.5, 0.5, 0.25, 0.25], [0.25, 0.25, 0.5, 0.5]]),
+            "b": ([], []),
+            "c": ([2], [[0.5, 0.5, 0.5, 0.5]]),
+            "d": ([1, 1, 2], [[0.5, 0.5, 0.5, 0.5]] * 3),
+        }
+    ).with_splits({"a": "train", "b": "train", "c": "test", "d": "test"})
+
+
+def test_builder_stores_the_boxes_as_they_are():
+    table = build_table({"a": ([0, 1], [[0.5, 0.25, 0.1, 0.2], [50, 25, 10, 5]])})
+
+    np.testing.assert_allclose(table.boxes, [[0.5, 0.25, 0.1, 0.2], [50, 25, 10, 5]])
+    assert table.image_widths.tolist() == [100]
+    assert table.image_heights.tolist() == [50]
+
+
+def test_builder_rejects_labels_without_boxes():
+    with pytest.raises(ValueError):
+        AnnotationTableBuilder().add("a", {"label": [0, 1], "bbox": [[0, 0, 1, 1]]})
+
+
+def test_take_keeps_the_boxes_of_the_taken_images_in_their_order(table):
+    taken = table._take(np.array([3, 0]))
+
+    assert taken.keys.tolist() == ["d", "a"]
+    assert taken.image_indexes.tolist() == [0, 0, 0, 1, 1]
+    assert taken.labels.tolist() == [1, 1, 2, 0, 1]
+    assert get_boxes_by_key(taken) == {
+        key: boxes
+        for key, boxes in get_boxes_by_key(table).items()
+        if key in ("a", "d")
+    }
+
+
+def test_select(table):
+    assert table.select(keys=["a", "c"]).keys.tolist() == ["a", "c"]
+    assert table.select(labels=[1]).keys.tolist() == ["a", "d"]
+    assert table.select(splits=["test"]).keys.tolist() == ["c", "d"]
+    assert table.select(labels=[2], splits=["test"]).get_label_counts() == {1: 2, 2: 2}
+    assert table.select(labels=[5]).number_of_images == 0
+
+
+def test_concatenate_keeps_images_from_the_first_table(table):
+    new_table = build_table(
+        {"c": ([0], [[0.1, 0.1, 0.1, 0.1]]), "e": ([3], [[0.2, 0.2, 0.2, 0.2]])}
+    )
+
+    concatenated = AnnotationTable.concatenate([new_table, table])
+
+    assert concatenated.keys.tolist() == ["c", "e", "a", "b", "d"]
+    boxes_by_key = get_boxes_by_key(concatenated)
+    assert boxes_by_key["c"] == get_boxes_by_key(new_table)["c"]
+    assert boxes_by_key["a"] == get_boxes_by_key(table)["a"]
+    assert boxes_by_key["b"] == []
+    assert len(concatenated) == 7
+
+
+def test_concatenate_of_empty_tables():
+    assert AnnotationTable.concatenate([]).number_of_images == 0
+    assert AnnotationTable.concatenate([AnnotationTable.empty()]).number_of_images == 0
+
+
+def test_save_and_load(table, tmp_path):
+    bucket_client = LocalFsBucketClient(str(tmp_path))
+    bucket_client.make_bucket("bucket", enable_versioning=False)
+
+    assert AnnotationTable.load(bucket_client, "bucket", "ds/annotations.npz") is None
+
+    table.save(bucket_client, "bucket", "ds/annotations.npz")
+    loaded = AnnotationTable.load(bucket_client, "bucket", "ds/annotations.npz")
+
+    assert loaded.keys.tolist() == table.keys.tolist()
+    assert loaded.splits.tolist() == table.splits.tolist()
+    assert get_boxes_by_key(loaded) == get_boxes_by_key(table)
@@ -0,0 +1,126 @@
+import hashlib
+import io
+import os
+
+import pytest
+
+from src.models.model_local_bucket_client import LocalFsBucketClient
+
+
+@pytest.fixture
+def bucket_client(tmp_path) -> LocalFsBucketClient:
+    bucket_client = LocalFsBucketClient(str(tmp_path / "buckets"))
+    bucket_client.make_bucket("bucket", enable_versioning=False)
+    return bucket_client
+
+
+def read_object(
+    bucket_client: LocalFsBucketClient, bucket_name: str, object_name: str
+) -> bytes:
+    with bucket_client.get_object(bucket_name, object_name) as response:
+        return response.read()
+
+
+def test_make_bucket(bucket_client):
+    assert bucket_client.bucket_exists("bucket")
+    assert not bucket_client.bucket_exists("missing")
+
+
+def test_upload_data_then_get_and_head(bucket_client):
+    result = bucket_client.upload_data(
+        "bucket", "folder/a.txt", b"hello", 5, metadata={"source": "test"}
+    )
+
+    assert read_object(bucket_client, "bucket", "folder/a.txt") == b"hello"
+    obj = bucket_client.head_object("bucket", "folder/a.txt")
+    assert obj.size == 5
+    assert obj.etag == result.etag == hashlib.md5(b"hello").hexdigest()
+    assert bucket_client.folder_exists("bucket", "folder")
+
+
+def test_upload_stream_and_file(bucket_client, tmp_path):
+    bucket_client.upload_data("bucket", "stream.bin", io.BytesIO(b"stream"), 6)
+    file_path = tmp_path / "file.bin"
+    file_path.write_bytes(b"file")
+    bucket_client.upload_file("bucket", "file.bin", str(file_path))
+
+    assert read_object(bucket_client, "bucket", "stream.bin") == b"stream"
+    assert read_object(bucket_client, "bucket", "file.bin") == b"file"
+
+
+def test_upload_data_overwrites(bucket_client):
+    bucket_client.upload_data("bucket", "a.txt", b"old", 3)
+    bucket_client.upload_data("bucket", "a.txt", b"new!", 4)
+
+    assert read_object(bucket_client, "bucket", "a.txt") == b"new!"
+    assert bucket_client.head_object("bucket", "a.txt").size == 4
+
+
+def test_list_objects(bucket_client):
+    for object_name in ("a/1.txt", "a/2.txt", "a/b/3.txt", "c.txt"):
+        bucket_client.upload_data("bucket", object_name, b"x", 1)
+
+    recursive = [
+        obj.object_name
+        for obj in bucket_client.list_objects("bucket", "a/", recursive=True)
+    ]
+    flat = [
+        (obj.object_name, obj.is_dir) for obj in bucket_client.list_objects("bucket")
+    ]
+
+    assert recursive == ["a/1.txt", "a/2.txt", "a/b/3.txt"]
+    assert flat == [("a/", True), ("c.txt", False)]
+
+
+def test_missing_objects_raise(bucket_client):
+    with pytest.raises(FileNotFoundError):
+        bucket_client.get_object("bucket", "missing.txt")
+    with pytest.raises(FileNotFoundError):
+        bucket_client.head_object("bucket", "missing.txt")
+
+
+def test_get_object_range(bucket_client):
+    bucket_client.upload_data("bucket", "a.txt", b"hello world", 11)
+
+    assert bucket_client.get_object_range("bucket", "a.txt", 6, 5) == b"world"
+    assert bucket_client.get_object_range("bucket", "a.txt", 6, 100) == b"world"
+    assert bucket_client.get_object_range("bucket", "a.txt", 6, 0) == b""
+    with pytest.raises(ValueError):
+        bucket_client.get_object_range("bucket", "a.txt", 6, -1)
+
+
+def test_copy_object(bucket_client):
+    bucket_client.make_bucket("other", enable_versioning=False)
+    bucket_client.upload_data("bucket", "a.txt", b"content", 7)
+
+    bucket_client.copy_object("bucket", "a.txt", "other", "b.txt")
+
+    assert read_object(bucket_client, "other", "b.txt") == b"content"
+    assert (
+        bucket_client.head_object("other", "b.txt").etag
+        == bucket_client.head_object("bucket", "a.txt").etag
+    )
+
+
+def test_download_folder_copies_are_independent(bucket_client, tmp_path):
+    bucket_client.upload_data("bucket", "folder/a.txt", b"stored", 6)
+    destination_path = tmp_path / "download"
+
+    bucket_client.download_folder("bucket", "folder", str(destination_path))
+    downloaded_path = destination_path / "folder" / "a.txt"
+    downloaded_path.write_bytes(b"edited")
+
+    assert read_object(bucket_client, "bucket", "folder/a.txt") == b"stored"
+    assert os.stat(downloaded_path).st_nlink == 1
+
+
+def test_relative_root_hides_the_reserved_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    bucket_client = LocalFsBucketClient("./buckets")
+    bucket_client.make_bucket("bucket", enable_versioning=True)
+    bucket_client.upload_data("bucket", "x/a.txt", b"old", 3)
+    bucket_client.upload_data("bucket", "x/a.txt", b"new", 3)
+
+    assert [
+        obj.object_name for obj in bucket_client.list_objects("bucket", recursive=True)
+    ] == ["x/a.txt"]
@@ -0,0 +1,145 @@
+import hashlib
+import io
+import tarfile
+
+import pytest
+
+from src.models.model_local_bucket_client import LocalFsBucketClient
+from src.models.model_shard import (
+    ShardIndex,
+    ShardWriter,
+    download_shards,
+    get_next_shard_number,
+    list_shards,
+)
+
+SAMPLES = {
+    f"sample-{number}": {
+        "png": bytes([number]) * (100 + number * 37),
+        "json": f'{{"label": [{number}]}}'.encode(),
+    }
+    for number in range(20)
+}
+
+
+@pytest.fixture
+def bucket_client(tmp_path) -> LocalFsBucketClient:
+    bucket_client = LocalFsBucketClient(str(tmp_path / "buckets"))
+    bucket_client.make_bucket("bucket", enable_versioning=False)
+    return bucket_client
+
+
+def write_samples(bucket_client: LocalFsBucketClient, **kwargs) -> ShardWriter:
+    with ShardWriter(
+        bucket_client, "bucket", "data/shards", max_bytes=2048, **kwargs
+    ) as shard_writer:
+        for key, files in SAMPLES.items():
+            shard_writer.add(key, files)
+    return shard_writer
+
+
+def test_shard_index_round_trip(bucket_client):
+    shard_writer = write_samples(bucket_client)
+    shard_index = ShardIndex.load(bucket_client, "bucket", "data/shards/")
+
+    assert len(shard_writer.uploaded_shards) > 1
+    assert set(shard_index.keys()) == set(SAMPLES)
+    for key, files in SAMPLES.items():
+        assert shard_index.read_sample(bucket_client, "bucket", key) == files
+
+
+def test_shard_index_matches_the_tar_members(bucket_client):
+    write_samples(bucket_client)
+    shard_index = ShardIndex.load(bucket_client, "bucket", "data/shards/")
+
+    for shard_object_name in list_shards(bucket_client, "bucket", "data/shards/"):
+        with bucket_client.get_object("bucket", shard_object_name) as response:
+            with tarfile.open(fileobj=io.BytesIO(response.read())) as tar:
+                for member in tar.getmembers():
+                    key, _, extension = member.name.partition(".")
+                    assert shard_index.entries[key][0] == shard_object_name
+                    assert tar.extractfile(member).read() == SAMPLES[key][extension]
+
+
+def test_shard_index_reads_only_the_given_shards(bucket_client):
+    uploaded_shard_object_names = []
+    shard_writer = write_samples(
+        bucket_client, on_upload=uploaded_shard_object_names.append
+    )
+    first_shard_object_name = shard_writer.uploaded_shards[0][0]
+    shard_index = ShardIndex.load(
+        bucket_client,
+        "bucket",
+        "data/shards/",
+        shard_object_names=[first_shard_object_name],
+    )
+
+    assert uploaded_shard_object_names == [
+        shard_object_name for shard_object_name, _ in shard_writer.uploaded_shards
+    ]
+    assert 0 < len(shard_index) < len(SAMPLES)
+    assert {
+        shard_object_name for shard_object_name, _ in shard_index.entries.values()
+    } == {first_shard_object_name}
+
+
+def test_shard_index_keeps_the_md5_of_the_annotations(bucket_client):
+    write_samples(bucket_client)
+    shard_index = ShardIndex.load(bucket_client, "bucket", "data/shards/")
+
+    for key, files in SAMPLES.items():
+        assert shard_index.md5s[key] == {"json": hashlib.md5(files["json"]).hexdigest()}
+
+
+def test_sample_packed_again_supersedes_its_previous_copy(bucket_client, tmp_path):
+    write_samples(bucket_client)
+    changed_files = {"png": b"png", "json": b'{"label": [1]}'}
+    with ShardWriter(
+        bucket_client, "bucket", "data/shards", first_shard_number=100
+    ) as shard_writer:
+        shard_writer.add("sample-3", changed_files)
+    shard_index = ShardIndex.load(bucket_client, "bucket", "data/shards/")
+
+    assert shard_index.read_sample(bucket_client, "bucket", "sample-3") == changed_files
+    download_shards(
+        bucket_client,
+        "bucket",
+        "data/shards/",
+        lambda _, member_name: str(tmp_path / "download" / member_name),
+    )
+    assert (tmp_path / "download" / "sample-3.json").read_bytes() == (
+        changed_files["json"]
+    )
+    assert len(list((tmp_path / "download").iterdir())) == 2 * len(SAMPLES)
+
+
+def test_shard_numbering_continues_after_existing_shards(bucket_client):
+    write_samples(bucket_client)
+    shard_object_names = list_shards(bucket_client, "bucket", "data/shards/")
+    next_shard_number = get_next_shard_number(shard_object_names, "shard")
+
+    assert next_shard_number == len(shard_object_names)
+    assert get_next_shard_number(shard_object_names, "train") == 0
+
+    write_samples(bucket_client, first_shard_number=next_shard_number)
+    assert len(list_shards(bucket_client, "bucket", "data/shards/")) == (
+        2 * next_shard_number
+    )
+
+
+def test_shard_writer_discards_the_partial_shard_on_error(bucket_client):
+    with pytest.raises(RuntimeError):
+        with ShardWriter(bucket_client, "bucket", "data/shards") as shard_writer:
+            shard_writer.add("sample", {"json": b"{}"})
+            raise RuntimeError("failed upload")
+
+    assert list(bucket_client.list_objects("bucket", "data/", recursive=True)) == []
+
+
+def test_shard_members_have_no_pax_headers(bucket_client):
+    write_samples(bucket_client)
+
+    for shard_object_name in list_shards(bucket_client, "bucket", "data/shards/"):
+        with bucket_client.get_object("bucket", shard_object_name) as response:
+            with tarfile.open(fileobj=io.BytesIO(response.read())) as tar:
+                assert all(not member.pax_headers for member in tar.getmembers())
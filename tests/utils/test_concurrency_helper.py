@@ -0,0 +1,128 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from src.utils.concurrency_helper import bounded_as_completed, merge_concurrently
+
+
+def test_bounded_as_completed_yields_every_item_with_its_result():
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = {
+            item: future.result()
+            for item, future in bounded_as_completed(
+                executor, lambda item: item * 2, range(100), max_in_flight=8
+            )
+        }
+
+    assert results == {item: item * 2 for item in range(100)}
+
+
+def test_bounded_as_completed_keeps_at_most_max_in_flight_pending():
+    lock = threading.Lock()
+    running = 0
+    max_running = 0
+
+    def task(item: int) -> int:
+        nonlocal running, max_running
+        with lock:
+            running += 1
+            max_running = max(max_running, running)
+        time.sleep(0.01)
+        with lock:
+            running -= 1
+        return item
+
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        for _ in bounded_as_completed(executor, task, range(50), max_in_flight=3):
+            pass
+
+    assert max_running <= 3
+
+
+def test_bounded_as_completed_pulls_items_lazily():
+    pulled = []
+
+    def items():
+        for item in range(1000):
+            pulled.append(item)
+            yield item
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        results = bounded_as_completed(
+            executor, lambda item: item, items(), max_in_flight=4
+        )
+        next(results)
+        results.close()
+
+    assert len(pulled) <= 5
+
+
+def test_bounded_as_completed_leaves_errors_in_their_futures():
+    def task(item: int) -> int:
+        if item == 3:
+            raise ValueError("failed item")
+        return item
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = dict(bounded_as_completed(executor, task, range(6), max_in_flight=2))
+
+    with pytest.raises(ValueError, match="failed item"):
+        futures[3].result()
+    assert [futures[item].result() for item in (0, 1, 2, 4, 5)] == [0, 1, 2, 4, 5]
+
+
+def test_bounded_as_completed_propagates_errors_of_the_items():
+    def items():
+        yield 1
+        raise RuntimeError("broken iterable")
+
+    with ThreadPoolExecutor(max_workers=2) as executor, pytest.raises(
+        RuntimeError, match="broken iterable"
+    ):
+        for _ in bounded_as_completed(
+            executor, lambda item: item, items(), max_in_flight=4
+        ):
+            pass
+
+
+def test_merge_concurrently_yields_the_items_of_every_source():
+    sources = [lambda start=start: range(start, start + 100) for start in (0, 100, 200)]
+
+    assert sorted(merge_concurrently(sources, max_workers=2, max_buffered=5)) == list(
+        range(300)
+    )
+
+
+def test_merge_concurrently_with_no_sources():
+    assert list(merge_concurrently([], max_workers=2)) == []
+
+
+def test_merge_concurrently_raises_the_error_of_a_source():
+    def failing_source():
+        yield 1
+        raise ValueError("failed source")
+
+    with pytest.raises(ValueError, match="failed source"):
+        list(merge_concurrently([lambda: range(10), failing_source], max_workers=2))
+
+
+def test_merge_concurrently_stops_the_sources_when_closed():
+    pulled = []
+
+    def endless_source():
+        item = 0
+        while True:
+            pulled.append(item)
+            yield item
+            item += 1
+
+    items = merge_concurrently([endless_source], max_workers=1, max_buffered=2)
+    next(items)
+    items.close()
+    time.sleep(0.3)
+    pulled_after_close = len(pulled)
+    time.sleep(0.3)
+
+    assert len(pulled) == pulled_after_close
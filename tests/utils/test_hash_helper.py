@@ -0,0 +1,42 @@
+import numpy as np
+
+from src.utils.hash_helper import hash_keys, hash_to_unit_interval
+
+KEYS = [f"sample-{number}" for number in range(1000)] + ["a", "ünïcode", "x" * 40]
+
+
+def test_hash_keys_is_stable():
+    # Changing these values changes the split of every existing dataset
+    assert hash_keys(["a", "sample-1", "ünïcode"]).tolist() == [
+        5887646187644181494,
+        9834991683952127297,
+        10068250789282255242,
+    ]
+    assert hash_keys(["a"], seed=1).tolist() == [6426315120301760459]
+
+
+def test_hash_keys_does_not_depend_on_the_other_keys_or_their_order():
+    hashes = dict(zip(KEYS, hash_keys(KEYS).tolist()))
+    shuffled_keys = list(np.random.default_rng(0).permutation(KEYS))
+
+    assert dict(zip(shuffled_keys, hash_keys(shuffled_keys).tolist())) == hashes
+    assert {key: hash_keys([key])[0] for key in KEYS[::100]} == {
+        key: hashes[key] for key in KEYS[::100]
+    }
+
+
+def test_hash_keys_tells_keys_and_seeds_apart():
+    assert len(set(hash_keys(KEYS).tolist())) == len(KEYS)
+    assert hash_keys(["a", "a\x01"])[0] != hash_keys(["a", "a\x01"])[1]
+    assert (hash_keys(KEYS, seed=1) != hash_keys(KEYS, seed=2)).all()
+
+
+def test_hash_keys_of_no_keys():
+    assert hash_keys([]).shape == (0,)
+
+
+def test_hash_to_unit_interval_is_uniform():
+    values = hash_to_unit_interval(hash_keys(KEYS))
+
+    assert ((values >= 0) & (values < 1)).all()
+    assert abs(values.mean() - 0.5) < 0.05